@@ -1,127 +1,296 @@
-import cv2
-import pytesseract
-import phonenumbers
-import pandas as pd
-from phonenumbers import PhoneNumberMatcher, PhoneNumberFormat
-from collections import defaultdict
+"""Offline phone number extraction for video archives.
+
+Usage:
+    python v.py archive/ "clips/**/*.mp4" --workers 4 --region IL,DE -o phones.csv
+    python v.py archive/ --format parquet -o phones_parquet/
+
+Results are appended per finished video. A manifest next to the output
+(``<output>.manifest.jsonl``) records finished videos, so re-running the same
+command after an interruption skips them and only processes the rest. An
+existing CSV without a manifest (such as the old single-video script's
+phones_from_video.csv) is left alone; --no-resume replaces it.
+"""
+import argparse
+import csv
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
 
-# === Einstellungen ===
-VIDEO_PATH = "video.mp4"          # <<-- Pfad zu deinem Video
-REGION = "IL"                     # Region für Parsing (IL=Israel). Du kannst "DE", "AT", etc. setzen.
-SAMPLE_FPS = 4                    # Wie viele Frames pro Sekunde auswerten (Tradeoff: schneller vs. gründlicher)
-MIN_CONF = 55                     # Mindest-Konfidenz (0-100) für OCR-Wörter
-OUTPUT_CSV = "phones_from_video.csv"
-
-# Optional: falls Tesseract nicht im PATH ist, Pfad setzen, z.B.:
-# pytesseract.pytesseract.tesseract_cmd = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
-
-# === Video öffnen ===
-cap = cv2.VideoCapture(VIDEO_PATH)
-if not cap.isOpened():
-    raise RuntimeError(f"Kann Video nicht öffnen: {VIDEO_PATH}")
-
-video_fps = cap.get(cv2.CAP_PROP_FPS) or 25
-frame_interval = max(int(round(video_fps / SAMPLE_FPS)), 1)
-
-# Ergebnisse: dict[e164] = {"first_time": sek, "frames": [frame_idx, ...], "raw_hits": set([...])}
-found = defaultdict(lambda: {"first_time": None, "frames": set(), "raw_hits": set()})
-
-def preprocess(img):
-    """Leichte Vorverarbeitung für OCR: Graustufen, adaptive Threshold, etwas schärfen."""
-    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-    # leichte Entzerrung von Kontrast:
-    clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8,8))
-    gray = clahe.apply(gray)
-    # adaptives Thresholding für kontrastarme Overlays
-    th = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
-                               cv2.THRESH_BINARY, 31, 9)
-    # Optionales kleines Morph-Opening, um Rauschen zu entfernen
-    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (1,1))
-    th = cv2.morphologyEx(th, cv2.MORPH_OPEN, kernel, iterations=1)
-    return th
-
-def ocr_text(img):
-    """OCR und Rückgabe zusammenhängender Textzeilen."""
-    # psm 6 = Assume a single uniform block of text; bei Untertiteln oft gut
-    config = "--oem 3 --psm 6"
-    data = pytesseract.image_to_data(img, lang="eng", config=config, output_type=pytesseract.Output.DATAFRAME)
-    if data is None or data.empty:
-        return []
-    # nach Zeilen gruppieren, nur Wörter mit genügend Konfidenz
-    data = data[pd.to_numeric(data["conf"], errors="coerce").fillna(-1) >= MIN_CONF]
-    lines = []
-    if not data.empty:
-        for (block, par, line), grp in data.groupby(["block_num", "par_num", "line_num"]):
-            txt = " ".join(str(t) for t in grp["text"] if isinstance(t, str))
-            txt = txt.strip()
-            if txt:
-                lines.append(txt)
-    return lines
-
-def try_extract_numbers(text, region=REGION):
-    """Mit libphonenumber zuverlässig Nummern erkennen."""
-    hits = []
-    for match in PhoneNumberMatcher(text, region):
-        num = match.number
-        # Validierung
-        if phonenumbers.is_possible_number(num) and phonenumbers.is_valid_number(num):
-            e164 = phonenumbers.format_number(num, PhoneNumberFormat.E164)
-            natl = phonenumbers.format_number(num, PhoneNumberFormat.NATIONAL)
-            hits.append((e164, natl, match.raw_string))
-    return hits
-
-frame_idx = -1
-while True:
-    ret, frame = cap.read()
-    if not ret:
-        break
-    frame_idx += 1
-
-    # nur jeden n-ten Frame verarbeiten
-    if frame_idx % frame_interval != 0:
-        continue
-
-    timestamp_sec = frame_idx / video_fps
-
-    proc = preprocess(frame)
-    lines = ocr_text(proc)
-
-    # zusätzlich den gesamten zusammengefügten Text probieren (manche Nummern werden über Zeilen getrennt)
-    joined_text = "\n".join(lines)
-    texts_to_scan = set(lines)
-    texts_to_scan.add(joined_text)
-
-    for t in texts_to_scan:
-        for e164, natl, raw in try_extract_numbers(t, REGION):
-            if found[e164]["first_time"] is None:
-                found[e164]["first_time"] = timestamp_sec
-            found[e164]["frames"].add(frame_idx)
-            found[e164]["raw_hits"].add(raw)
-
-cap.release()
-
-# Ergebnisse hübsch machen & speichern
-rows = []
-for e164, info in found.items():
-    rows.append({
-        "e164": e164,
-        "first_seen_sec": round(info["first_time"], 3) if info["first_time"] is not None else None,
-        "frame_count": len(info["frames"]),
-        "example_raw_hits": "; ".join(sorted(info["raw_hits"]))[:500]
-    })
-df = pd.DataFrame(rows).sort_values(["first_seen_sec", "e164"], na_position="last")
-
-print("\n=== Gefundene Handynummern ===")
-if df.empty:
-    print("Keine Nummern gefunden. Tipp: Erhöhe SAMPLE_FPS, senke MIN_CONF oder probiere andere Vorverarbeitung.")
-else:
-    for _, r in df.iterrows():
-        print(f"{r['e164']}  (erstmals bei {r['first_seen_sec']}s, Frames={r['frame_count']})  | Bsp: {r['example_raw_hits']}")
-
-if df.empty:
-    # leere Datei trotzdem anlegen für Pipeline-Konsistenz
-    Path(OUTPUT_CSV).write_text("e164,first_seen_sec,frame_count,example_raw_hits\n", encoding="utf-8")
-else:
-    df.to_csv(OUTPUT_CSV, index=False, encoding="utf-8")
-print(f"\nCSV gespeichert unter: {OUTPUT_CSV}")
+# Reuse the service's pipeline (the Django app modules used here don't need Django)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'phone'))
+
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv')
+
+COLUMNS = ['video', 'e164', 'national', 'first_seen_sec', 'last_seen_sec', 'frame_count', 'example_raw_hits']
+
+
+class OutputError(Exception):
+    pass
+
+
+def find_videos(inputs, recursive=False):
+    """Expand files, directories and glob patterns into a sorted list of video paths"""
+    videos = set()
+    for item in inputs:
+        path = Path(item)
+        if path.is_dir():
+            pattern = '**/*' if recursive else '*'
+            candidates = path.glob(pattern)
+        elif path.is_file():
+            candidates = [path]
+        else:
+            candidates = (Path(p) for p in glob.glob(item, recursive=True))
+        videos.update(
+            p.resolve() for p in candidates
+            if p.is_file() and p.suffix.lower() in VIDEO_EXTENSIONS
+        )
+    return sorted(videos)
+
+
+def file_key(path):
+    """Identity of a video file for the manifest: path, size and modification time"""
+    stat = path.stat()
+    return {'path': str(path), 'size': stat.st_size, 'mtime': int(stat.st_mtime)}
+
+
+def process_video(path, sample_fps, regions, min_conf, profile):
+    """Extract phone numbers from one video; runs in a worker process"""
+    from api.frame_sources import open_frame_source
+    from api.matching import get_matcher
+    from api.ocr import ocr_lines
+    from api.preprocessing import PreprocessContext, resolve_profile
+    from api.tracking import PhoneTracker
+
+    started = time.time()
+    matcher = get_matcher(regions)
+    context = PreprocessContext(resolve_profile(profile, str(path)))
+    source = open_frame_source(str(path), sample_fps)
+    found = PhoneTracker(sample_interval_sec=source.frame_interval / source.video_fps)
+    try:
+        for frame_idx, timestamp_sec, frame in source:
+            lines, _, _ = ocr_lines(context.preprocess(frame), "--oem 3 --psm 6", min_conf)
+            # Each line once, plus numbers split across line breaks
+            hits = [hit for line in dict.fromkeys(lines) for hit in matcher.match(line)]
+            hits.extend(matcher.match_boundaries(lines))
+            for e164, natl, raw in hits:
+                found.observe(e164, natl, raw, frame_idx, timestamp_sec)
+    finally:
+        source.release()
+
+    rows = [
+        {
+            'video': str(path),
+            'e164': e164,
+            'national': track.national,
+            'first_seen_sec': round(track.first_time, 3),
+            'last_seen_sec': round(track.last_time, 3),
+            'frame_count': track.frame_count,
+            'example_raw_hits': track.raw_text_examples(),
+        }
+        for e164, track in found.items()
+    ]
+    rows.sort(key=lambda row: (row['first_seen_sec'], row['e164']))
+    return rows, time.time() - started
+
+
+def _init_worker():
+    # One tesseract thread per process; parallelism comes from the pool
+    os.environ.setdefault('OMP_THREAD_LIMIT', '1')
+
+
+class Manifest:
+    """Append-only JSON lines record of finished videos"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.done = {}
+        if self.path.exists():
+            with open(self.path, encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # Half-written last line of an interrupted run
+                        continue
+                    self.done[entry['path']] = entry
+
+    def is_done(self, key):
+        entry = self.done.get(key['path'])
+        return entry is not None and entry['size'] == key['size'] and entry['mtime'] == key['mtime']
+
+    def add(self, key, numbers):
+        entry = dict(key, numbers=numbers, finished_at=time.strftime('%Y-%m-%dT%H:%M:%S'))
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        self.done[key['path']] = entry
+
+
+class CSVOutput:
+    """Single CSV file, appended to as videos finish.
+
+    The manifest is created together with the file, so an existing CSV
+    without one wasn't written by this tool and is never rewritten.
+    """
+
+    def __init__(self, path, manifest):
+        self.path = Path(path)
+        if self.path.exists():
+            if not manifest.path.exists():
+                raise OutputError(f"{self.path} exists but has no manifest ({manifest.path.name}); "
+                                  f"choose another --output or pass --no-resume to replace it")
+            self._drop_unfinished(set(manifest.done))
+        else:
+            manifest.path.touch()
+            with open(self.path, 'w', newline='', encoding='utf-8') as f:
+                csv.DictWriter(f, COLUMNS).writeheader()
+
+    @staticmethod
+    def clear(path):
+        Path(path).unlink(missing_ok=True)
+
+    def _drop_unfinished(self, finished):
+        """Remove rows of videos that were interrupted before reaching the manifest"""
+        with open(self.path, newline='', encoding='utf-8') as f:
+            reader = csv.DictReader(f)
+            if reader.fieldnames != COLUMNS:
+                raise OutputError(f"{self.path} has different columns than this tool writes; "
+                                  f"choose another --output or pass --no-resume to replace it")
+            rows = list(reader)
+        kept = [row for row in rows if row['video'] in finished]
+        if len(kept) == len(rows):
+            return
+        tmp = self.path.with_suffix(self.path.suffix + '.tmp')
+        with open(tmp, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, COLUMNS)
+            writer.writeheader()
+            writer.writerows(kept)
+        os.replace(tmp, self.path)
+
+    def write(self, path, rows):
+        with open(self.path, 'a', newline='', encoding='utf-8') as f:
+            csv.DictWriter(f, COLUMNS).writerows(rows)
+            f.flush()
+            os.fsync(f.fileno())
+
+
+class ParquetOutput:
+    """Directory of one Parquet file per video (read back with pandas.read_parquet(dir))"""
+
+    def __init__(self, path, manifest):
+        import pyarrow  # noqa: F401  fail early if pyarrow is missing
+
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def clear(path):
+        """Remove the Parquet files (and leftover temporary files) of earlier runs"""
+        path = Path(path)
+        if path.is_dir():
+            for file in [*path.glob('*.parquet'), *path.glob('.*.parquet.tmp')]:
+                file.unlink()
+
+    def write(self, path, rows):
+        import hashlib
+
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        schema = pa.schema([
+            ('video', pa.string()),
+            ('e164', pa.string()),
+            ('national', pa.string()),
+            ('first_seen_sec', pa.float64()),
+            ('last_seen_sec', pa.float64()),
+            ('frame_count', pa.int32()),
+            ('example_raw_hits', pa.string()),
+        ])
+        name = f"{Path(path).stem}-{hashlib.sha1(str(path).encode()).hexdigest()[:8]}.parquet"
+        tmp = self.path / f'.{name}.tmp'
+        pq.write_table(pa.Table.from_pylist(rows, schema=schema), tmp)
+        # Rename is atomic, so a file is either complete or absent
+        os.replace(tmp, self.path / name)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Extract phone numbers from many videos")
+    parser.add_argument('inputs', nargs='+', help="video files, directories or glob patterns")
+    parser.add_argument('-o', '--output', default='phones_by_video.csv',
+                        help="CSV file, or directory for --format parquet")
+    parser.add_argument('--format', choices=['csv', 'parquet'], default=None,
+                        help="output format (default: from the output name)")
+    parser.add_argument('--workers', type=int, default=max((os.cpu_count() or 2) // 2, 1))
+    parser.add_argument('--sample-fps', type=float, default=4, help="frames per second to OCR")
+    parser.add_argument('--region', default='IL', help="comma-separated region codes, e.g. IL,DE,US")
+    parser.add_argument('--min-conf', type=int, default=55, help="minimum OCR word confidence (0-100)")
+    parser.add_argument('--profile', default='standard', help="preprocessing profile: screen, standard, camera or auto")
+    parser.add_argument('--recursive', action='store_true', help="search directories recursively")
+    parser.add_argument('--no-resume', action='store_true',
+                        help="delete the output and its manifest, then start over")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    from api.matching import parse_regions
+
+    try:
+        regions = parse_regions(args.region)
+    except ValueError as e:
+        sys.exit(str(e))
+    output_format = args.format or ('csv' if args.output.endswith('.csv') else 'parquet')
+
+    manifest_path = Path(args.output.rstrip('/') + '.manifest.jsonl')
+    output_class = ParquetOutput if output_format == 'parquet' else CSVOutput
+    if args.no_resume:
+        manifest_path.unlink(missing_ok=True)
+        output_class.clear(args.output)
+    manifest = Manifest(manifest_path)
+    try:
+        output = output_class(args.output, manifest)
+    except OutputError as e:
+        sys.exit(str(e))
+
+    videos = find_videos(args.inputs, args.recursive)
+    pending = [(path, file_key(path)) for path in videos]
+    pending = [(path, key) for path, key in pending if not manifest.is_done(key)]
+    print(f"🎬 {len(videos)} videos found, {len(videos) - len(pending)} already done, {len(pending)} to process "
+          f"with {args.workers} workers")
+    if not pending:
+        return
+
+    total_numbers = 0
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker) as pool:
+        futures = {
+            pool.submit(process_video, path, args.sample_fps, regions, args.min_conf, args.profile): (path, key)
+            for path, key in pending
+        }
+        try:
+            for i, future in enumerate(as_completed(futures), 1):
+                path, key = futures[future]
+                try:
+                    rows, elapsed = future.result()
+                except Exception as e:
+                    print(f"❌ [{i}/{len(pending)}] {path.name}: {e}")
+                    continue
+                # Rows first, then the manifest: a crash in between only repeats this video
+                output.write(str(path), rows)
+                manifest.add(key, len(rows))
+                total_numbers += len(rows)
+                print(f"✅ [{i}/{len(pending)}] {path.name}: {len(rows)} numbers ({elapsed:.1f}s)")
+        except KeyboardInterrupt:
+            print("⏹️ Interrupted, finished videos are saved; run the same command again to resume")
+            pool.shutdown(wait=False, cancel_futures=True)
+            raise
+
+    print(f"\n📞 {total_numbers} numbers from {len(pending)} videos saved to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
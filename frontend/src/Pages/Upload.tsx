@@ -1,6 +1,6 @@
-import React, { useState, useEffect } from "react";
+import React, { useState } from "react";
 import axios from "axios";
-import { useWebSocket } from "../hooks/useWebSocket";
+import { useWebSocket, type WebSocketMessage } from "../hooks/useWebSocket";
 
 const Upload: React.FC = () => {
   const [selectedFile, setSelectedFile] = useState<File | null>(null);
@@ -12,36 +12,53 @@ const Upload: React.FC = () => {
   const [currentMessage, setCurrentMessage] = useState("");
   const [currentFrame, setCurrentFrame] = useState(0);
   const [totalFrames, setTotalFrames] = useState(0);
+  const [liveNumbers, setLiveNumbers] = useState<
+    { e164_number: string; national_number: string; first_seen_seconds: number }[]
+  >([]);
 
-  // WebSocket connection
-  const { isConnected, lastMessage, error: wsError } = useWebSocket(taskId);
-
-  // Handle WebSocket messages
-  useEffect(() => {
-    if (lastMessage) {
-      switch (lastMessage.type) {
-        case "progress_update":
-          setProgress(lastMessage.progress || 0);
-          setCurrentFrame(lastMessage.current_frame || 0);
-          setTotalFrames(lastMessage.total_frames || 0);
-          setCurrentMessage(lastMessage.message || "");
-          break;
-        case "task_completed":
-          setProgress(100);
-          setCurrentMessage(lastMessage.message || "Processing completed!");
-          setUploading(false);
-          // Fetch results
-          if (taskId) {
-            fetchResults(taskId);
-          }
-          break;
-        case "task_failed":
-          setError(lastMessage.error_message || "Processing failed");
-          setUploading(false);
-          break;
-      }
+  // Handle WebSocket messages: every one of them, phone_found events can
+  // arrive several per render
+  const handleMessage = (message: WebSocketMessage) => {
+    switch (message.type) {
+      case "progress_update":
+        setProgress(message.progress || 0);
+        setCurrentFrame(message.current_frame || 0);
+        setTotalFrames(message.total_frames || 0);
+        setCurrentMessage(message.message || "");
+        break;
+      case "phone_found":
+        // Numbers are pushed as soon as they are first seen
+        setLiveNumbers((numbers) =>
+          numbers.some((n) => n.e164_number === message.e164_number)
+            ? numbers
+            : [
+                ...numbers,
+                {
+                  e164_number: message.e164_number || "",
+                  national_number: message.national_number || "",
+                  first_seen_seconds: message.first_seen_seconds || 0,
+                },
+              ]
+        );
+        break;
+      case "task_completed":
+        setProgress(100);
+        setCurrentMessage(message.message || "Processing completed!");
+        setUploading(false);
+        // Fetch results
+        if (taskId) {
+          fetchResults(taskId);
+        }
+        break;
+      case "task_failed":
+        setError(message.error_message || "Processing failed");
+        setUploading(false);
+        break;
     }
-  }, [lastMessage, taskId]);
+  };
+
+  // WebSocket connection
+  const { isConnected, error: wsError } = useWebSocket(taskId, handleMessage);
 
   const fetchResults = async (taskId: string) => {
     try {
@@ -85,6 +102,7 @@ const Upload: React.FC = () => {
     setUploading(true);
     setError(null);
     setResults(null);
+    setLiveNumbers([]);
 
     try {
       const formData = new FormData();
@@ -256,6 +274,33 @@ const Upload: React.FC = () => {
                     {currentMessage}
                   </div>
                 )}
+
+                {/* Numbers found so far */}
+                {liveNumbers.length > 0 && (
+                  <div className="mt-4">
+                    <h4 className="text-sm font-semibold text-gray-800 mb-2">
+                      📞 Found so far ({liveNumbers.length}):
+                    </h4>
+                    <div className="space-y-1">
+                      {liveNumbers.map((phone) => (
+                        <div
+                          key={phone.e164_number}
+                          className="flex justify-between text-sm text-gray-700"
+                        >
+                          <span className="font-semibold">
+                            {phone.e164_number}{" "}
+                            <span className="font-normal text-gray-500">
+                              ({phone.national_number})
+                            </span>
+                          </span>
+                          <span className="text-gray-500">
+                            {phone.first_seen_seconds}s
+                          </span>
+                        </div>
+                      ))}
+                    </div>
+                  </div>
+                )}
               </div>
             )}
 
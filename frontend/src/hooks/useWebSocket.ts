@@ -1,6 +1,6 @@
 import { useEffect, useRef, useState } from "react";
 
-interface WebSocketMessage {
+export interface WebSocketMessage {
   type: string;
   task_id: string;
   status?: string;
@@ -10,13 +10,25 @@ interface WebSocketMessage {
   message?: string;
   error_message?: string;
   phone_numbers_count?: number;
+  e164_number?: string;
+  national_number?: string;
+  first_seen_seconds?: number;
+  raw_text?: string;
 }
 
-export const useWebSocket = (taskId: string | null) => {
+// onMessage sees every message in order; lastMessage only holds the latest,
+// so messages arriving back to back would overwrite each other before a render
+export const useWebSocket = (
+  taskId: string | null,
+  onMessage?: (message: WebSocketMessage) => void
+) => {
   const [socket, setSocket] = useState<WebSocket | null>(null);
   const [isConnected, setIsConnected] = useState(false);
   const [lastMessage, setLastMessage] = useState<WebSocketMessage | null>(null);
   const [error, setError] = useState<string | null>(null);
+  // Latest handler without reconnecting when it changes
+  const onMessageRef = useRef(onMessage);
+  onMessageRef.current = onMessage;
 
   useEffect(() => {
     if (!taskId) return;
@@ -34,6 +46,7 @@ export const useWebSocket = (taskId: string | null) => {
       try {
         const data: WebSocketMessage = JSON.parse(event.data);
         console.log("📨 WebSocket message:", data);
+        onMessageRef.current?.(data);
         setLastMessage(data);
       } catch (err) {
         console.error("❌ Error parsing WebSocket message:", err);
@@ -0,0 +1,136 @@
+import math
+import time
+
+from django.conf import settings
+
+
+# Per pixel of a frame, bytes a task holds besides the frames themselves:
+# preprocessing buffers plus the heavy OCR pass's 2x upscale
+WORK_BYTES_PER_PIXEL = 8
+# Frames aren't downscaled below this width, text gets too small to read
+MIN_WIDTH = 640
+# Sampling isn't thinned below this rate; past that the deadline just stops the task
+MIN_SAMPLE_FPS = 0.25
+# Processed frames before the frame rate is projected, and between re-projections
+PROJECTION_FRAMES = 10
+
+
+def frame_memory(width, height, channels, frames_held):
+    """Estimated bytes a task holds for frames of ``width`` x ``height``"""
+    return width * height * (channels * frames_held + WORK_BYTES_PER_PIXEL)
+
+
+class TaskBudget:
+    """Keeps a task inside its worker, memory and wall time budgets by degrading the work.
+
+    - max_workers caps how many OCR worker processes the task keeps busy
+    - max_memory_mb downscales frames until the task's frame working set
+      (``frame_memory``) fits
+    - max_wall_seconds lowers the effective sample rate when the projected
+      finish is past the deadline, and stops at the deadline, keeping the
+      numbers found so far
+
+    Each degradation is appended to ``task.degradations`` and saved at once.
+    A budget of None on the task falls back to the VIDEO_TASK_MAX_* setting;
+    0 means unlimited.
+    """
+
+    def __init__(self, task):
+        self.task = task
+        self.max_workers = self._limit(task.max_workers, settings.VIDEO_TASK_MAX_WORKERS)
+        self.max_memory_mb = self._limit(task.max_memory_mb, settings.VIDEO_TASK_MAX_MEMORY_MB)
+        self.max_wall_seconds = self._limit(task.max_wall_seconds, settings.VIDEO_TASK_MAX_WALL_SECONDS)
+        self.started = time.monotonic()
+        self.max_width = None
+        self.stride = 1
+        self.stopped = False
+
+    @staticmethod
+    def _limit(value, default):
+        return value if value is not None else default
+
+    def record(self, budget, action, detail, **extra):
+        entry = {'budget': budget, 'action': action, 'detail': detail, **extra}
+        self.task.degradations = list(self.task.degradations or []) + [entry]
+        self.task.save(update_fields=['degradations'])
+        print(f"🪫 {budget} budget: {detail}")
+
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    def exclude(self, seconds):
+        """Don't count ``seconds`` (a pause) against the wall time budget"""
+        self.started += seconds
+
+    def workers(self, available):
+        """How many of ``available`` OCR workers the task may keep busy"""
+        if self.max_workers and self.max_workers < available:
+            self.record('workers', 'limit_workers', f"using {self.max_workers} of {available} OCR workers")
+            return self.max_workers
+        return available
+
+    def plan_frames(self, width, height, channels, frames_held):
+        """Pick the frame width that fits the memory budget; None keeps full size"""
+        if not self.max_memory_mb or not width or not height:
+            return None
+        budget = self.max_memory_mb * 1024 * 1024
+        needed = frame_memory(width, height, channels, frames_held)
+        if needed <= budget:
+            return None
+        new_width = max(int(width * math.sqrt(budget / needed)) // 2 * 2, min(MIN_WIDTH, width))
+        if new_width >= width:
+            return None
+        new_height = max(int(height * new_width / width) // 2 * 2, 2)
+        self.max_width = new_width
+        detail = f"frames downscaled from {width}x{height} to {new_width}x{new_height}"
+        if frame_memory(new_width, new_height, channels, frames_held) > budget:
+            detail += f" (minimum width, still about {needed * (new_width / width) ** 2 / 1024 / 1024:.0f} MB)"
+        self.record('memory', 'downscale', detail)
+        return new_width
+
+    def frames(self, source, total_frames, tracker):
+        """Filter ``source`` down to the frames the budget allows, downscaled as planned.
+
+        ``tracker`` gets its gap tolerance widened when sampling is thinned,
+        so a number on screen the whole time still forms one appearance.
+        """
+        import cv2
+
+        sample_fps = source.video_fps / source.frame_interval
+        processed = 0
+        for sampled, (frame_idx, timestamp_sec, frame) in enumerate(source):
+            if sampled % self.stride:
+                continue
+            if self.max_wall_seconds:
+                elapsed = self.elapsed()
+                if elapsed >= self.max_wall_seconds:
+                    self.stopped = True
+                    self.record('wall_time', 'stop',
+                                f"stopped at {timestamp_sec:.1f}s of video after {elapsed:.0f}s",
+                                frame=frame_idx, elapsed_seconds=round(elapsed, 1))
+                    return
+                if processed >= PROJECTION_FRAMES and processed % PROJECTION_FRAMES == 0:
+                    self._project(processed, frame_idx, total_frames, source.frame_interval, sample_fps, tracker)
+            if self.max_width and frame.shape[1] > self.max_width:
+                height = max(int(frame.shape[0] * self.max_width / frame.shape[1]), 1)
+                frame = cv2.resize(frame, (self.max_width, height), interpolation=cv2.INTER_AREA)
+            processed += 1
+            yield frame_idx, timestamp_sec, frame
+
+    def _project(self, processed, frame_idx, total_frames, frame_interval, sample_fps, tracker):
+        """Thin the sampling if the remaining frames won't fit before the deadline"""
+        elapsed = self.elapsed()
+        seconds_per_frame = elapsed / processed
+        remaining = max(total_frames - frame_idx, 0) / (frame_interval * self.stride)
+        time_left = self.max_wall_seconds - elapsed
+        if remaining * seconds_per_frame <= time_left:
+            return
+        stride = math.ceil(self.stride * remaining * seconds_per_frame / max(time_left, 1e-3))
+        stride = min(stride, max(int(sample_fps / MIN_SAMPLE_FPS), 1))
+        if stride <= self.stride:
+            return
+        old_fps, new_fps = sample_fps / self.stride, sample_fps / stride
+        self.stride = stride
+        tracker.max_gap = 2 * stride / sample_fps
+        self.record('wall_time', 'lower_sample_fps', f"sample rate lowered from {old_fps:.2f} to {new_fps:.2f} fps",
+                    frame=frame_idx, elapsed_seconds=round(elapsed, 1), sample_fps=round(new_fps, 3))
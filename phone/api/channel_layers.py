@@ -0,0 +1,218 @@
+import asyncio
+import json
+import random
+import sqlite3
+import string
+import threading
+import time
+
+from channels.exceptions import ChannelFull
+from channels.layers import BaseChannelLayer
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS channel_messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    channel TEXT NOT NULL,
+    expires REAL NOT NULL,
+    body TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS channel_messages_channel_idx ON channel_messages (channel, id);
+CREATE TABLE IF NOT EXISTS channel_groups (
+    group_name TEXT NOT NULL,
+    channel TEXT NOT NULL,
+    expires REAL NOT NULL,
+    PRIMARY KEY (group_name, channel)
+);
+"""
+
+# SQLite caps the number of bound parameters per statement
+_IN_CHUNK = 500
+
+
+class SQLiteChannelLayer(BaseChannelLayer):
+    """Channel layer shared by every process on one host through a SQLite file.
+
+    Messages are rows in a WAL-mode database, so a processing subprocess or a
+    second daphne instance can reach consumers attached to another process
+    without running Redis. Each process runs one poller per event loop that
+    fetches messages for all of its local channels in a single query, backing
+    off from ``poll_interval`` to ``max_poll_interval`` while idle.
+    """
+
+    extensions = ['groups', 'flush']
+
+    def __init__(self, path='channels.sqlite3', expiry=60, group_expiry=86400, capacity=100,
+                 channel_capacity=None, poll_interval=0.01, max_poll_interval=0.1, **kwargs):
+        super().__init__(expiry=expiry, capacity=capacity, channel_capacity=channel_capacity, **kwargs)
+        self.path = str(path)
+        self.group_expiry = group_expiry
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max_poll_interval
+        self.channel_capacity = self.compile_capacities(self.channel_capacity)
+        self._local = threading.local()
+        self._queues = {}
+        self._poller = None
+        self._loop = None
+        self._last_cleanup = 0.0
+        self._connect()
+
+    # Storage
+
+    def _connect(self):
+        """Return this thread's connection, creating the schema on first use"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.executescript(SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    async def _run(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+
+    def _send_many(self, channels, body):
+        """Insert ``body`` for each channel with room; returns the channels that were full"""
+        conn = self._connect()
+        now = time.time()
+        full = []
+        with conn:
+            for channel in channels:
+                count = conn.execute(
+                    'SELECT COUNT(*) FROM channel_messages WHERE channel = ? AND expires > ?',
+                    (channel, now)
+                ).fetchone()[0]
+                if count >= self.get_capacity(channel):
+                    full.append(channel)
+                    continue
+                conn.execute(
+                    'INSERT INTO channel_messages (channel, expires, body) VALUES (?, ?, ?)',
+                    (channel, now + self.expiry, body)
+                )
+        return full
+
+    def _fetch(self, channels):
+        """Pop every pending, unexpired message for ``channels``, oldest first"""
+        conn = self._connect()
+        now = time.time()
+        messages = []
+        with conn:
+            for i in range(0, len(channels), _IN_CHUNK):
+                chunk = channels[i:i + _IN_CHUNK]
+                marks = ','.join('?' * len(chunk))
+                rows = conn.execute(
+                    f'SELECT id, channel, expires, body FROM channel_messages '
+                    f'WHERE channel IN ({marks}) ORDER BY id',
+                    chunk
+                ).fetchall()
+                if rows:
+                    conn.execute(
+                        f'DELETE FROM channel_messages WHERE id IN ({",".join("?" * len(rows))})',
+                        [row[0] for row in rows]
+                    )
+                messages.extend((channel, body) for _, channel, expires, body in rows if expires > now)
+            if now - self._last_cleanup > self.expiry:
+                self._last_cleanup = now
+                conn.execute('DELETE FROM channel_messages WHERE expires <= ?', (now,))
+                conn.execute('DELETE FROM channel_groups WHERE expires <= ?', (now,))
+        return messages
+
+    def _group_channels(self, group):
+        return [row[0] for row in self._connect().execute(
+            'SELECT channel FROM channel_groups WHERE group_name = ? AND expires > ?',
+            (group, time.time())
+        )]
+
+    # Channel layer API
+
+    async def send(self, channel, message):
+        assert isinstance(message, dict), "message is not a dict"
+        self.require_valid_channel_name(channel)
+        assert "__asgi_channel__" not in message
+        full = await self._run(self._send_many, [channel], json.dumps(message))
+        if full:
+            raise ChannelFull(channel)
+
+    async def receive(self, channel):
+        self.require_valid_channel_name(channel)
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Queues and the poller belong to one event loop
+            self._loop = loop
+            self._queues = {}
+            self._poller = None
+        queue = self._queues.get(channel)
+        if queue is None:
+            queue = self._queues[channel] = asyncio.Queue()
+        if self._poller is None or self._poller.done():
+            self._poller = loop.create_task(self._poll())
+        try:
+            return await queue.get()
+        except asyncio.CancelledError:
+            # The consumer went away; stop fetching for its channel
+            if queue.empty() and self._queues.get(channel) is queue:
+                del self._queues[channel]
+            raise
+
+    async def _poll(self):
+        delay = self.poll_interval
+        while self._queues:
+            messages = await self._run(self._fetch, list(self._queues))
+            for channel, body in messages:
+                queue = self._queues.get(channel)
+                if queue is not None:
+                    queue.put_nowait(json.loads(body))
+            if messages:
+                delay = self.poll_interval
+                continue
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.max_poll_interval)
+
+    async def new_channel(self, prefix="specific"):
+        return f"{prefix}.sqlite!{''.join(random.choices(string.ascii_letters, k=12))}"
+
+    async def flush(self):
+        def _flush():
+            with self._connect() as conn:
+                conn.execute('DELETE FROM channel_messages')
+                conn.execute('DELETE FROM channel_groups')
+        await self._run(_flush)
+        self._queues = {}
+
+    async def close(self):
+        pass
+
+    # Groups
+
+    async def group_add(self, group, channel):
+        self.require_valid_group_name(group)
+        self.require_valid_channel_name(channel)
+
+        def _add():
+            with self._connect() as conn:
+                conn.execute(
+                    'INSERT OR REPLACE INTO channel_groups (group_name, channel, expires) VALUES (?, ?, ?)',
+                    (group, channel, time.time() + self.group_expiry)
+                )
+        await self._run(_add)
+
+    async def group_discard(self, group, channel):
+        self.require_valid_group_name(group)
+        self.require_valid_channel_name(channel)
+
+        def _discard():
+            with self._connect() as conn:
+                conn.execute('DELETE FROM channel_groups WHERE group_name = ? AND channel = ?', (group, channel))
+        await self._run(_discard)
+
+    async def group_send(self, group, message):
+        assert isinstance(message, dict), "Message is not a dict"
+        self.require_valid_group_name(group)
+        body = json.dumps(message)
+
+        def _group_send():
+            # Full member channels just miss the message, as with the other layers
+            self._send_many(self._group_channels(group), body)
+        await self._run(_group_send)
@@ -1,7 +1,15 @@
+import asyncio
 import json
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
+from django.core.exceptions import ValidationError
 from .models import VideoProcessingTask
+from .snapshots import aget_snapshot, aget_snapshots, snapshot_from_task
+from .task_control import ACTIONS, TaskControlError, control_task
+
+
+# Every task event is also sent here, for dashboards subscribed to all tasks
+ALL_TASKS_GROUP = 'video_tasks'
 
 
 class VideoProcessingConsumer(AsyncWebsocketConsumer):
@@ -18,17 +26,7 @@ class VideoProcessingConsumer(AsyncWebsocketConsumer):
         await self.accept()
         
         # Send initial status
-        task = await self.get_task()
-        if task:
-            await self.send(text_data=json.dumps({
-                'type': 'task_status',
-                'task_id': str(task.id),
-                'status': task.status,
-                'progress': task.progress,
-                'current_frame': task.current_frame,
-                'total_frames': task.total_frames,
-                'message': task.current_message
-            }))
+        await self.send_status()
     
     async def disconnect(self, close_code):
         # Leave task group
@@ -42,17 +40,26 @@ class VideoProcessingConsumer(AsyncWebsocketConsumer):
         message_type = text_data_json.get('type')
         
         if message_type == 'get_status':
-            task = await self.get_task()
-            if task:
-                await self.send(text_data=json.dumps({
-                    'type': 'task_status',
-                    'task_id': str(task.id),
-                    'status': task.status,
-                    'progress': task.progress,
-                    'current_frame': task.current_frame,
-                    'total_frames': task.total_frames,
-                    'message': task.current_message
-                }))
+            await self.send_status()
+        elif message_type in ACTIONS:
+            await self.send_control(message_type)
+    
+    async def send_control(self, action):
+        # Running tasks report the change themselves once they reach the next frame
+        try:
+            status = await self.control_task(action)
+        except TaskControlError as e:
+            await self.send(text_data=json.dumps({'type': 'control_error', 'action': action, 'message': str(e)}))
+            return
+        await self.send(text_data=json.dumps({'type': 'control_accepted', 'action': action, 'status': status}))
+    
+    async def send_status(self):
+        # Served from the snapshot cache; the database is only read on a miss
+        snapshot = await aget_snapshot(self.task_id)
+        if snapshot is None:
+            snapshot = await self.get_task_snapshot()
+        if snapshot:
+            await self.send(text_data=json.dumps({'type': 'task_status', **snapshot}))
     
     # Receive message from task group
     async def progress_update(self, event):
@@ -67,6 +74,18 @@ class VideoProcessingConsumer(AsyncWebsocketConsumer):
             'status': event['status']
         }))
     
+    # Receive message from task group
+    async def phone_found(self, event):
+        # Send message to WebSocket
+        await self.send(text_data=json.dumps({
+            'type': 'phone_found',
+            'task_id': event['task_id'],
+            'e164_number': event['e164_number'],
+            'national_number': event['national_number'],
+            'first_seen_seconds': event['first_seen_seconds'],
+            'raw_text': event['raw_text']
+        }))
+    
     # Receive message from task group
     async def task_completed(self, event):
         # Send message to WebSocket
@@ -79,6 +98,17 @@ class VideoProcessingConsumer(AsyncWebsocketConsumer):
             'phone_numbers_count': event.get('phone_numbers_count', 0)
         }))
     
+    # Receive message from task group
+    async def task_cancelled(self, event):
+        # Send message to WebSocket
+        await self.send(text_data=json.dumps({
+            'type': 'task_cancelled',
+            'task_id': event['task_id'],
+            'status': event['status'],
+            'message': event['message'],
+            'phone_numbers_count': event.get('phone_numbers_count', 0)
+        }))
+    
     # Receive message from task group
     async def task_failed(self, event):
         # Send message to WebSocket
@@ -90,8 +120,179 @@ class VideoProcessingConsumer(AsyncWebsocketConsumer):
         }))
     
     @database_sync_to_async
-    def get_task(self):
+    def control_task(self, action):
+        try:
+            return control_task(self.task_id, action)
+        except (VideoProcessingTask.DoesNotExist, ValidationError):
+            raise TaskControlError("Task not found")
+    
+    @database_sync_to_async
+    def get_task_snapshot(self):
         try:
-            return VideoProcessingTask.objects.get(id=self.task_id)
-        except VideoProcessingTask.DoesNotExist:
+            task = VideoProcessingTask.objects.get(id=self.task_id)
+        except (VideoProcessingTask.DoesNotExist, ValidationError):
             return None
+        # Not written back: the cache is process-local by default and the task
+        # may be running in another process that never refreshes this entry
+        return snapshot_from_task(task)
+
+
+class TaskDashboardConsumer(AsyncWebsocketConsumer):
+    """One socket watching many tasks.
+
+    Clients send {"type": "subscribe", "task_ids": [...]} or
+    {"type": "subscribe", "all": true} (and the matching "unsubscribe").
+    Events are coalesced per task and flushed at most every FLUSH_INTERVAL
+    seconds as a single "tasks_update" message containing only the fields
+    that changed since the last flush.
+    """
+    
+    FLUSH_INTERVAL = 0.5
+    MAX_SUBSCRIPTIONS = 1000
+    STATE_FIELDS = ('status', 'progress', 'current_frame', 'total_frames', 'message', 'phone_numbers_found')
+    
+    async def connect(self):
+        self.task_ids = set()
+        self.subscribed_all = False
+        # Last state sent to the client, and changes waiting for the next flush
+        self.sent = {}
+        self.pending = {}
+        self.flush_task = None
+        await self.accept()
+    
+    async def disconnect(self, close_code):
+        if self.flush_task:
+            self.flush_task.cancel()
+        for task_id in self.task_ids:
+            await self.channel_layer.group_discard(f'video_task_{task_id}', self.channel_name)
+        if self.subscribed_all:
+            await self.channel_layer.group_discard(ALL_TASKS_GROUP, self.channel_name)
+    
+    async def receive(self, text_data):
+        try:
+            text_data_json = json.loads(text_data)
+        except ValueError:
+            return
+        message_type = text_data_json.get('type')
+        task_ids = [str(task_id) for task_id in text_data_json.get('task_ids') or []]
+        
+        if message_type == 'subscribe':
+            if text_data_json.get('all'):
+                await self.subscribe_all()
+            await self.subscribe(task_ids)
+        elif message_type == 'unsubscribe':
+            if text_data_json.get('all') and self.subscribed_all:
+                await self.unsubscribe_all()
+            for task_id in task_ids:
+                if task_id in self.task_ids:
+                    self.task_ids.discard(task_id)
+                    await self.channel_layer.group_discard(f'video_task_{task_id}', self.channel_name)
+    
+    async def subscribe(self, task_ids):
+        new_ids = [task_id for task_id in task_ids if task_id not in self.task_ids]
+        new_ids = new_ids[:max(self.MAX_SUBSCRIPTIONS - len(self.task_ids), 0)]
+        if not new_ids:
+            return
+        self.task_ids.update(new_ids)
+        if not self.subscribed_all:
+            for task_id in new_ids:
+                await self.channel_layer.group_add(f'video_task_{task_id}', self.channel_name)
+        
+        # Initial state: snapshot cache first, one database query for the misses
+        snapshots = await aget_snapshots(new_ids)
+        misses = [task_id for task_id in new_ids if task_id not in snapshots]
+        if misses:
+            snapshots.update(await self.get_task_snapshots(misses))
+        for task_id, snapshot in snapshots.items():
+            self.queue_update(task_id, snapshot)
+    
+    async def subscribe_all(self):
+        if self.subscribed_all:
+            return
+        self.subscribed_all = True
+        await self.channel_layer.group_add(ALL_TASKS_GROUP, self.channel_name)
+        # The all-tasks group already carries every event
+        for task_id in self.task_ids:
+            await self.channel_layer.group_discard(f'video_task_{task_id}', self.channel_name)
+        for task_id, snapshot in (await self.get_active_task_snapshots()).items():
+            self.queue_update(task_id, snapshot)
+    
+    async def unsubscribe_all(self):
+        self.subscribed_all = False
+        # Back to the per-task groups of the tasks still subscribed by id
+        for task_id in self.task_ids:
+            await self.channel_layer.group_add(f'video_task_{task_id}', self.channel_name)
+        await self.channel_layer.group_discard(ALL_TASKS_GROUP, self.channel_name)
+    
+    def queue_update(self, task_id, changes):
+        pending = self.pending.setdefault(task_id, {})
+        pending.update({key: value for key, value in changes.items() if key in self.STATE_FIELDS})
+        if self.flush_task is None or self.flush_task.done():
+            self.flush_task = asyncio.ensure_future(self.flush_later())
+    
+    async def flush_later(self):
+        await asyncio.sleep(self.FLUSH_INTERVAL)
+        pending, self.pending = self.pending, {}
+        updates = []
+        for task_id, changes in pending.items():
+            sent = self.sent.setdefault(task_id, {})
+            diff = {key: value for key, value in changes.items() if sent.get(key) != value}
+            if diff:
+                sent.update(diff)
+                updates.append({'task_id': task_id, **diff})
+        if updates:
+            await self.send(text_data=json.dumps({'type': 'tasks_update', 'tasks': updates}))
+    
+    def is_watched(self, task_id):
+        return self.subscribed_all or task_id in self.task_ids
+    
+    # Receive messages from task groups
+    async def progress_update(self, event):
+        if self.is_watched(event['task_id']):
+            self.queue_update(event['task_id'], event)
+    
+    async def phone_found(self, event):
+        task_id = event['task_id']
+        if self.is_watched(task_id):
+            found = self.pending.get(task_id, {}).get('phone_numbers_found', self.sent.get(task_id, {}).get('phone_numbers_found', 0))
+            self.queue_update(task_id, {'phone_numbers_found': found + 1})
+    
+    async def task_completed(self, event):
+        if self.is_watched(event['task_id']):
+            self.queue_update(event['task_id'], {
+                'status': event['status'],
+                'progress': 100,
+                'message': event['message'],
+                'phone_numbers_found': event.get('phone_numbers_count', 0)
+            })
+    
+    async def task_cancelled(self, event):
+        if self.is_watched(event['task_id']):
+            self.queue_update(event['task_id'], {
+                'status': event['status'],
+                'message': event['message'],
+                'phone_numbers_found': event.get('phone_numbers_count', 0)
+            })
+    
+    async def task_failed(self, event):
+        if self.is_watched(event['task_id']):
+            self.queue_update(event['task_id'], {'status': event['status'], 'message': event['error_message']})
+    
+    @database_sync_to_async
+    def get_task_snapshots(self, task_ids):
+        try:
+            tasks = list(VideoProcessingTask.objects.filter(id__in=task_ids))
+        except ValidationError:
+            # Malformed ids: look them up one by one and skip the bad ones
+            tasks = []
+            for task_id in task_ids:
+                try:
+                    tasks.extend(VideoProcessingTask.objects.filter(id=task_id))
+                except ValidationError:
+                    continue
+        return {str(task.id): snapshot_from_task(task) for task in tasks}
+    
+    @database_sync_to_async
+    def get_active_task_snapshots(self):
+        tasks = VideoProcessingTask.objects.filter(status__in=['pending', 'processing', 'paused'])[:self.MAX_SUBSCRIPTIONS]
+        return {str(task.id): snapshot_from_task(task) for task in tasks}
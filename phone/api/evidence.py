@@ -0,0 +1,127 @@
+import queue
+import shutil
+import threading
+from pathlib import Path
+
+from django.conf import settings
+
+
+def evidence_dir(task_id):
+    """Directory holding the evidence crops of one task"""
+    return Path(settings.VIDEO_RESULTS_DIR) / 'evidence' / str(task_id)
+
+
+def delete_evidence(task_id):
+    shutil.rmtree(evidence_dir(task_id), ignore_errors=True)
+
+
+def crop_box(frame, box, padding=8):
+    """Copy the padded ``box`` region out of ``frame`` (frame buffers get reused)"""
+    x, y, w, h = box
+    height, width = frame.shape[:2]
+    x0, y0 = max(x - padding, 0), max(y - padding, 0)
+    x1, y1 = min(x + w + padding, width), min(y + h + padding, height)
+    if x1 <= x0 or y1 <= y0:
+        return None
+    return frame[y0:y1, x0:x1].copy()
+
+
+class EvidenceWriter:
+    """Encodes and writes evidence crops on a background thread.
+
+    The OCR loop only copies the crop and hands it over; encoding and disk
+    I/O happen here. If the queue is full the crop is dropped rather than
+    stalling the loop.
+    """
+
+    def __init__(self, directory, image_format='webp', quality=70, max_width=320, max_pending=64):
+        import cv2
+
+        self.directory = Path(directory)
+        self.extension = f'.{image_format}'
+        quality_flag = cv2.IMWRITE_WEBP_QUALITY if image_format == 'webp' else cv2.IMWRITE_JPEG_QUALITY
+        self.params = [quality_flag, quality]
+        self.max_width = max_width
+        self.queue = queue.Queue(maxsize=max_pending)
+        self.dropped = 0
+        self.written = 0
+        self._thread = None
+
+    def submit(self, name, crop):
+        """Queue ``crop`` to be saved as ``name``; returns the file name or None if dropped"""
+        if self._thread is None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self._thread = threading.Thread(target=self._run, name='evidence-writer', daemon=True)
+            self._thread.start()
+        filename = f'{name}{self.extension}'
+        try:
+            self.queue.put_nowait((filename, crop))
+        except queue.Full:
+            self.dropped += 1
+            return None
+        return filename
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            try:
+                if item is None:
+                    return
+                self._write(*item)
+            except Exception as e:
+                print(f"⚠️ Could not write evidence crop: {e}")
+            finally:
+                self.queue.task_done()
+
+    def _write(self, filename, crop):
+        import cv2
+
+        height, width = crop.shape[:2]
+        if width > self.max_width:
+            crop = cv2.resize(crop, (self.max_width, max(int(height * self.max_width / width), 1)),
+                              interpolation=cv2.INTER_AREA)
+        ok, encoded = cv2.imencode(self.extension, crop, self.params)
+        if ok:
+            (self.directory / filename).write_bytes(encoded.tobytes())
+            self.written += 1
+
+    def close(self):
+        """Wait until every queued crop is on disk"""
+        if self._thread is not None:
+            self.queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+
+class EvidenceCollector:
+    """Keeps the first ``per_number`` sightings of each number with a cropped thumbnail"""
+
+    def __init__(self, writer, per_number=3):
+        self.writer = writer
+        self.per_number = per_number
+        self.entries = {}
+
+    def observe(self, e164, frame, frame_idx, timestamp_sec, box):
+        entries = self.entries.setdefault(e164, [])
+        if len(entries) >= self.per_number or box is None:
+            return
+        # One sighting per frame, however many passes read the number
+        if entries and entries[-1]['frame_idx'] == frame_idx:
+            return
+        crop = crop_box(frame, box)
+        if crop is None:
+            return
+        filename = self.writer.submit(f'{e164.lstrip("+")}_{len(entries)}', crop)
+        if filename:
+            entries.append({
+                'frame_idx': frame_idx,
+                'timestamp_seconds': round(timestamp_sec, 3),
+                'bbox': box,
+                'image': filename,
+            })
+
+    def get(self, e164):
+        return self.entries.get(e164, [])
+
+    def close(self):
+        self.writer.close()
@@ -0,0 +1,130 @@
+import csv
+import itertools
+import json
+import tempfile
+
+from asgiref.sync import sync_to_async
+from django.http import StreamingHttpResponse
+
+
+EXPORT_COLUMNS = [
+    'task_id', 'e164_number', 'national_number', 'first_seen_seconds',
+    'last_seen_seconds', 'frame_count', 'appearances', 'raw_text_examples',
+]
+
+EXPORT_FORMATS = ('csv', 'ndjson', 'parquet')
+
+# Rows fetched per database round trip; bounds memory for any result set size
+CHUNK_SIZE = 2000
+# Bytes of the finished Parquet file sent per chunk
+FILE_CHUNK_BYTES = 1024 * 1024
+
+
+class _Echo:
+    """File-like object whose write() just hands the line back to csv.writer"""
+
+    def write(self, value):
+        return value
+
+
+def _rows(queryset):
+    for row in queryset.values_list(*EXPORT_COLUMNS).iterator(chunk_size=CHUNK_SIZE):
+        row = dict(zip(EXPORT_COLUMNS, row))
+        row['task_id'] = str(row['task_id'])
+        yield row
+
+
+def _next_chunk(rows):
+    return list(itertools.islice(rows, CHUNK_SIZE))
+
+
+async def _arows(queryset):
+    # Daphne reads a sync iterator into a list before sending anything, so the
+    # responses get async generators that fetch CHUNK_SIZE rows per thread hop
+    rows = _rows(queryset)
+    try:
+        while chunk := await sync_to_async(_next_chunk)(rows):
+            for row in chunk:
+                yield row
+    finally:
+        # Closes the database cursor in the thread that opened it
+        await sync_to_async(rows.close)()
+
+
+async def _csv_lines(queryset):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORT_COLUMNS)
+    async for row in _arows(queryset):
+        row['appearances'] = json.dumps(row['appearances'])
+        yield writer.writerow([row[column] for column in EXPORT_COLUMNS])
+
+
+async def _ndjson_lines(queryset):
+    async for row in _arows(queryset):
+        yield json.dumps(row) + '\n'
+
+
+def _parquet_file(queryset):
+    """Write row groups of CHUNK_SIZE rows to a spooled temp file"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ('task_id', pa.string()),
+        ('e164_number', pa.string()),
+        ('national_number', pa.string()),
+        ('first_seen_seconds', pa.float64()),
+        ('last_seen_seconds', pa.float64()),
+        ('frame_count', pa.int32()),
+        ('appearances', pa.list_(pa.list_(pa.float64()))),
+        ('raw_text_examples', pa.string()),
+    ])
+    output = tempfile.SpooledTemporaryFile(max_size=16 * 1024 * 1024)
+    with pq.ParquetWriter(output, schema) as writer:
+        batch = []
+        for row in _rows(queryset):
+            batch.append(row)
+            if len(batch) >= CHUNK_SIZE:
+                writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+                batch = []
+        if batch:
+            writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+    output.seek(0)
+    return output
+
+
+async def _parquet_chunks(queryset):
+    """The Parquet file in FILE_CHUNK_BYTES pieces (the footer needs every row first)"""
+    output = await sync_to_async(_parquet_file)(queryset)
+    try:
+        while chunk := await sync_to_async(output.read)(FILE_CHUNK_BYTES):
+            yield chunk
+    finally:
+        output.close()
+
+
+def parquet_available():
+    try:
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def export_response(queryset, export_format, filename):
+    """Build a streaming response for PhoneNumberResult rows.
+
+    The content is an async iterator, which the ASGI server sends chunk by
+    chunk as it is produced.
+    """
+    queryset = queryset.order_by('task_id', 'first_seen_seconds', 'e164_number')
+    if export_format == 'csv':
+        response = StreamingHttpResponse(_csv_lines(queryset), content_type='text/csv')
+    elif export_format == 'ndjson':
+        response = StreamingHttpResponse(_ndjson_lines(queryset), content_type='application/x-ndjson')
+    elif export_format == 'parquet':
+        response = StreamingHttpResponse(_parquet_chunks(queryset), content_type='application/vnd.apache.parquet')
+    else:
+        raise ValueError(f"Unknown export format: {export_format}")
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{export_format}"'
+    return response
@@ -0,0 +1,74 @@
+import queue
+from multiprocessing import shared_memory
+from typing import NamedTuple
+
+import numpy as np
+
+
+class FrameSlot(NamedTuple):
+    """Where a frame sits in a FrameRing; this is all that goes down the pipe"""
+    index: int
+    shape: tuple
+    dtype: str
+
+
+def slot_view(buf, slot, slot_bytes):
+    """ndarray over ``slot``'s frame in the shared buffer ``buf`` (no copy)"""
+    return np.ndarray(slot.shape, dtype=slot.dtype, buffer=buf, offset=slot.index * slot_bytes)
+
+
+class FrameRing:
+    """Fixed-size frame slots in one shared memory block.
+
+    The producer copies a decoded frame into a free slot and hands the small
+    FrameSlot to a worker process, which maps the same block (``attach``)
+    and reads the frame in place instead of unpickling a copy. Slots go
+    back on the free list only through ``release``, once neither side needs
+    the frame; ``acquire`` blocks while every slot is taken, which is the
+    backpressure on decoding.
+    """
+
+    def __init__(self, slots, slot_bytes):
+        self.slots = slots
+        self.slot_bytes = slot_bytes
+        self.shm = shared_memory.SharedMemory(create=True, size=slots * slot_bytes)
+        self.name = self.shm.name
+        self._free = queue.Queue()
+        for index in range(slots):
+            self._free.put(index)
+
+    def fits(self, frame):
+        return frame.nbytes <= self.slot_bytes
+
+    def acquire(self, block=True, timeout=None):
+        """Index of a free slot, or None if none frees up in time"""
+        try:
+            return self._free.get(block, timeout)
+        except queue.Empty:
+            return None
+
+    def release(self, index):
+        self._free.put(index)
+
+    def free(self):
+        return self._free.qsize()
+
+    def write(self, index, frame):
+        """Copy ``frame`` into slot ``index``; returns (FrameSlot, view of the copy)"""
+        slot = FrameSlot(index, frame.shape, frame.dtype.str)
+        view = slot_view(self.shm.buf, slot, self.slot_bytes)
+        np.copyto(view, frame)
+        return slot, view
+
+    def close(self):
+        try:
+            self.shm.close()
+        except BufferError:
+            # Views into the block are still alive; unlinking is what matters
+            pass
+        self.shm.unlink()
+
+
+def attach(name):
+    """Map an existing ring's block in a worker process"""
+    return shared_memory.SharedMemory(name=name)
@@ -0,0 +1,163 @@
+import shutil
+
+import cv2
+import numpy as np
+
+
+class OpenCVFrameSource:
+    """Decode sampled frames with cv2.VideoCapture (BGR frames)"""
+
+    name = 'opencv'
+    channels = 3
+
+    def __init__(self, video_path, sample_fps):
+        self.video_path = video_path
+        self.cap = cv2.VideoCapture(video_path)
+        if not self.cap.isOpened():
+            raise RuntimeError(f"Cannot open video: {video_path}")
+
+        self.video_fps = self.cap.get(cv2.CAP_PROP_FPS) or 25
+        self.frame_interval = max(int(round(self.video_fps / sample_fps)), 1)
+        self.total_frames = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        self.width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+
+    def __iter__(self):
+        """Yield (frame_idx, timestamp_sec, frame) for every sampled frame"""
+        frame_idx = -1
+        while True:
+            frame_idx += 1
+            # grab() demuxes/decodes without converting the frame to BGR,
+            # so skipped frames never reach Python
+            if frame_idx % self.frame_interval != 0:
+                if not self.cap.grab():
+                    break
+                continue
+            ret, frame = self.cap.read()
+            if not ret:
+                break
+            yield frame_idx, frame_idx / self.video_fps, frame
+
+    def release(self):
+        self.cap.release()
+
+
+class FFmpegFrameSource:
+    """Decode sampled frames with an ffmpeg subprocess (grayscale frames).
+
+    Frame-rate sampling, downscaling and grayscale conversion all run inside
+    ffmpeg via ``-vf fps=N,scale=W:H,format=gray``; raw frames are streamed over
+    a pipe into a preallocated buffer. The yielded array is reused, so callers
+    must copy it if they need it past the next iteration.
+    """
+
+    name = 'ffmpeg'
+    channels = 1
+
+    def __init__(self, video_path, sample_fps, max_width=1920):
+        import ffmpeg
+
+        self.video_path = video_path
+        self.sample_fps = sample_fps
+
+        try:
+            probe = ffmpeg.probe(video_path)
+        except ffmpeg.Error as e:
+            raise RuntimeError(f"Cannot open video: {video_path} ({e.stderr.decode(errors='ignore').strip()})")
+
+        stream = next((s for s in probe['streams'] if s.get('codec_type') == 'video'), None)
+        if stream is None:
+            raise RuntimeError(f"Cannot open video: {video_path} (no video stream)")
+
+        self.video_fps = self._parse_rate(stream.get('avg_frame_rate')) or self._parse_rate(stream.get('r_frame_rate')) or 25
+        self.frame_interval = max(int(round(self.video_fps / sample_fps)), 1)
+
+        nb_frames = stream.get('nb_frames')
+        if nb_frames and str(nb_frames).isdigit():
+            self.total_frames = int(nb_frames)
+        else:
+            duration = float(stream.get('duration') or probe.get('format', {}).get('duration') or 0)
+            self.total_frames = int(duration * self.video_fps)
+
+        width, height = int(stream['width']), int(stream['height'])
+        if self._rotation(stream) in (90, 270):
+            width, height = height, width
+        if width > max_width:
+            height = max(int(round(height * max_width / width / 2)) * 2, 2)
+            width = max_width
+        self.width, self.height = width, height
+
+        self.process = (
+            ffmpeg
+            .input(video_path)
+            .filter('fps', fps=sample_fps)
+            .filter('scale', width, height)
+            .filter('format', 'gray')
+            .output('pipe:', format='rawvideo', pix_fmt='gray')
+            .global_args('-loglevel', 'error', '-nostdin')
+            .run_async(pipe_stdout=True, pipe_stderr=False)
+        )
+        self._buffer = np.empty((height, width), dtype=np.uint8)
+
+    @staticmethod
+    def _parse_rate(rate):
+        try:
+            num, _, den = str(rate).partition('/')
+            value = float(num) / float(den or 1)
+        except (TypeError, ValueError, ZeroDivisionError):
+            return None
+        return value or None
+
+    @staticmethod
+    def _rotation(stream):
+        rotate = stream.get('tags', {}).get('rotate')
+        if rotate is None:
+            for side_data in stream.get('side_data_list', []):
+                if 'rotation' in side_data:
+                    rotate = side_data['rotation']
+        try:
+            return int(float(rotate)) % 360
+        except (TypeError, ValueError):
+            return 0
+
+    def _read_into_buffer(self):
+        view = memoryview(self._buffer).cast('B')
+        filled = 0
+        while filled < len(view):
+            n = self.process.stdout.readinto(view[filled:])
+            if not n:
+                return False
+            filled += n
+        return True
+
+    def __iter__(self):
+        """Yield (frame_idx, timestamp_sec, frame) for every sampled frame"""
+        out_idx = 0
+        while self._read_into_buffer():
+            timestamp_sec = out_idx / self.sample_fps
+            yield int(round(timestamp_sec * self.video_fps)), timestamp_sec, self._buffer
+            out_idx += 1
+
+    def release(self):
+        if self.process.poll() is None:
+            self.process.kill()
+        self.process.stdout.close()
+        self.process.wait()
+
+
+def ffmpeg_available():
+    """Check that the ffmpeg/ffprobe binaries and ffmpeg-python are usable"""
+    try:
+        import ffmpeg  # noqa: F401
+    except ImportError:
+        return False
+    return bool(shutil.which('ffmpeg') and shutil.which('ffprobe'))
+
+
+def open_frame_source(video_path, sample_fps, decoder='opencv', max_width=1920):
+    """Open the configured decode backend, falling back to OpenCV"""
+    if decoder == 'ffmpeg':
+        if ffmpeg_available():
+            return FFmpegFrameSource(video_path, sample_fps, max_width=max_width)
+        print("⚠️ ffmpeg decoder requested but ffmpeg is not available - falling back to OpenCV")
+    return OpenCVFrameSource(video_path, sample_fps)
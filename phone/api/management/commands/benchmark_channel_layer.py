@@ -0,0 +1,96 @@
+import asyncio
+import multiprocessing
+import os
+import tempfile
+import time
+
+from channels.layers import InMemoryChannelLayer
+from django.core.management.base import BaseCommand
+
+from api.channel_layers import SQLiteChannelLayer
+
+
+# Messages in flight per round; stays under the default channel capacity
+WINDOW = 50
+
+
+def _message(i):
+    return {'type': 'progress_update', 'task_id': 'bench', 'progress': i % 100, 'current_frame': i,
+            'total_frames': 1000, 'message': f'Processing frame {i}'}
+
+
+async def _point_to_point(layer, count):
+    channel = await layer.new_channel()
+    start = time.perf_counter()
+    for base in range(0, count, WINDOW):
+        n = min(WINDOW, count - base)
+        for i in range(n):
+            await layer.send(channel, _message(base + i))
+        for _ in range(n):
+            await layer.receive(channel)
+    return count / (time.perf_counter() - start)
+
+
+async def _fan_out(layer, members, count):
+    channels = [await layer.new_channel() for _ in range(members)]
+    for channel in channels:
+        await layer.group_add('bench', channel)
+    start = time.perf_counter()
+    for base in range(0, count, WINDOW):
+        n = min(WINDOW, count - base)
+        for i in range(n):
+            await layer.group_send('bench', _message(base + i))
+        await asyncio.gather(*(layer.receive(channel) for channel in channels for _ in range(n)))
+    elapsed = time.perf_counter() - start
+    for channel in channels:
+        await layer.group_discard('bench', channel)
+    return count * members / elapsed
+
+
+def _remote_sender(path, channel, count):
+    async def send_all():
+        layer = SQLiteChannelLayer(path=path, capacity=count)
+        for i in range(count):
+            await layer.send(channel, _message(i))
+    asyncio.run(send_all())
+
+
+async def _cross_process(path, count):
+    layer = SQLiteChannelLayer(path=path, capacity=count)
+    channel = await layer.new_channel()
+    sender = multiprocessing.Process(target=_remote_sender, args=(path, channel, count))
+    start = time.perf_counter()
+    sender.start()
+    for _ in range(count):
+        await layer.receive(channel)
+    elapsed = time.perf_counter() - start
+    sender.join()
+    return count / elapsed
+
+
+class Command(BaseCommand):
+    help = "Compare message throughput of the in-memory and SQLite channel layers"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=2000)
+        parser.add_argument('--members', type=int, default=10, help="group size for the fan-out test")
+
+    def handle(self, *args, **options):
+        count = options['messages']
+        members = options['members']
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'bench.sqlite3')
+            layers = {
+                'in-memory': lambda: InMemoryChannelLayer(),
+                'sqlite': lambda: SQLiteChannelLayer(path=path),
+            }
+            self.stdout.write(f"{'layer':<10} {'send/receive':>14} {'fan-out x' + str(members):>14} {'cross-process':>14}")
+            for name, make_layer in layers.items():
+                p2p = asyncio.run(_point_to_point(make_layer(), count))
+                fan = asyncio.run(_fan_out(make_layer(), members, count // members or 1))
+                if name == 'sqlite':
+                    cross = f"{asyncio.run(_cross_process(path, count)):>10.0f} m/s"
+                else:
+                    # Messages never leave the process
+                    cross = 'n/a'
+                self.stdout.write(f"{name:<10} {p2p:>10.0f} m/s {fan:>10.0f} m/s {cross:>14}")
@@ -0,0 +1,127 @@
+import os
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connections
+
+from api.models import PhoneNumberResult, VideoProcessingTask
+
+
+def _writer(alias, task_id, writes, stats, lock):
+    """Mimic one processing task: a progress save per frame, a result every 20 frames"""
+    done = errors = 0
+    try:
+        for i in range(writes):
+            try:
+                VideoProcessingTask.objects.using(alias).filter(id=task_id).update(
+                    progress=i * 100 // writes, current_frame=i, total_frames=writes
+                )
+                if i % 20 == 0:
+                    PhoneNumberResult.objects.using(alias).update_or_create(
+                        task_id=task_id,
+                        e164_number=f'+97254{i:07d}',
+                        defaults={'national_number': f'054-{i:07d}', 'frame_count': 1,
+                                  'first_seen_seconds': i / 4},
+                    )
+                done += 1
+            except OperationalError:
+                errors += 1
+    finally:
+        connections[alias].close()
+    with lock:
+        stats['writes'] += done
+        stats['errors'] += errors
+
+
+def _reader(alias, task_ids, stop, stats, lock):
+    """Mimic clients polling task status while the writers run"""
+    reads = errors = 0
+    try:
+        while not stop.is_set():
+            for task_id in task_ids:
+                try:
+                    VideoProcessingTask.objects.using(alias).filter(id=task_id).values('status', 'progress').first()
+                    reads += 1
+                except OperationalError:
+                    errors += 1
+    finally:
+        connections[alias].close()
+    with lock:
+        stats['reads'] += reads
+        stats['read_errors'] += errors
+
+
+def run_benchmark(alias, tasks, writes):
+    tasks_created = [
+        VideoProcessingTask.objects.using(alias).create(video_file='videos/benchmark.mp4', status='processing')
+        for _ in range(tasks)
+    ]
+    task_ids = [task.id for task in tasks_created]
+    stats = {'writes': 0, 'errors': 0, 'reads': 0, 'read_errors': 0}
+    lock = threading.Lock()
+    stop = threading.Event()
+
+    reader = threading.Thread(target=_reader, args=(alias, task_ids, stop, stats, lock))
+    writers = [threading.Thread(target=_writer, args=(alias, task_id, writes, stats, lock)) for task_id in task_ids]
+    start = time.perf_counter()
+    reader.start()
+    for thread in writers:
+        thread.start()
+    for thread in writers:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    stop.set()
+    reader.join()
+
+    VideoProcessingTask.objects.using(alias).filter(id__in=task_ids).delete()
+    stats['elapsed'] = elapsed
+    return stats
+
+
+class Command(BaseCommand):
+    help = "Measure write throughput with N processing tasks saving progress at the same time"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tasks', type=int, default=8, help="simultaneous writer threads")
+        parser.add_argument('--writes', type=int, default=200, help="progress writes per task")
+        parser.add_argument('--compare', action='store_true',
+                            help="run on scratch SQLite files with default and tuned settings "
+                                 "instead of the configured database")
+
+    def handle(self, *args, **options):
+        tasks, writes = options['tasks'], options['writes']
+        if not options['compare']:
+            engine = settings.DATABASES['default']['ENGINE'].rsplit('.', 1)[-1]
+            self.report(engine, run_benchmark('default', tasks, writes))
+            return
+
+        with tempfile.TemporaryDirectory() as tmp:
+            variants = {
+                'sqlite-default': {},
+                'sqlite-tuned': settings.SQLITE_OPTIONS,
+            }
+            for name, db_options in variants.items():
+                alias = f'benchmark_{name.replace("-", "_")}'
+                connections.settings[alias] = {
+                    **connections.settings['default'],
+                    'ENGINE': 'django.db.backends.sqlite3',
+                    'NAME': os.path.join(tmp, f'{name}.sqlite3'),
+                    'OPTIONS': db_options,
+                    'CONN_MAX_AGE': 0,
+                    'TEST': {},
+                }
+                call_command('migrate', database=alias, verbosity=0)
+                self.report(name, run_benchmark(alias, tasks, writes))
+                connections[alias].close()
+
+    def report(self, name, stats):
+        self.stdout.write(
+            f"{name:<16} {stats['writes'] / stats['elapsed']:>8.0f} writes/s "
+            f"{stats['reads'] / stats['elapsed']:>8.0f} reads/s "
+            f"{stats['errors']} write errors, {stats['read_errors']} read errors "
+            f"({stats['elapsed']:.2f}s)"
+        )
@@ -0,0 +1,79 @@
+import multiprocessing
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from api.frame_ring import FrameRing, FrameSlot, attach, slot_view
+
+
+def _consumer(conn, ring_name, slot_bytes):
+    """Stand-in OCR worker: read every frame and answer with a checksum"""
+    ring = attach(ring_name)
+    while True:
+        try:
+            frame = conn.recv()
+        except EOFError:
+            return
+        if isinstance(frame, FrameSlot):
+            frame = slot_view(ring.buf, frame, slot_bytes)
+        conn.send(int(frame.sum(dtype=np.uint64)))
+
+
+def run_transport(mode, frames, shape, ring):
+    """Send ``frames`` frames to a worker process; returns (seconds, checksums)"""
+    context = multiprocessing.get_context('spawn')
+    parent_conn, child_conn = context.Pipe()
+    process = context.Process(target=_consumer, args=(child_conn, ring.name, ring.slot_bytes), daemon=True)
+    process.start()
+    child_conn.close()
+    rng = np.random.default_rng(0)
+    source = [rng.integers(0, 256, shape, dtype=np.uint8) for _ in range(4)]
+    # Warm the worker up so process start isn't timed
+    parent_conn.send(source[0][:1])
+    parent_conn.recv()
+
+    checksums = []
+    started = time.perf_counter()
+    for i in range(frames):
+        frame = source[i % len(source)]
+        if mode == 'ring':
+            index = ring.acquire()
+            job, _ = ring.write(index, frame)
+        else:
+            job = frame
+        parent_conn.send(job)
+        checksums.append(parent_conn.recv())
+        if mode == 'ring':
+            ring.release(index)
+    elapsed = time.perf_counter() - started
+
+    parent_conn.close()
+    process.join()
+    return elapsed, checksums
+
+
+class Command(BaseCommand):
+    help = "Compare sending frames to a worker process pickled over a pipe vs through shared memory slots"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--frames', type=int, default=300)
+        parser.add_argument('--width', type=int, default=1920)
+        parser.add_argument('--height', type=int, default=1080)
+
+    def handle(self, *args, **options):
+        shape = (options['height'], options['width'], 3)
+        frame_mb = np.prod(shape) / (1024 * 1024)
+        ring = FrameRing(2, int(np.prod(shape)))
+        try:
+            results = {mode: run_transport(mode, options['frames'], shape, ring) for mode in ('pipe', 'ring')}
+        finally:
+            ring.close()
+        if results['pipe'][1] != results['ring'][1]:
+            raise CommandError("Workers read different frames through the ring than through the pipe")
+        for mode, (elapsed, _) in results.items():
+            self.stdout.write(
+                f"{mode:<5} {options['frames'] / elapsed:>8.0f} frames/s "
+                f"{elapsed / options['frames'] * 1000:>7.2f} ms/frame "
+                f"({frame_mb:.1f} MB frames)"
+            )
@@ -0,0 +1,80 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+HEAVY_MODULES = ('cv2', 'numpy', 'pandas', 'pytesseract', 'phonenumbers')
+
+# Each stage runs in a fresh interpreter and includes the ones before it
+STAGES = {
+    'django': "",
+    # As configured: with VIDEO_PREWARM=1 this includes the background warm-up
+    'api': (
+        "from phone.asgi import application\n"
+        "import importlib; importlib.import_module(settings.ROOT_URLCONF)\n"
+        "import threading; [thread.join() for thread in threading.enumerate() if thread.name == 'video-warmup']\n"
+    ),
+    'worker': (
+        "from phone.asgi import application\n"
+        "import importlib; importlib.import_module(settings.ROOT_URLCONF)\n"
+        "from api.scheduler import warm_up; warm_up()\n"
+    ),
+}
+
+CHILD = """
+import json, os, resource, sys, time
+started = time.perf_counter()
+import django
+from django.conf import settings
+django.setup()
+{body}
+elapsed = time.perf_counter() - started
+try:
+    # ru_maxrss survives exec on Linux and would report the parent's peak
+    with open('/proc/self/status') as f:
+        peak_mb = next(int(line.split()[1]) for line in f if line.startswith('VmHWM')) / 1024
+except OSError:
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+print(json.dumps({{
+    'seconds': elapsed,
+    'rss_mb': peak_mb,
+    'modules': [name for name in {modules!r} if name in sys.modules],
+}}))
+"""
+
+
+def measure(stage):
+    """Import time and peak RSS of a fresh process that runs ``stage``"""
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get('DJANGO_SETTINGS_MODULE', 'phone.settings'))
+    code = CHILD.format(body=STAGES[stage], modules=HEAVY_MODULES)
+    output = subprocess.run(
+        [sys.executable, '-c', code], env=env, cwd=settings.BASE_DIR,
+        capture_output=True, text=True, check=True
+    ).stdout
+    # warm_up prints its own progress line first
+    return json.loads(output.strip().splitlines()[-1])
+
+
+class Command(BaseCommand):
+    help = "Measure import time and memory of the API process and of a warmed-up worker"
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=5, help="fresh processes per stage")
+        parser.add_argument('--stage', choices=list(STAGES), action='append',
+                            help="stage to measure (default: all)")
+
+    def handle(self, *args, **options):
+        for stage in options['stage'] or STAGES:
+            runs = [measure(stage) for _ in range(options['repeat'])]
+            seconds = statistics.median(run['seconds'] for run in runs)
+            rss = statistics.median(run['rss_mb'] for run in runs)
+            self.stdout.write(
+                f"{stage:<8} {seconds * 1000:>6.0f} ms {rss:>6.0f} MB  "
+                f"heavy modules: {', '.join(runs[0]['modules']) or 'none'}"
+            )
@@ -0,0 +1,163 @@
+import threading
+import time
+from collections import deque
+from pathlib import Path
+
+from django.conf import settings
+from django.core.files import File
+from django.core.management.base import BaseCommand, CommandError
+
+from api.matching import parse_regions
+from api.models import VideoProcessingTask
+from api.scheduler import get_scheduler
+
+
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv')
+
+
+class SettlingFiles:
+    """Tracks files that changed recently and reports them once their writes stop.
+
+    A file counts as settled when its size and mtime haven't changed for
+    ``settle_seconds``. Copies over NFS/SMB show up long before the last byte
+    lands, so the first event alone says nothing about completeness.
+    """
+
+    def __init__(self, settle_seconds):
+        self.settle_seconds = settle_seconds
+        self._files = {}
+        self._lock = threading.Lock()
+
+    def touch(self, path):
+        path = Path(path)
+        if path.suffix.lower() not in VIDEO_EXTENSIONS or path.name.startswith('.'):
+            return
+        with self._lock:
+            self._files.setdefault(path, (None, time.monotonic()))
+
+    def settled(self):
+        """Return files whose size and mtime held still for ``settle_seconds``"""
+        now = time.monotonic()
+        ready = []
+        with self._lock:
+            for path, (signature, since) in list(self._files.items()):
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    # Deleted or renamed away before it settled
+                    del self._files[path]
+                    continue
+                current = (stat.st_size, stat.st_mtime_ns)
+                if current != signature:
+                    self._files[path] = (current, now)
+                elif now - since >= self.settle_seconds and stat.st_size > 0:
+                    del self._files[path]
+                    ready.append(path)
+        return ready
+
+
+class VideoEventHandler:
+    """watchdog handler feeding created, modified and moved-in files to SettlingFiles"""
+
+    def __init__(self, files):
+        self.files = files
+
+    def dispatch(self, event):
+        if event.is_directory:
+            return
+        if event.event_type in ('created', 'modified', 'closed'):
+            self.files.touch(event.src_path)
+        elif event.event_type == 'moved':
+            self.files.touch(event.dest_path)
+
+
+class Command(BaseCommand):
+    help = "Watch a directory and queue a processing task for every new video once its writes settle"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--directory', default=str(settings.VIDEO_UPLOAD_DIR),
+                            help="directory to watch (default: VIDEO_UPLOAD_DIR)")
+        parser.add_argument('--recursive', action='store_true', help="watch subdirectories too")
+        parser.add_argument('--settle-seconds', type=float, default=5,
+                            help="how long size and mtime must stay unchanged")
+        parser.add_argument('--max-pending', type=int, default=None,
+                            help="stop submitting while this many tasks wait for a worker "
+                                 "(default: 2 x VIDEO_PROCESSING_WORKERS)")
+        parser.add_argument('--polling', action='store_true',
+                            help="poll the directory instead of using OS events (needed for NFS/SMB mounts)")
+        parser.add_argument('--poll-interval', type=float, default=2, help="seconds between polls with --polling")
+        parser.add_argument('--scan-existing', action='store_true',
+                            help="also queue videos already in the directory (under MEDIA_ROOT only those without a task)")
+        parser.add_argument('--region', default=None, help="comma-separated region codes (default: PHONE_REGIONS)")
+        parser.add_argument('--preprocess-profile', default='standard')
+
+    def handle(self, *args, **options):
+        directory = Path(options['directory']).resolve()
+        if not directory.is_dir():
+            raise CommandError(f"Not a directory: {directory}")
+        profiles = [key for key, _ in VideoProcessingTask.PREPROCESS_PROFILE_CHOICES]
+        if options['preprocess_profile'] not in profiles:
+            raise CommandError(f"Unknown preprocess profile. Choose one of: {', '.join(profiles)}")
+        try:
+            self.region = ",".join(parse_regions(options['region'] or settings.PHONE_REGIONS))
+        except ValueError as e:
+            raise CommandError(str(e))
+        self.profile = options['preprocess_profile']
+        self.media_root = Path(settings.MEDIA_ROOT).resolve()
+        scheduler = get_scheduler()
+        # Load the extraction stack while waiting for the first file
+        scheduler.start()
+        max_pending = options['max_pending'] or scheduler.workers * 2
+
+        if options['polling']:
+            from watchdog.observers.polling import PollingObserver
+            observer = PollingObserver(timeout=options['poll_interval'])
+        else:
+            from watchdog.observers import Observer
+            observer = Observer()
+
+        files = SettlingFiles(options['settle_seconds'])
+        if options['scan_existing']:
+            pattern = '**/*' if options['recursive'] else '*'
+            for path in directory.glob(pattern):
+                if path.is_file():
+                    files.touch(path)
+        observer.schedule(VideoEventHandler(files), str(directory), recursive=options['recursive'])
+        observer.start()
+        self.stdout.write(f"👀 Watching {directory} (settle {options['settle_seconds']}s, "
+                          f"max {max_pending} queued tasks)")
+
+        ready = deque()
+        try:
+            while True:
+                time.sleep(1)
+                ready.extend(files.settled())
+                # Backpressure: files wait here instead of piling up in the scheduler queue
+                while ready and scheduler.pending() < max_pending:
+                    path = ready.popleft()
+                    try:
+                        self.ingest(path, scheduler)
+                    except Exception as e:
+                        self.stderr.write(f"❌ Could not queue {path}: {e}")
+        except KeyboardInterrupt:
+            self.stdout.write("⏹️ Stopping watcher")
+        finally:
+            observer.stop()
+            observer.join()
+
+    def ingest(self, path, scheduler):
+        """Create a task for ``path`` unless one exists, then queue it"""
+        if path.is_relative_to(self.media_root):
+            # Reference files under MEDIA_ROOT in place, like batch directory uploads
+            name = path.relative_to(self.media_root).as_posix()
+            if VideoProcessingTask.objects.filter(video_file=name).exists():
+                return
+            task = VideoProcessingTask(region=self.region, preprocess_profile=self.profile, owns_video_file=False)
+            task.video_file.name = name
+            task.save()
+        else:
+            task = VideoProcessingTask(region=self.region, preprocess_profile=self.profile)
+            with open(path, 'rb') as f:
+                task.video_file.save(path.name, File(f), save=True)
+        scheduler.submit(str(task.id))
+        self.stdout.write(f"📥 Queued {path.name} as task {task.id} ({scheduler.pending()} waiting)")
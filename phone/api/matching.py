@@ -0,0 +1,322 @@
+import re
+from collections import Counter
+from functools import lru_cache
+
+import phonenumbers
+from phonenumbers import CountryCodeSource, Leniency, PhoneMetadata, PhoneNumberFormat, PhoneNumberMatcher
+
+# Both are private APIs that may go away; without the regex parser the prefix
+# tables are skipped, without the helper the trunk prefix check runs through
+# PhoneNumberMatcher (see national_prefix_present_if_required)
+try:
+    from re import _parser as sre_parse
+except ImportError:
+    try:
+        import sre_parse  # Python < 3.11
+    except ImportError:
+        sre_parse = None
+try:
+    from phonenumbers.phonenumbermatcher import _is_national_prefix_present_if_required
+except ImportError:
+    _is_national_prefix_present_if_required = None
+
+
+DEFAULT_REGIONS = ('IL',)
+
+# A run of 7+ digits written with phone punctuation; a leading + or 00 marks
+# an international number. Whitespace includes newlines so the joined text of
+# a frame still catches numbers split across lines.
+CANDIDATE_RE = re.compile(r'(?<![\d+])(?:\+|00)?\d(?:[\s\-().\/]{0,2}\d){6,}')
+NON_DIGIT_RE = re.compile(r'\D')
+
+# Shortest phone number worth looking for
+MIN_DIGITS = 7
+# Leading digits kept per (length, prefix) entry of the prefix tables
+PREFIX_DIGITS = 3
+# Longest national significant number in the numbering plans
+MAX_NSN_LENGTH = 17
+
+
+class UnsupportedPattern(ValueError):
+    pass
+
+
+def _concat(left, right):
+    """Language summary of ``left`` followed by ``right``"""
+    right_lengths = {length for _, length in right}
+    result = set()
+    for prefix, length in left:
+        if length >= PREFIX_DIGITS:
+            # Prefix already complete, only the length changes
+            result.update((prefix, length + extra) for extra in right_lengths if length + extra <= MAX_NSN_LENGTH)
+        else:
+            result.update(
+                ((prefix + other)[:PREFIX_DIGITS], length + extra)
+                for other, extra in right if length + extra <= MAX_NSN_LENGTH
+            )
+    return result
+
+
+def _summarise(tokens):
+    """Set of (first PREFIX_DIGITS digits, length) over every string a parsed regex matches"""
+    summary = {('', 0)}
+    for op, av in tokens:
+        name = str(op)
+        if name == 'LITERAL':
+            part = {(chr(av), 1)}
+        elif name == 'IN':
+            chars = set()
+            for item_op, item in av:
+                item_name = str(item_op)
+                if item_name == 'LITERAL':
+                    chars.add(chr(item))
+                elif item_name == 'RANGE':
+                    chars.update(chr(c) for c in range(item[0], item[1] + 1))
+                elif item_name == 'CATEGORY' and str(item) == 'CATEGORY_DIGIT':
+                    chars.update('0123456789')
+                else:
+                    raise UnsupportedPattern(item_name)
+            part = {(c, 1) for c in chars}
+        elif name == 'BRANCH':
+            part = set().union(*(_summarise(branch) for branch in av[1]))
+        elif name == 'SUBPATTERN':
+            part = _summarise(av[-1])
+        elif name in ('MAX_REPEAT', 'MIN_REPEAT', 'POSSESSIVE_REPEAT'):
+            low, high, sub = av
+            sub = _summarise(sub)
+            part = {('', 0)} if low == 0 else set()
+            repeated = {('', 0)}
+            for count in range(1, min(high, MAX_NSN_LENGTH) + 1):
+                repeated = _concat(repeated, sub)
+                if not repeated:
+                    break
+                if count >= low:
+                    part |= repeated
+        else:
+            raise UnsupportedPattern(name)
+        summary = _concat(summary, part)
+    return summary
+
+
+@lru_cache(maxsize=None)
+def prefix_table(region):
+    """{nsn length: frozenset of leading digits} for every valid number of ``region``.
+
+    A depth-PREFIX_DIGITS trie of the region's numbering plan, flattened per
+    length, computed from libphonenumber's general number pattern. Returns
+    None when the pattern uses syntax the summariser doesn't know (or the
+    regex parser isn't available); callers then skip prefiltering for that
+    region.
+    """
+    if sre_parse is None:
+        return None
+    metadata = PhoneMetadata.metadata_for_region(region)
+    try:
+        summary = _summarise(sre_parse.parse(metadata.general_desc.national_number_pattern))
+    except UnsupportedPattern:
+        return None
+    except Exception as e:
+        # The parse tree format is private and changes between Python versions
+        print(f"⚠️ No prefix table for {region}: {e}")
+        return None
+    table = {}
+    for prefix, length in summary:
+        table.setdefault(length, set()).add(prefix)
+    return {length: frozenset(prefixes) for length, prefixes in table.items()}
+
+
+def national_prefix_present_if_required(number):
+    """PhoneNumberMatcher's trunk prefix rule for a number parsed with keep_raw_input.
+
+    A number written nationally must carry the trunk prefix where its region's
+    formatting rules require one. Uses libphonenumber's own helper when it is
+    there, otherwise asks PhoneNumberMatcher whether it accepts the raw text.
+    """
+    if _is_national_prefix_present_if_required is not None:
+        return _is_national_prefix_present_if_required(number)
+    if number.country_code_source != CountryCodeSource.FROM_DEFAULT_COUNTRY:
+        return True
+    region = phonenumbers.region_code_for_number(number)
+    return any(
+        match.number.country_code == number.country_code and match.number.national_number == number.national_number
+        for match in PhoneNumberMatcher(number.raw_input, region, leniency=Leniency.VALID)
+    )
+
+
+def count_digits(text):
+    return sum(map(str.isdigit, text))
+
+
+def parse_regions(value):
+    """'IL, de,US' -> ('IL', 'DE', 'US'); raises ValueError for unknown region codes"""
+    if isinstance(value, str):
+        value = value.split(',')
+    regions = tuple(dict.fromkeys(region.strip().upper() for region in value if region.strip()))
+    unknown = [region for region in regions if region not in phonenumbers.SUPPORTED_REGIONS]
+    if not regions or unknown:
+        raise ValueError(f"Unknown region codes: {', '.join(unknown) or value}")
+    return regions
+
+
+class PhoneMatcher:
+    """Single-pass phone number matcher for several regions.
+
+    Each line is scanned once for digit-run candidates. A candidate starting
+    with + or 00 is parsed as international; any other is only handed to
+    libphonenumber for the configured regions whose length table (national
+    significant lengths, with and without the trunk prefix) fits its digit
+    count, in the order the regions were given. Like PhoneNumberMatcher, a
+    national number must carry the trunk prefix where the region requires
+    one. The tables are built once per region list, so extra regions cost a
+    dict lookup per candidate.
+
+    Before libphonenumber runs, two cheap filters drop what can't be a number:
+    lines with fewer than MIN_DIGITS digits are skipped without running the
+    candidate regex, and a candidate must start with digits that some valid
+    number of that length starts with (see ``prefix_table``).
+    """
+
+    def __init__(self, regions=DEFAULT_REGIONS):
+        self.regions = tuple(regions)
+        self.regions_by_length = {}
+        self.trunk_prefixes = {}
+        self.prefix_tables = {}
+        for region in self.regions:
+            metadata = PhoneMetadata.metadata_for_region(region)
+            prefix = metadata.national_prefix or ''
+            self.trunk_prefixes[region] = prefix
+            # Regions that rewrite national numbers while parsing aren't prefiltered
+            if (metadata.national_prefix_for_parsing or prefix) == prefix and not metadata.national_prefix_transform_rule:
+                self.prefix_tables[region] = prefix_table(region)
+            lengths = set(metadata.general_desc.possible_length)
+            if prefix:
+                lengths |= {length + len(prefix) for length in metadata.general_desc.possible_length}
+            for length in lengths:
+                self.regions_by_length.setdefault(length, []).append(region)
+
+    def plausible(self, digits, region):
+        """Could ``digits``, written nationally, be a number of ``region``?"""
+        table = self.prefix_tables.get(region)
+        if table is None:
+            return True
+        prefix = self.trunk_prefixes[region]
+        if prefix and digits.startswith(prefix):
+            nsn = digits[len(prefix):]
+            if nsn[:PREFIX_DIGITS] in table.get(len(nsn), ()):
+                return True
+        return digits[:PREFIX_DIGITS] in table.get(len(digits), ())
+
+    def resolve(self, raw, stats=None):
+        """Return the valid PhoneNumber written as ``raw``, or None"""
+        digits = NON_DIGIT_RE.sub('', raw)
+        raw = raw.lstrip()
+        if raw.startswith('+') or raw.startswith('00'):
+            number = self._parse('+' + (digits[2:] if raw.startswith('00') else digits), None, stats)
+            if number is not None:
+                return number
+            if raw.startswith('+'):
+                return None
+        for region in self.regions_by_length.get(len(digits), ()):
+            if not self.plausible(digits, region):
+                if stats is not None:
+                    stats['prefix_rejected'] += 1
+                continue
+            number = self._parse(digits, region, stats)
+            if number is not None:
+                return number
+        return None
+
+    @staticmethod
+    def _parse(text, region, stats=None):
+        if stats is not None:
+            stats['parsed'] += 1
+        try:
+            number = phonenumbers.parse(text, region, keep_raw_input=True)
+        except phonenumbers.NumberParseException:
+            return None
+        if phonenumbers.is_valid_number(number) and national_prefix_present_if_required(number):
+            return number
+        return None
+
+    def _split(self, raw, stats):
+        """Resolve space-separated pieces of a candidate that ran several numbers together.
+
+        The shortest valid piece wins, so a number followed by the start of the
+        next one isn't misread as one longer number.
+        """
+        tokens = raw.split()
+        i = 0
+        while i < len(tokens):
+            for j in range(i + 1, len(tokens) + 1):
+                piece = ' '.join(tokens[i:j])
+                number = self.resolve(piece, stats) if count_digits(piece) >= MIN_DIGITS else None
+                if number is not None:
+                    yield number, piece
+                    i = j
+                    break
+            else:
+                i += 1
+
+    def _resolve_candidate(self, raw, stats, hits):
+        stats['candidates'] += 1
+        number = self.resolve(raw, stats)
+        found = [(number, raw)] if number is not None else self._split(raw, stats)
+        for number, raw in found:
+            stats['matched'] += 1
+            hits.append((
+                phonenumbers.format_number(number, PhoneNumberFormat.E164),
+                phonenumbers.format_number(number, PhoneNumberFormat.NATIONAL),
+                raw
+            ))
+
+    def match(self, text, stats=None):
+        """Return [(e164, national, raw_string)] for every valid number in ``text``.
+
+        Pass a Counter as ``stats`` to count lines, candidates and how many of
+        them each filter let through.
+        """
+        if stats is None:
+            stats = Counter()
+        stats['lines'] += 1
+        if count_digits(text) < MIN_DIGITS:
+            stats['lines_skipped'] += 1
+            return []
+        hits = []
+        for candidate in CANDIDATE_RE.finditer(text):
+            self._resolve_candidate(candidate.group(), stats, hits)
+        return hits
+
+    def match_boundaries(self, lines, stats=None):
+        """Hits for numbers split across the line breaks of ``lines``.
+
+        Only candidates that span a newline of the joined text are resolved;
+        everything inside a single line is what ``match`` on that line finds,
+        so lines + boundaries give the same numbers as lines + joined text
+        while resolving each candidate once.
+        """
+        if stats is None:
+            stats = Counter()
+        if len(lines) < 2:
+            return []
+        hits = []
+        for candidate in CANDIDATE_RE.finditer("\n".join(lines)):
+            if "\n" in candidate.group():
+                self._resolve_candidate(candidate.group(), stats, hits)
+        return hits
+
+
+@lru_cache(maxsize=32)
+def get_matcher(regions=DEFAULT_REGIONS):
+    """Shared matcher for a region tuple, built on first use"""
+    return PhoneMatcher(regions)
+
+
+def describe_stats(stats):
+    """One-line summary of matcher stats: how much each filter saved"""
+    lines = stats['lines'] or 1
+    checks = stats['prefix_rejected'] + stats['parsed'] or 1
+    return (
+        f"{stats['lines']} lines, {stats['lines_skipped'] / lines:.0%} skipped by digit count; "
+        f"{stats['candidates']} candidates, {stats['prefix_rejected'] / checks:.0%} of region checks "
+        f"rejected by prefix table; {stats['parsed']} libphonenumber parses, {stats['matched']} matches"
+    )
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-19 04:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_videoprocessingtask_current_frame_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='videoprocessingtask',
+            name='applied_preprocess_profile',
+            field=models.CharField(blank=True, help_text='Profile actually used (resolved when profile is auto)', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='videoprocessingtask',
+            name='preprocess_profile',
+            field=models.CharField(choices=[('auto', 'Auto (chosen from sampled frames)'), ('screen', 'Screen recording (grayscale only)'), ('standard', 'Standard (CLAHE + adaptive threshold)'), ('camera', 'Noisy camera footage (denoise + CLAHE + adaptive threshold)')], default='standard', help_text='Frame preprocessing profile', max_length=20),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-19 04:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_preprocess_profile'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='phonenumberresult',
+            name='appearances',
+            field=models.JSONField(blank=True, default=list, help_text='Appearance intervals as [start_seconds, end_seconds] pairs'),
+        ),
+        migrations.AddField(
+            model_name='phonenumberresult',
+            name='last_seen_seconds',
+            field=models.FloatField(blank=True, help_text='Time in video when last seen', null=True),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.6 on 2026-10-19 04:08
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_phone_number_appearances'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VideoBatch',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('source_directory', models.CharField(blank=True, help_text='Directory under MEDIA_ROOT the videos were taken from', max_length=500)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='videoprocessingtask',
+            name='batch',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='tasks', to='api.videobatch'),
+        ),
+    ]
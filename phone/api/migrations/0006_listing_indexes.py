@@ -0,0 +1,25 @@
+# Generated by Django 5.2.6 on 2026-10-19 04:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_video_batch'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='phonenumberresult',
+            index=models.Index(fields=['task', 'first_seen_seconds', 'e164_number'], name='result_task_first_seen_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='videoprocessingtask',
+            index=models.Index(fields=['-created_at'], name='task_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='videoprocessingtask',
+            index=models.Index(fields=['status', '-created_at'], name='task_status_created_idx'),
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 5.2.6 on 2026-10-19 04:10
+
+from django.db import migrations, models
+
+
+def backfill_phone_number_index(apps, schema_editor):
+    import phonenumbers
+    from django.db.models import Count, Min, Sum
+    
+    PhoneNumberResult = apps.get_model('api', 'PhoneNumberResult')
+    PhoneNumberIndex = apps.get_model('api', 'PhoneNumberIndex')
+    db_alias = schema_editor.connection.alias
+    rows = (
+        PhoneNumberResult.objects.using(db_alias)
+        .values('e164_number')
+        .annotate(national_number=Min('national_number'), task_count=Count('task', distinct=True), total_frame_count=Sum('frame_count'))
+    )
+    for row in rows.iterator():
+        parsed = phonenumbers.parse(row['e164_number'], None)
+        PhoneNumberIndex.objects.using(db_alias).create(
+            e164_number=row['e164_number'],
+            country_code=parsed.country_code,
+            national_digits=phonenumbers.national_significant_number(parsed),
+            national_number=row['national_number'],
+            task_count=row['task_count'],
+            total_frame_count=row['total_frame_count'] or 0
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_listing_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PhoneNumberIndex',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('e164_number', models.CharField(help_text='Phone number in E164 format', max_length=20, unique=True)),
+                ('country_code', models.IntegerField(help_text='Country calling code')),
+                ('national_digits', models.CharField(db_index=True, help_text='National significant number (digits only)', max_length=20)),
+                ('national_number', models.CharField(help_text='Phone number in national format', max_length=30)),
+                ('task_count', models.IntegerField(default=0, help_text='Number of tasks this number was found in')),
+                ('total_frame_count', models.IntegerField(default=0, help_text='Frames this number appeared in, summed over tasks')),
+                ('first_seen_at', models.DateTimeField(auto_now_add=True, help_text='When this number was first indexed')),
+                ('last_seen_at', models.DateTimeField(auto_now=True, help_text='When this number was last indexed')),
+            ],
+            options={
+                'ordering': ['e164_number'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='phonenumberresult',
+            index=models.Index(fields=['e164_number', 'task'], name='result_e164_task_idx'),
+        ),
+        migrations.RunPython(backfill_phone_number_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-19 04:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_phone_number_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='phonenumberresult',
+            name='evidence',
+            field=models.JSONField(blank=True, default=list, help_text='First sightings with timestamp, OCR bounding box and cropped image file'),
+        ),
+    ]
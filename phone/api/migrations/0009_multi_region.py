@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-19 04:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_phone_number_evidence'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='videoprocessingtask',
+            name='region',
+            field=models.CharField(default='IL', help_text='Comma-separated region codes for phone number parsing, in priority order', max_length=64),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.6 on 2026-10-19 04:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_multi_region'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='videoprocessingtask',
+            name='degradations',
+            field=models.JSONField(blank=True, default=list, help_text='Degradations applied to stay within the budgets'),
+        ),
+        migrations.AddField(
+            model_name='videoprocessingtask',
+            name='max_memory_mb',
+            field=models.PositiveIntegerField(blank=True, help_text='Maximum memory for frames and OCR buffers, in MB', null=True),
+        ),
+        migrations.AddField(
+            model_name='videoprocessingtask',
+            name='max_wall_seconds',
+            field=models.PositiveIntegerField(blank=True, help_text='Maximum processing time, in seconds', null=True),
+        ),
+        migrations.AddField(
+            model_name='videoprocessingtask',
+            name='max_workers',
+            field=models.PositiveIntegerField(blank=True, help_text='Maximum OCR worker processes this task keeps busy', null=True),
+        ),
+    ]
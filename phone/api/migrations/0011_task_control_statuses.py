@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-19 04:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_task_budgets'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='videoprocessingtask',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('paused', 'Paused'), ('completed', 'Completed'), ('cancelled', 'Cancelled'), ('failed', 'Failed')], default='pending', max_length=20),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.6 on 2026-10-19 04:59
+
+from django.db import migrations, models
+
+
+def mark_referenced_files(apps, schema_editor):
+    # Uploads and copies land in videos/ (upload_to); anything else was
+    # referenced in place by a batch directory or the watch folder. Watch-folder
+    # files dropped straight into videos/ can't be told from uploads here.
+    VideoProcessingTask = apps.get_model('api', 'VideoProcessingTask')
+    db_alias = schema_editor.connection.alias
+    VideoProcessingTask.objects.using(db_alias).exclude(video_file__startswith='videos/').update(owns_video_file=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_task_control_statuses'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='videoprocessingtask',
+            name='owns_video_file',
+            field=models.BooleanField(default=True, help_text='False when video_file references a file under MEDIA_ROOT in place; deleting the task keeps it'),
+        ),
+        migrations.RunPython(mark_referenced_files, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.6 on 2026-10-19 05:01
+
+from django.db import migrations, models
+
+
+def mark_indexed_results(apps, schema_editor):
+    # save_results (and so PhoneNumberIndex.record) only ran for tasks that
+    # finished or were cancelled; rows of failed or interrupted tasks weren't counted
+    PhoneNumberResult = apps.get_model('api', 'PhoneNumberResult')
+    db_alias = schema_editor.connection.alias
+    PhoneNumberResult.objects.using(db_alias).filter(task__status__in=['completed', 'cancelled']).update(indexed=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_task_owns_video_file'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='phonenumberresult',
+            name='indexed',
+            field=models.BooleanField(default=False, help_text='Counted in PhoneNumberIndex (set by save_results, undone on delete)'),
+        ),
+        migrations.RunPython(mark_indexed_results, migrations.RunPython.noop),
+    ]
@@ -1,20 +1,46 @@
-from django.db import models
+from django.db import IntegrityError, models, transaction
 from django.utils import timezone
 import uuid
 
 
+class VideoBatch(models.Model):
+    """Model to group tasks submitted together"""
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    source_directory = models.CharField(max_length=500, blank=True, help_text='Directory under MEDIA_ROOT the videos were taken from')
+    
+    class Meta:
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"Batch {self.id}"
+
+
 class VideoProcessingTask(models.Model):
     """Model to track video processing tasks"""
     
     STATUS_CHOICES = [
         ('pending', 'Pending'),
         ('processing', 'Processing'),
+        ('paused', 'Paused'),
         ('completed', 'Completed'),
+        ('cancelled', 'Cancelled'),
         ('failed', 'Failed'),
     ]
     
+    # Keys must match api.preprocessing.PREPROCESS_PROFILES (plus 'auto')
+    PREPROCESS_PROFILE_CHOICES = [
+        ('auto', 'Auto (chosen from sampled frames)'),
+        ('screen', 'Screen recording (grayscale only)'),
+        ('standard', 'Standard (CLAHE + adaptive threshold)'),
+        ('camera', 'Noisy camera footage (denoise + CLAHE + adaptive threshold)'),
+    ]
+    
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    batch = models.ForeignKey(VideoBatch, on_delete=models.CASCADE, null=True, blank=True, related_name='tasks')
     video_file = models.FileField(upload_to='videos/')
+    owns_video_file = models.BooleanField(default=True, help_text='False when video_file references a file under MEDIA_ROOT in place; deleting the task keeps it')
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     created_at = models.DateTimeField(auto_now_add=True)
     started_at = models.DateTimeField(null=True, blank=True)
@@ -22,9 +48,17 @@ class VideoProcessingTask(models.Model):
     error_message = models.TextField(blank=True, null=True)
     
     # Processing parameters
-    region = models.CharField(max_length=5, default='IL', help_text='Country code for phone number parsing')
+    region = models.CharField(max_length=64, default='IL', help_text='Comma-separated region codes for phone number parsing, in priority order')
     sample_fps = models.IntegerField(default=4, help_text='Frames per second to analyze')
     min_confidence = models.IntegerField(default=55, help_text='Minimum OCR confidence (0-100)')
+    preprocess_profile = models.CharField(max_length=20, choices=PREPROCESS_PROFILE_CHOICES, default='standard', help_text='Frame preprocessing profile')
+    applied_preprocess_profile = models.CharField(max_length=20, blank=True, help_text='Profile actually used (resolved when profile is auto)')
+    
+    # Resource budgets (None = VIDEO_TASK_MAX_* setting, 0 = unlimited)
+    max_workers = models.PositiveIntegerField(null=True, blank=True, help_text='Maximum OCR worker processes this task keeps busy')
+    max_memory_mb = models.PositiveIntegerField(null=True, blank=True, help_text='Maximum memory for frames and OCR buffers, in MB')
+    max_wall_seconds = models.PositiveIntegerField(null=True, blank=True, help_text='Maximum processing time, in seconds')
+    degradations = models.JSONField(default=list, blank=True, help_text='Degradations applied to stay within the budgets')
     
     # Progress tracking
     progress = models.IntegerField(default=0, help_text='Processing progress percentage (0-100)')
@@ -34,6 +68,10 @@ class VideoProcessingTask(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at'], name='task_created_idx'),
+            models.Index(fields=['status', '-created_at'], name='task_status_created_idx'),
+        ]
     
     def __str__(self):
         return f"Task {self.id} - {self.status}"
@@ -46,12 +84,83 @@ class PhoneNumberResult(models.Model):
     e164_number = models.CharField(max_length=20, help_text='Phone number in E164 format')
     national_number = models.CharField(max_length=30, help_text='Phone number in national format')
     first_seen_seconds = models.FloatField(help_text='Time in video when first seen')
+    last_seen_seconds = models.FloatField(null=True, blank=True, help_text='Time in video when last seen')
     frame_count = models.IntegerField(help_text='Number of frames where this number appeared')
+    appearances = models.JSONField(default=list, blank=True, help_text='Appearance intervals as [start_seconds, end_seconds] pairs')
     raw_text_examples = models.TextField(help_text='Examples of raw text where number was found')
+    evidence = models.JSONField(default=list, blank=True, help_text='First sightings with timestamp, OCR bounding box and cropped image file')
+    indexed = models.BooleanField(default=False, help_text='Counted in PhoneNumberIndex (set by save_results, undone on delete)')
     
     class Meta:
         ordering = ['first_seen_seconds', 'e164_number']
         unique_together = ['task', 'e164_number']
+        indexes = [
+            models.Index(fields=['task', 'first_seen_seconds', 'e164_number'], name='result_task_first_seen_idx'),
+            models.Index(fields=['e164_number', 'task'], name='result_e164_task_idx'),
+        ]
     
     def __str__(self):
         return f"{self.e164_number} (Task: {self.task.id})"
+
+
+class PhoneNumberIndex(models.Model):
+    """Global index of every phone number seen across all tasks"""
+    
+    e164_number = models.CharField(max_length=20, unique=True, help_text='Phone number in E164 format')
+    country_code = models.IntegerField(help_text='Country calling code')
+    national_digits = models.CharField(max_length=20, db_index=True, help_text='National significant number (digits only)')
+    national_number = models.CharField(max_length=30, help_text='Phone number in national format')
+    task_count = models.IntegerField(default=0, help_text='Number of tasks this number was found in')
+    total_frame_count = models.IntegerField(default=0, help_text='Frames this number appeared in, summed over tasks')
+    first_seen_at = models.DateTimeField(auto_now_add=True, help_text='When this number was first indexed')
+    last_seen_at = models.DateTimeField(auto_now=True, help_text='When this number was last indexed')
+    
+    class Meta:
+        ordering = ['e164_number']
+    
+    def __str__(self):
+        return f"{self.e164_number} ({self.task_count} tasks)"
+    
+    @classmethod
+    def record(cls, e164_number, national_number, frame_count):
+        """Count one more task containing this number"""
+        def increment():
+            return cls.objects.filter(e164_number=e164_number).update(
+                task_count=models.F('task_count') + 1,
+                total_frame_count=models.F('total_frame_count') + frame_count,
+                last_seen_at=timezone.now()
+            )
+        
+        if increment():
+            return
+        country_code, national_digits = split_e164(e164_number)
+        try:
+            with transaction.atomic():
+                cls.objects.create(
+                    e164_number=e164_number,
+                    country_code=country_code,
+                    national_digits=national_digits,
+                    national_number=national_number,
+                    task_count=1,
+                    total_frame_count=frame_count
+                )
+        except IntegrityError:
+            # Another worker indexed the same number first
+            increment()
+    
+    @classmethod
+    def forget(cls, e164_number, frame_count):
+        """Undo record() when a task's results are deleted"""
+        cls.objects.filter(e164_number=e164_number).update(
+            task_count=models.F('task_count') - 1,
+            total_frame_count=models.F('total_frame_count') - frame_count
+        )
+        cls.objects.filter(e164_number=e164_number, task_count__lte=0).delete()
+
+
+def split_e164(e164_number):
+    """Split '+972548528105' into (972, '548528105')"""
+    import phonenumbers
+    
+    parsed = phonenumbers.parse(e164_number, None)
+    return parsed.country_code, phonenumbers.national_significant_number(parsed)
@@ -0,0 +1,344 @@
+import re
+from collections import Counter, OrderedDict
+
+import cv2
+import numpy as np
+import pandas as pd
+import phonenumbers
+import pytesseract
+
+from .preprocessing import PreprocessContext
+
+
+# Characters that can appear in a printed phone number
+PHONE_WHITELIST = "0123456789+-()./ "
+
+# Escalation ladder, cheapest first. A frame stops at the first variant whose
+# result is trustworthy; only ambiguous frames pay for the heavier passes.
+#   source:    'processed' = output of the task's preprocessing profile,
+#              'frame' = raw frame re-preprocessed with ``profile``
+#   regions:   OCR only the text lines long enough to hold a phone number
+#   max_width: downscale wider images before OCR
+#   scale:     upscale factor applied before OCR
+#   whitelist: restrict tesseract to these characters; it then reads letters
+#              as look-alike digits, so hits must validate to count
+OCR_LADDER = [
+    {'name': 'cheap', 'source': 'processed', 'regions': True, 'max_width': 1280, 'psm': 6, 'whitelist': PHONE_WHITELIST},
+    {'name': 'full', 'source': 'processed', 'psm': 6},
+    {'name': 'heavy', 'source': 'frame', 'profile': 'camera', 'scale': 2.0, 'psm': 11},
+]
+
+# Seven or more digits, possibly separated by phone punctuation
+DIGIT_RUN_RE = re.compile(r'\d(?:[\s\-().]*\d){6,}')
+# Dates and prices are digit runs too, but never phone numbers
+DATE_RE = re.compile(r'\b(?:\d{1,2}[./-]\d{1,2}[./-]\d{2,4}|(?:19|20)\d{2}[ ./-]\d{1,2}[ ./-]\d{1,2})\b')
+PRICE_RE = re.compile(r'[$€£₪]\s?\d[\d,.]*|\b\d[\d,]*\.\d{2}\b')
+# Digit runs remembered as not holding a phone number (they went through every pass)
+MAX_DEAD_ENDS = 512
+
+# Candidate regions: a text line this many times wider than tall holds about
+# seven characters, and lines within this many line heights of one are read
+# with it (a number wrapped onto the next line)
+MIN_LINE_ASPECT = 3.5
+LINE_CONTEXT = 1.5
+# Past this share of the image, cropping saves nothing; OCR all of it
+MAX_REGION_AREA = 0.5
+# Past this share of edge pixels the image is texture or noise, not text on a background
+MAX_EDGE_DENSITY = 0.3
+
+
+def phone_like_runs(lines):
+    """Digit-only strings of the runs in ``lines`` that could be phone numbers"""
+    runs = []
+    for line in lines:
+        line = PRICE_RE.sub(' ', DATE_RE.sub(' ', line))
+        runs.extend(re.sub(r'\D', '', run.group()) for run in DIGIT_RUN_RE.finditer(line))
+    return runs
+
+
+def _join_lines(blobs):
+    """Join word blobs ``[x0, y0, x1, y1]`` that sit side by side into text lines"""
+    lines = []
+    for blob in sorted(blobs):
+        for line in lines:
+            height = max(blob[3] - blob[1], line[3] - line[1])
+            overlap = min(blob[3], line[3]) - max(blob[1], line[1])
+            if overlap >= min(blob[3] - blob[1], line[3] - line[1]) / 2 and blob[0] - line[2] <= height:
+                line[:] = [min(line[0], blob[0]), min(line[1], blob[1]), max(line[2], blob[2]), max(line[3], blob[3])]
+                break
+        else:
+            lines.append(list(blob))
+    return lines
+
+
+def _merge_overlapping(boxes):
+    merged = True
+    while merged:
+        merged = False
+        for i in range(len(boxes)):
+            for j in range(i + 1, len(boxes)):
+                a, b = boxes[i], boxes[j]
+                if a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]:
+                    boxes[i] = [min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3])]
+                    del boxes[j]
+                    merged = True
+                    break
+            if merged:
+                break
+    return boxes
+
+
+def candidate_regions(img):
+    """Boxes ``(x, y, w, h)`` around the text lines of ``img`` that could hold a phone number.
+
+    Character edges are closed into word blobs and words side by side into
+    lines; lines too short for seven characters are dropped. Each box is
+    padded by LINE_CONTEXT line heights and overlapping boxes are merged.
+    Returns None when cropping wouldn't help: the image is mostly texture,
+    or the lines cover most of it anyway.
+    """
+    gray = img if img.ndim == 2 else cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    height, width = gray.shape
+    edges = cv2.morphologyEx(gray, cv2.MORPH_GRADIENT, np.ones((3, 3), np.uint8))
+    _, edges = cv2.threshold(edges, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
+    if cv2.countNonZero(edges) > MAX_EDGE_DENSITY * width * height:
+        return None
+    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (max(width // 200, 5), 3))
+    blobs = cv2.morphologyEx(edges, cv2.MORPH_CLOSE, kernel)
+    contours, _ = cv2.findContours(blobs, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+    words = []
+    for contour in contours:
+        x, y, w, h = cv2.boundingRect(contour)
+        if 8 <= h <= height // 3:
+            words.append([x, y, x + w, y + h])
+    boxes = []
+    for x0, y0, x1, y1 in _join_lines(words):
+        h = y1 - y0
+        if x1 - x0 < MIN_LINE_ASPECT * h:
+            continue
+        pad_x, pad_y = h, int(LINE_CONTEXT * h)
+        boxes.append([max(x0 - pad_x, 0), max(y0 - pad_y, 0), min(x1 + pad_x, width), min(y1 + pad_y, height)])
+    boxes = _merge_overlapping(boxes)
+
+    if sum((x1 - x0) * (y1 - y0) for x0, y0, x1, y1 in boxes) > MAX_REGION_AREA * width * height:
+        return None
+    return sorted((x0, y0, x1 - x0, y1 - y0) for x0, y0, x1, y1 in boxes)
+
+
+class RegionStrip:
+    """Regions of an image stacked top to bottom, so one OCR call reads them all"""
+
+    GAP = 8
+
+    def __init__(self, img, regions):
+        # The image's median is its background, so the gaps read as empty
+        fill = int(np.median(img))
+        width = max(w for _, _, w, _ in regions)
+        height = sum(h for _, _, _, h in regions) + self.GAP * (len(regions) - 1)
+        self.image = np.full((height, width) + img.shape[2:], fill, dtype=img.dtype)
+        # (top in the strip, region)
+        self.rows = []
+        top = 0
+        for x, y, w, h in sorted(regions, key=lambda region: region[1]):
+            self.image[top:top + h, :w] = img[y:y + h, x:x + w]
+            self.rows.append((top, (x, y, w, h)))
+            top += h + self.GAP
+
+    def to_source(self, box):
+        """Map a box in the strip back to the image the regions were cut from"""
+        x, y, w, h = box
+        center = y + h / 2
+        for top, (rx, ry, _, rh) in reversed(self.rows):
+            if center >= top:
+                return (x + rx, y - top + ry, w, min(h, rh))
+        return box
+
+
+def ocr_lines(img, config, min_conf):
+    """Run tesseract and return (lines, mean confidence of digit-bearing words, line boxes).
+
+    Boxes are ``(x, y, w, h)`` in ``img`` pixels, one per line.
+    """
+    data = pytesseract.image_to_data(
+        img,
+        lang="eng",
+        config=config,
+        output_type=pytesseract.Output.DATAFRAME
+    )
+    if data is None or data.empty:
+        return [], None, []
+
+    conf = pd.to_numeric(data["conf"], errors="coerce").fillna(-1)
+    data = data[conf >= min_conf]
+    lines = []
+    boxes = []
+    digit_confs = []
+
+    if not data.empty:
+        for (block, par, line), grp in data.groupby(["block_num", "par_num", "line_num"]):
+            grp = grp[grp["text"].map(lambda t: isinstance(t, str))]
+            words = [(str(t), c) for t, c in zip(grp["text"], grp["conf"])]
+            digit_confs.extend(float(c) for t, c in words if any(ch.isdigit() for ch in t))
+            txt = " ".join(t for t, _ in words).strip()
+            if txt:
+                lines.append(txt)
+                x0, y0 = int(grp["left"].min()), int(grp["top"].min())
+                x1 = int((grp["left"] + grp["width"]).max())
+                y1 = int((grp["top"] + grp["height"]).max())
+                boxes.append((x0, y0, x1 - x0, y1 - y0))
+
+    digit_conf = sum(digit_confs) / len(digit_confs) if digit_confs else None
+    return lines, digit_conf, boxes
+
+
+def hit_box(raw, lines, boxes, scale=1.0):
+    """Bounding box of the line(s) a phone hit was read from, divided by ``scale``.
+
+    A hit found in the joined text of a frame can span several lines; then the
+    box covers every line holding one of its tokens.
+    """
+    picked = [box for line, box in zip(lines, boxes) if raw in line]
+    if not picked:
+        tokens = raw.split()
+        picked = [box for line, box in zip(lines, boxes) if any(token in line for token in tokens)]
+    if not picked:
+        return None
+    x0 = min(x for x, _, _, _ in picked)
+    y0 = min(y for _, y, _, _ in picked)
+    x1 = max(x + w for x, _, w, _ in picked)
+    y1 = max(y + h for _, y, _, h in picked)
+    return [int(x0 / scale), int(y0 / scale), int((x1 - x0) / scale), int((y1 - y0) / scale)]
+
+
+class OCRLadder:
+    """Early-exit multi-variant OCR with confidence-driven escalation"""
+
+    def __init__(self, min_confidence, word_min_conf, variants=OCR_LADDER, ocr=ocr_lines):
+        self.min_confidence = min_confidence
+        self.word_min_conf = word_min_conf
+        self.variants = variants
+        # ocr(img, config, min_conf) -> (lines, digit confidence, line boxes)
+        self.ocr = ocr
+        self.contexts = {}
+        self.stats = Counter()
+        # Digit runs of the first pass that every pass failed to read as a
+        # phone number: a static date or price overlay stops escalating
+        self.dead_ends = OrderedDict()
+
+    def _image_for(self, variant, frame, processed):
+        if variant['source'] == 'frame':
+            profile = variant['profile']
+            if profile not in self.contexts:
+                self.contexts[profile] = PreprocessContext(profile)
+            img = self.contexts[profile].preprocess(frame)
+        else:
+            img = processed
+        return img
+
+    @staticmethod
+    def _resize(variant, img):
+        """Apply the variant's max_width and scale; returns (image, factor)"""
+        factor = 1.0
+        width = img.shape[1]
+        max_width = variant.get('max_width')
+        if max_width and width > max_width:
+            height = int(img.shape[0] * max_width / width)
+            img = cv2.resize(img, (max_width, height), interpolation=cv2.INTER_AREA)
+            factor = max_width / width
+        scale = variant.get('scale')
+        if scale:
+            img = cv2.resize(img, None, fx=scale, fy=scale, interpolation=cv2.INTER_CUBIC)
+            factor *= scale
+        return img, factor
+
+    def _read(self, variant, img):
+        """OCR ``img`` as the variant says; boxes come back in ``img`` pixels"""
+        strip = None
+        if variant.get('regions'):
+            regions = candidate_regions(img)
+            if regions == []:
+                # No line on screen long enough for a phone number
+                return [], None, []
+            if regions is not None:
+                strip = RegionStrip(img, regions)
+                img = strip.image
+        resized, factor = self._resize(variant, img)
+        lines, digit_conf, boxes = self.ocr(resized, self._config(variant), self.word_min_conf)
+        boxes = [tuple(round(v / factor) for v in box) for box in boxes]
+        if strip is not None:
+            boxes = [strip.to_source(box) for box in boxes]
+        return lines, digit_conf, boxes
+
+    @staticmethod
+    def _validated(hits):
+        """Only hits that are valid numbers (the OCR fallbacks accept look-alikes)"""
+        valid = []
+        for hit in hits:
+            try:
+                if phonenumbers.is_valid_number(phonenumbers.parse(hit[0], None)):
+                    valid.append(hit)
+            except phonenumbers.NumberParseException:
+                continue
+        return valid
+
+    @staticmethod
+    def _config(variant):
+        config = f"--oem 3 --psm {variant['psm']}"
+        if variant.get('whitelist'):
+            # Spaces can't go through the command line, tesseract keeps them anyway
+            config += f" -c tessedit_char_whitelist={variant['whitelist'].replace(' ', '')}"
+        return config
+
+    def needs_escalation(self, lines, digit_conf, hits, first_pass=False):
+        """Escalate only when digits are present but the result is doubtful"""
+        runs = phone_like_runs(lines)
+        if not runs:
+            # Nothing phone-like on screen: the common case, stop at the cheap pass
+            return False
+        if first_pass and all(run in self.dead_ends for run in runs):
+            # Every pass already failed on exactly these digits
+            return False
+        if digit_conf is not None and digit_conf < self.min_confidence:
+            return True
+        # A digit-like run that didn't validate as a phone number
+        return not hits
+
+    def _remember_dead_ends(self, runs):
+        for run in runs:
+            self.dead_ends[run] = True
+            self.dead_ends.move_to_end(run)
+        while len(self.dead_ends) > MAX_DEAD_ENDS:
+            self.dead_ends.popitem(last=False)
+
+    def run(self, frame, processed, scan):
+        """Return (lines, hits, variant name); ``scan(lines)`` extracts phone hits.
+
+        Hits come back as ``(e164, national, raw, box)`` where ``box`` is the
+        OCR bounding box in frame pixels. Hits from every pass that ran are
+        kept, so escalating never loses a number an earlier pass already found.
+        """
+        lines, all_hits, name = [], [], None
+        first_runs = None
+        for variant in self.variants:
+            name = variant['name']
+            img = self._image_for(variant, frame, processed)
+            lines, digit_conf, boxes = self._read(variant, img)
+            hits = scan(lines)
+            if variant.get('whitelist'):
+                hits = self._validated(hits)
+            # Every variant keeps the aspect ratio, so one factor maps back to the frame
+            scale = img.shape[1] / frame.shape[1]
+            all_hits.extend((e164, natl, raw, hit_box(raw, lines, boxes, scale)) for e164, natl, raw in hits)
+            if first_runs is None:
+                first_runs = phone_like_runs(lines)
+                escalate = self.needs_escalation(lines, digit_conf, hits, first_pass=True)
+            else:
+                escalate = self.needs_escalation(lines, digit_conf, hits)
+            if not escalate:
+                break
+        else:
+            if not all_hits:
+                self._remember_dead_ends(first_runs)
+        self.stats[name] += 1
+        return lines, all_hits, name
@@ -0,0 +1,230 @@
+import atexit
+import itertools
+import multiprocessing
+import os
+import queue
+import signal
+import threading
+from concurrent.futures import Future
+from pathlib import Path
+
+from django.conf import settings
+
+from .frame_ring import FrameRing, FrameSlot, attach, slot_view
+from .matching import get_matcher, parse_regions
+from .ocr import OCRLadder
+from .preprocessing import PreprocessContext
+from .scanning import FrameScanner
+
+
+# Imported once by the fork server, so every worker starts with OpenCV, pandas,
+# pytesseract and the phonenumbers metadata already loaded
+PRELOAD = ['api.ocr_workers']
+
+
+class OCRWorkerError(RuntimeError):
+    pass
+
+
+# Per-process state of a worker, built on first use and kept across frames
+_contexts = {}
+_ladders = {}
+_scanners = {}
+
+
+def ocr_frame(frame, profile, regions, min_confidence, word_min_conf):
+    """Preprocess, OCR and scan one frame.
+
+    Returns ``(lines, hits, ocr pass name, matcher stats)`` like
+    ``OCRLadder.run`` plus the frame's FrameScanner counters.
+    """
+    if profile not in _contexts:
+        _contexts[profile] = PreprocessContext(profile)
+    ladder_key = (min_confidence, word_min_conf)
+    if ladder_key not in _ladders:
+        _ladders[ladder_key] = OCRLadder(min_confidence, word_min_conf)
+    if regions not in _scanners:
+        _scanners[regions] = FrameScanner(regions)
+    scanner = _scanners[regions]
+    scanner.match_stats.clear()
+    lines, hits, name = _ladders[ladder_key].run(frame, _contexts[profile].preprocess(frame), scanner.scan_text_lines)
+    return lines, hits, name, dict(scanner.match_stats)
+
+
+def _worker_main(conn, regions, max_frames, ring_name, slot_bytes):
+    # Ctrl-C is for the server; it shuts the pool down itself
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # Matchers and prefix tables are ready before the first frame arrives
+    for key in [regions] + [(region,) for region in regions]:
+        get_matcher(key)
+    ring = attach(ring_name) if ring_name else None
+    for _ in range(max_frames) if max_frames else itertools.count():
+        try:
+            job = conn.recv()
+        except EOFError:
+            return
+        frame, *options = job
+        try:
+            if isinstance(frame, FrameSlot):
+                # Read the frame where the server put it
+                frame = slot_view(ring.buf, frame, slot_bytes)
+            conn.send((True, ocr_frame(frame, *options)))
+        except Exception as e:
+            conn.send((False, f"{type(e).__name__}: {e}"))
+    conn.close()
+
+
+class OCRWorkerPool:
+    """Long-lived OCR processes, fed frames over pipes.
+
+    Workers are forked from a fork server that has the extraction stack
+    imported, then build the phone matchers once and stay resident. Each
+    worker has a feeder thread in this process that takes a job from the
+    shared queue, sends it down the worker's pipe and resolves the job's
+    Future with the answer. A worker exits after ``max_frames`` frames
+    (0 = never) and its feeder forks a fresh one, so memory creep in
+    OpenCV or tesseract bindings stays bounded.
+
+    Frames travel through ``ring``, a FrameRing of ``slots`` shared memory
+    slots of ``slot_bytes`` each (slot_bytes=0 sends them down the pipe).
+    """
+
+    def __init__(self, processes, max_frames=1000, regions=('IL',), slots=0, slot_bytes=6 * 1024 * 1024):
+        self.processes = max(int(processes), 1)
+        self.max_frames = max_frames
+        self.regions = tuple(regions)
+        # One frame in flight per worker for a few tasks, plus the one each is handling
+        self.ring = FrameRing(slots or self.processes * 3, slot_bytes) if slot_bytes else None
+        methods = multiprocessing.get_all_start_methods()
+        self.context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+        if self.context.get_start_method() == 'forkserver':
+            self.context.set_forkserver_preload(PRELOAD)
+            # The fork server doesn't get this process's sys.path on older
+            # Pythons and would silently skip the preload
+            project_dir = str(Path(__file__).resolve().parent.parent)
+            paths = [path for path in os.environ.get('PYTHONPATH', '').split(os.pathsep) if path]
+            if project_dir not in paths:
+                os.environ['PYTHONPATH'] = os.pathsep.join([project_dir] + paths)
+        # Bounded, so producers wait instead of piling frames up in memory
+        self.jobs = queue.Queue(maxsize=self.processes * 2)
+        self.recycled = 0
+        self._threads = []
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.processes):
+                thread = threading.Thread(target=self._feed, name=f'ocr-feeder-{i}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            print(f"🔥 Started {self.processes} OCR worker processes "
+                  f"({self.context.get_start_method()}, recycled every {self.max_frames or '∞'} frames)")
+
+    def _spawn(self):
+        parent_conn, child_conn = self.context.Pipe()
+        process = self.context.Process(
+            target=_worker_main,
+            args=(child_conn, self.regions, self.max_frames, self.ring and self.ring.name,
+                  self.ring and self.ring.slot_bytes),
+            daemon=True
+        )
+        process.start()
+        child_conn.close()
+        return process, parent_conn
+
+    def _retire(self, process, conn):
+        conn.close()
+        process.join(timeout=5)
+        if process.is_alive():
+            process.kill()
+            process.join()
+
+    def _feed(self):
+        process, conn = self._spawn()
+        done = 0
+        while True:
+            item = self.jobs.get()
+            if item is None:
+                # Pool closed
+                self._retire(process, conn)
+                return
+            future, job = item
+            if not future.set_running_or_notify_cancel():
+                continue
+            # A worker that dies mid-frame (killed, out of memory) is replaced
+            # and the frame retried once on the new one
+            for _ in range(2):
+                try:
+                    conn.send(job)
+                    ok, result = conn.recv()
+                    break
+                except (EOFError, OSError):
+                    self._retire(process, conn)
+                    error = OCRWorkerError(f"OCR worker {process.pid} died (exit code {process.exitcode})")
+                    process, conn = self._spawn()
+                    done = 0
+            else:
+                future.set_exception(error)
+                continue
+            if ok:
+                future.set_result(result)
+            else:
+                future.set_exception(OCRWorkerError(result))
+            done += 1
+            if self.max_frames and done >= self.max_frames:
+                # The worker has exited on its own after its last frame
+                self._retire(process, conn)
+                process, conn = self._spawn()
+                done = 0
+                self.recycled += 1
+
+    def submit(self, frame, profile, regions, min_confidence, word_min_conf):
+        """Queue one frame for OCR and return a Future of ``ocr_frame``'s result.
+
+        ``frame`` is an array or a FrameSlot of ``ring``. Blocks while the
+        job queue is full. The frame must not be modified or its slot
+        released until the Future is done.
+        """
+        self.start()
+        future = Future()
+        self.jobs.put((future, (frame, profile, tuple(regions), min_confidence, word_min_conf)))
+        return future
+
+    def close(self):
+        """Stop the workers, then free the ring they map"""
+        with self._lock:
+            threads, self._threads = self._threads, []
+        try:
+            for _ in threads:
+                self.jobs.put(None, timeout=10)
+        except queue.Full:
+            # Feeders stuck on a frame; the daemon workers go down with this process
+            pass
+        for thread in threads:
+            thread.join(timeout=10)
+        if self.ring is not None:
+            self.ring.close()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_ocr_pool():
+    """Return the process-wide OCR worker pool, or None when OCR runs in the task threads"""
+    global _pool
+    if not settings.VIDEO_OCR_PROCESSES:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = OCRWorkerPool(
+                settings.VIDEO_OCR_PROCESSES,
+                settings.VIDEO_OCR_MAX_FRAMES,
+                parse_regions(settings.PHONE_REGIONS),
+                settings.VIDEO_FRAME_SLOTS,
+                int(settings.VIDEO_FRAME_SLOT_MB * 1024 * 1024)
+            )
+            atexit.register(_pool.close)
+        return _pool
@@ -0,0 +1,143 @@
+import cv2
+import numpy as np
+
+
+# Named preprocessing profiles: each is the ordered list of steps run on a frame.
+# Steps are PreprocessContext methods, so a new profile only needs an entry here.
+PREPROCESS_PROFILES = {
+    # Clean screen recordings / rendered overlays: tesseract does its own binarisation
+    'screen': ('resize', 'gray'),
+    # The original chain, good for most footage
+    'standard': ('resize', 'gray', 'clahe', 'adaptive_threshold'),
+    # Noisy camera footage: remove sensor noise before thresholding
+    'camera': ('resize', 'gray', 'denoise', 'clahe', 'adaptive_threshold'),
+}
+
+DEFAULT_PREPROCESS_PROFILE = 'standard'
+AUTO_PREPROCESS_PROFILE = 'auto'
+
+
+class PreprocessContext:
+    """Reusable OCR preprocessing state, created once per worker.
+
+    The CLAHE object is built once and every step writes into a ``dst`` buffer
+    that is allocated on first use and reused for as long as the frame size
+    stays the same. The returned image is one of those buffers, so it is only
+    valid until the next call.
+    """
+
+    def __init__(self, profile=DEFAULT_PREPROCESS_PROFILE, min_width=400):
+        if profile not in PREPROCESS_PROFILES:
+            raise ValueError(f"Unknown preprocessing profile: {profile}")
+        self.profile = profile
+        self.steps = [getattr(self, step) for step in PREPROCESS_PROFILES[profile]]
+        self.min_width = min_width
+        self._clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
+        self._buffers = {}
+
+    def _buffer(self, name, shape):
+        buf = self._buffers.get(name)
+        if buf is None or buf.shape != shape:
+            buf = np.empty(shape, dtype=np.uint8)
+            self._buffers[name] = buf
+        return buf
+
+    def resize(self, img):
+        """Upscale frames narrower than ``min_width`` (tesseract needs enough pixels per glyph)"""
+        height, width = img.shape[:2]
+        if width >= self.min_width:
+            return img
+        scale_factor = self.min_width / width
+        new_width = int(width * scale_factor)
+        new_height = int(height * scale_factor)
+        shape = (new_height, new_width) + img.shape[2:]
+        if 'resized' not in self._buffers:
+            print(f"📏 Resizing frames from {width}x{height} to {new_width}x{new_height} for better OCR")
+        dst = self._buffer('resized', shape)
+        cv2.resize(img, (new_width, new_height), dst=dst, interpolation=cv2.INTER_CUBIC)
+        return dst
+
+    def gray(self, img):
+        # The ffmpeg decoder already delivers single-channel frames
+        if img.ndim == 2:
+            return img
+        dst = self._buffer('gray', img.shape[:2])
+        cv2.cvtColor(img, cv2.COLOR_BGR2GRAY, dst=dst)
+        return dst
+
+    def denoise(self, img):
+        dst = self._buffer('denoise', img.shape)
+        cv2.medianBlur(img, 3, dst=dst)
+        return dst
+
+    def clahe(self, img):
+        """Contrast enhancement"""
+        dst = self._buffer('clahe', img.shape)
+        self._clahe.apply(img, dst=dst)
+        return dst
+
+    def adaptive_threshold(self, img):
+        dst = self._buffer('threshold', img.shape)
+        cv2.adaptiveThreshold(img, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+                              cv2.THRESH_BINARY, 31, 9, dst=dst)
+        return dst
+
+    def preprocess(self, img):
+        """Run the profile's steps, writing into reused buffers"""
+        # The old 1x1 morphological open was an identity operation, so no profile has it
+        for step in self.steps:
+            img = step(img)
+        return img
+
+
+def frame_statistics(gray):
+    """Cheap statistics used to pick a profile for a grayscale frame"""
+    # Share of horizontally adjacent pixels that are exactly equal: high for
+    # rendered screen content, low for camera footage with sensor noise
+    flat_ratio = float(np.mean(gray[:, 1:] == gray[:, :-1]))
+    # Median absolute deviation from a 3x3 median filter estimates noise
+    noise = float(np.median(cv2.absdiff(gray, cv2.medianBlur(gray, 3))))
+    return {'flat_ratio': flat_ratio, 'noise': noise, 'contrast': float(gray.std())}
+
+
+def choose_profile(frames):
+    """Pick a preprocessing profile from a few sampled frames"""
+    stats = [frame_statistics(f if f.ndim == 2 else cv2.cvtColor(f, cv2.COLOR_BGR2GRAY)) for f in frames]
+    if not stats:
+        return DEFAULT_PREPROCESS_PROFILE, {}
+
+    summary = {key: sum(s[key] for s in stats) / len(stats) for key in stats[0]}
+    if summary['flat_ratio'] >= 0.5 and summary['noise'] < 1:
+        profile = 'screen'
+    elif summary['noise'] >= 4:
+        profile = 'camera'
+    else:
+        profile = DEFAULT_PREPROCESS_PROFILE
+    return profile, summary
+
+
+def sample_frames(video_path, count=5):
+    """Read ``count`` frames spread evenly across the video"""
+    cap = cv2.VideoCapture(video_path)
+    frames = []
+    try:
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        positions = [int(total_frames * (i + 0.5) / count) for i in range(count)] if total_frames > 0 else [0]
+        for pos in positions:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, pos)
+            ret, frame = cap.read()
+            if ret:
+                frames.append(frame)
+    finally:
+        cap.release()
+    return frames
+
+
+def resolve_profile(profile, video_path):
+    """Resolve 'auto' to a concrete profile name using sampled frame statistics"""
+    if profile != AUTO_PREPROCESS_PROFILE:
+        return profile
+    chosen, summary = choose_profile(sample_frames(video_path))
+    print(f"🧪 Auto preprocessing profile: {chosen} "
+          f"(flat={summary.get('flat_ratio', 0):.2f}, noise={summary.get('noise', 0):.1f})")
+    return chosen
@@ -3,4 +3,5 @@ from . import consumers
 
 websocket_urlpatterns = [
     re_path(r'ws/task/(?P<task_id>[^/]+)/$', consumers.VideoProcessingConsumer.as_asgi()),
+    re_path(r'ws/tasks/$', consumers.TaskDashboardConsumer.as_asgi()),
 ]
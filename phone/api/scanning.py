@@ -0,0 +1,137 @@
+from collections import Counter
+
+import phonenumbers
+from phonenumbers import PhoneNumberFormat
+
+from .matching import count_digits, get_matcher
+
+
+class FrameScanner:
+    """Phone numbers in the OCR lines of a frame, for the task's regions.
+
+    Needs no database, so OCR worker processes use it as well as VideoProcessor.
+    """
+    
+    def __init__(self, regions):
+        self.regions = tuple(regions)
+        self.match_stats = Counter()
+    
+    def scan_text_lines(self, text_lines):
+        """Extract phone numbers from OCR lines of one frame"""
+        # Each distinct line once, then only the candidates that run across a
+        # line break (a number split over two lines)
+        hits = []
+        for text in dict.fromkeys(text_lines):
+            hits.extend(self.extract_phone_numbers(text, self.regions))
+        hits.extend(get_matcher(self.regions).match_boundaries(text_lines, self.match_stats))
+        return hits
+    
+    def extract_phone_numbers(self, text, regions):
+        """Extract phone numbers from text using libphonenumber with improved parsing"""
+        # First, try direct parsing (all regions in one pass)
+        hits = get_matcher(regions).match(text, self.match_stats)
+        
+        # If no hits, try to fix common OCR issues (Israeli number layouts only,
+        # all of which need at least 8 digits)
+        if not hits and "IL" in regions and count_digits(text) >= 8:
+            print(f"🔍 No direct hits for text: '{text}' - trying OCR fixes...")
+            
+            # Strategy 1: Add country code if missing
+            if not text.startswith("+972"):
+                import re
+                
+                # Try multiple patterns to catch different OCR formats
+                patterns = [
+                    r'(\d{2})-?B?(\d{2})-?(\d{4})',  # 54-B52-8105
+                    r'(\d{2})-(\d{3})-(\d{4})',      # 52-268-8331
+                    r'(\d{2})B(\d{2})(\d{4})',       # 54B528105
+                    r'(\d{2})(\d{2})(\d{4})',        # 54528105
+                ]
+                
+                for pattern in patterns:
+                    matches = re.findall(pattern, text)
+                    print(f"🔍 Pattern {pattern} found {len(matches)} matches: {matches}")
+                    
+                    for match in matches:
+                        if len(match) == 3:
+                            part1, part2, part3 = match
+                            print(f"🔍 Processing match: {part1}, {part2}, {part3}")
+                            
+                            # Fix OCR errors (B → 8)
+                            part2 = part2.replace('B', '8')
+                            
+                            # Try different combinations
+                            candidates = [
+                                f"+972{part1}{part2}{part3}",
+                                f"+972 {part1}-{part2}-{part3}",
+                                f"+972{part1}-{part2}-{part3}",
+                                f"+972{part1}{part2}-{part3}",
+                                f"+972{part1}-{part2}{part3}",
+                                f"0{part1}-{part2}-{part3}",  # Israeli national format
+                                f"0{part1}{part2}{part3}"     # Israeli national format no dashes
+                            ]
+                            
+                            validation_failed = True
+                            for candidate in candidates:
+                                try:
+                                    print(f"🔍 Trying candidate: {candidate}")
+                                    parsed = phonenumbers.parse(candidate, "IL")
+                                    if phonenumbers.is_possible_number(parsed) and phonenumbers.is_valid_number(parsed):
+                                        e164 = phonenumbers.format_number(parsed, PhoneNumberFormat.E164)
+                                        natl = phonenumbers.format_number(parsed, PhoneNumberFormat.NATIONAL)
+                                        print(f"✅ Valid phone number found: {e164} ({natl})")
+                                        hits.append((e164, natl, text))
+                                        validation_failed = False
+                                        break
+                                except Exception as e:
+                                    print(f"❌ Failed to parse {candidate}: {e}")
+                                    continue
+                            
+                            # If validation failed but we have a pattern match, use fallback
+                            if validation_failed and part1.startswith('5'):
+                                e164 = f"+972{part1}{part2}{part3}"
+                                natl = f"0{part1}-{part2}-{part3}"
+                                print(f"✅ Fallback: Accepting {e164} ({natl}) as Israeli mobile (validation failed but pattern looks valid)")
+                                hits.append((e164, natl, text))
+                                break
+                            
+                            if hits:  # If we found a valid number, break out of pattern loop
+                                break
+                    
+                    if hits:  # If we found hits, break out of patterns loop
+                        break
+            
+            # Strategy 2: Fallback - accept numbers that look like Israeli mobile numbers
+            if not hits:
+                print(f"🔍 No hits with strict validation, trying fallback for: '{text}'")
+                import re
+                
+                # Look for patterns that look like Israeli mobile numbers
+                patterns = [
+                    r'(\d{2})-?B?(\d{2})-?(\d{4})',  # 54-B52-8105
+                    r'(\d{2})-(\d{3})-(\d{4})',      # 52-268-8331
+                ]
+                
+                for pattern in patterns:
+                    matches = re.findall(pattern, text)
+                    if matches:
+                        for match in matches:
+                            if len(match) == 3:
+                                part1, part2, part3 = match
+                                # Fix OCR errors
+                                part2 = part2.replace('B', '8')
+                                
+                                # Create Israeli mobile number
+                                if part1.startswith('5'):  # Israeli mobile prefix
+                                    e164 = f"+972{part1}{part2}{part3}"
+                                    natl = f"0{part1}-{part2}-{part3}"
+                                    
+                                    # Basic validation - check if it looks like a valid Israeli mobile
+                                    if len(part1 + part2 + part3) == 9 and part1.startswith('5'):
+                                        print(f"✅ Fallback: Accepting {e164} ({natl}) as Israeli mobile")
+                                        hits.append((e164, natl, text))
+                                        break
+                        if hits:
+                            break
+        
+        return hits
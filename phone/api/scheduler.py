@@ -0,0 +1,151 @@
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+from .models import VideoProcessingTask
+from .snapshots import publish_snapshot
+
+
+def estimate_sampled_frames(video_path, sample_fps):
+    """Estimate how many frames a task will OCR (reads the container header only)"""
+    import cv2
+
+    cap = cv2.VideoCapture(str(video_path))
+    try:
+        if not cap.isOpened():
+            return 0
+        video_fps = cap.get(cv2.CAP_PROP_FPS) or 25
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    finally:
+        cap.release()
+    return total_frames // max(int(round(video_fps / sample_fps)), 1)
+
+
+def warm_up(regions=None):
+    """Import the extraction stack and build the phone matchers before the first task needs them"""
+    started = time.perf_counter()
+    import phonenumbers
+
+    from . import video_processor  # noqa: F401  pulls in cv2, pandas and pytesseract
+    from .matching import get_matcher, parse_regions
+    from .ocr_workers import get_ocr_pool
+
+    try:
+        regions = parse_regions(regions or settings.PHONE_REGIONS)
+    except ValueError as e:
+        print(f"⚠️ Skipping matcher warm-up: {e}")
+        return
+    # Tasks may ask for the whole list or any single region of it
+    for key in [regions] + [(region,) for region in regions]:
+        matcher = get_matcher(key)
+        for region in key:
+            example = phonenumbers.example_number(region)
+            if example is not None:
+                # First parse compiles libphonenumber's lazily built patterns
+                matcher.match(phonenumbers.format_number(example, phonenumbers.PhoneNumberFormat.NATIONAL))
+    print(f"🔥 Extraction stack ready for {', '.join(regions)} in {time.perf_counter() - started:.2f}s")
+    pool = get_ocr_pool()
+    if pool is not None:
+        pool.start()
+
+
+def run_task(task_id):
+    """Process one task, marking it failed if the processor itself blows up"""
+    from .video_processor import VideoProcessor
+
+    try:
+        print(f"🚀 Starting background processing for task {task_id}")
+        processor = VideoProcessor(task_id)
+        processor.process_video()
+    except Exception as e:
+        print(f"❌ Error in background processing: {str(e)}")
+        # Update task status to failed
+        try:
+            task = VideoProcessingTask.objects.get(id=task_id)
+            task.status = 'failed'
+            task.error_message = str(e)
+            task.completed_at = timezone.now()
+            task.save()
+            publish_snapshot(task)
+        except VideoProcessingTask.DoesNotExist:
+            pass
+
+
+class ProcessingScheduler:
+    """Fixed-size pool of worker threads shared by all processing tasks"""
+
+    def __init__(self, workers):
+        self.workers = max(int(workers), 1)
+        self.queue = queue.Queue()
+        # Task ids waiting in the queue, so a task is never queued twice
+        self._queued = set()
+        self._queued_lock = threading.Lock()
+        self._threads = []
+        self._lock = threading.Lock()
+
+    def _ensure_started(self, warm=False):
+        with self._lock:
+            if self._threads:
+                return
+            if warm:
+                threading.Thread(target=warm_up, name='video-warmup', daemon=True).start()
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._worker, name=f'video-worker-{i}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            print(f"🧵 Started {self.workers} video processing workers")
+
+    def _worker(self):
+        while True:
+            task_id = self.queue.get()
+            with self._queued_lock:
+                self._queued.discard(task_id)
+            try:
+                run_task(task_id)
+            finally:
+                # Worker threads are long-lived, don't leak DB connections
+                close_old_connections()
+                self.queue.task_done()
+
+    def start(self):
+        """Start the workers now and warm them up in the background"""
+        self._ensure_started(warm=True)
+
+    def submit(self, task_id):
+        """Queue a single task; a task that is already waiting keeps its place"""
+        self._ensure_started()
+        with self._queued_lock:
+            if str(task_id) in self._queued:
+                return
+            self._queued.add(str(task_id))
+        self.queue.put(str(task_id))
+
+    def submit_many(self, estimates):
+        """Queue many tasks given as {task_id: estimated_frames}.
+
+        Longest-first ordering (LPT) balances the total frame count across the
+        pool, so a batch doesn't end with one worker chewing on a long clip
+        while the others sit idle.
+        """
+        for task_id, _ in sorted(estimates.items(), key=lambda item: item[1], reverse=True):
+            self.submit(task_id)
+
+    def pending(self):
+        return self.queue.qsize()
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """Return the process-wide scheduler, creating it on first use"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = ProcessingScheduler(settings.VIDEO_PROCESSING_WORKERS)
+        return _scheduler
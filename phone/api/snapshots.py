@@ -0,0 +1,45 @@
+from django.core.cache import caches
+
+
+SNAPSHOT_CACHE = 'task_snapshots'
+
+
+def _key(task_id):
+    return f'task_snapshot:{task_id}'
+
+
+def snapshot_from_task(task):
+    """The fields a WebSocket client needs to render a task's progress"""
+    return {
+        'task_id': str(task.id),
+        'status': task.status,
+        'progress': task.progress,
+        'current_frame': task.current_frame,
+        'total_frames': task.total_frames,
+        'message': task.current_message
+    }
+
+
+def publish_snapshot(task):
+    """Store the latest progress snapshot for a task"""
+    caches[SNAPSHOT_CACHE].set(_key(task.id), snapshot_from_task(task))
+
+
+def get_snapshot(task_id):
+    """Return the cached snapshot or None on a miss"""
+    return caches[SNAPSHOT_CACHE].get(_key(task_id))
+
+
+async def aget_snapshot(task_id):
+    """get_snapshot for async consumers"""
+    return await caches[SNAPSHOT_CACHE].aget(_key(task_id))
+
+
+async def aget_snapshots(task_ids):
+    """Cached snapshots of several tasks in one cache round trip, keyed by task id"""
+    found = await caches[SNAPSHOT_CACHE].aget_many([_key(task_id) for task_id in task_ids])
+    return {task_id: found[_key(task_id)] for task_id in task_ids if _key(task_id) in found}
+
+
+def delete_snapshot(task_id):
+    caches[SNAPSHOT_CACHE].delete(_key(task_id))
@@ -0,0 +1,146 @@
+import threading
+import time
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.utils import timezone
+
+from .models import VideoProcessingTask
+from .snapshots import publish_snapshot
+
+
+ACTIONS = ('cancel', 'pause', 'resume')
+
+
+class TaskControlError(Exception):
+    pass
+
+
+class TaskControl:
+    """Pause and cancel requests for one running task.
+
+    Requests only set flags; the processor checks them between frames
+    (``wait``) and does the status changes itself, so it never races the
+    API over the task row. ``stopped`` is set once the processor has let go
+    of the task and its video file.
+    """
+
+    def __init__(self):
+        self._running = threading.Event()
+        self._running.set()
+        self.cancelled = False
+        self.stopped = threading.Event()
+
+    @property
+    def paused(self):
+        return not self._running.is_set()
+
+    def pause(self):
+        self._running.clear()
+
+    def resume(self):
+        self._running.set()
+
+    def cancel(self):
+        self.cancelled = True
+        # A paused task has to wake up to notice
+        self._running.set()
+
+    def wait(self):
+        """Block while paused; returns the seconds spent paused"""
+        started = time.monotonic()
+        self._running.wait()
+        return time.monotonic() - started
+
+
+# Tasks being processed in this process
+_controls = {}
+_controls_lock = threading.Lock()
+
+
+def register_control(task_id):
+    """New control for a task, or None if this process is already running it"""
+    with _controls_lock:
+        if str(task_id) in _controls:
+            return None
+        control = _controls[str(task_id)] = TaskControl()
+    return control
+
+
+def unregister_control(task_id, control):
+    """Drop ``control``; a control registered by someone else stays"""
+    with _controls_lock:
+        if _controls.get(str(task_id)) is control:
+            del _controls[str(task_id)]
+    control.stopped.set()
+
+
+def get_control(task_id):
+    with _controls_lock:
+        return _controls.get(str(task_id))
+
+
+def _notify(task, event):
+    """Tell WebSocket clients about a change made to a task that isn't running"""
+    from .consumers import ALL_TASKS_GROUP
+
+    publish_snapshot(task)
+    channel_layer = get_channel_layer()
+    if channel_layer:
+        for group in (f'video_task_{task.id}', ALL_TASKS_GROUP):
+            async_to_sync(channel_layer.group_send)(group, {'task_id': str(task.id), 'status': task.status, **event})
+
+
+def control_task(task_id, action):
+    """Cancel, pause or resume a task; returns the task's status afterwards.
+
+    A task this process is running gets the request between two frames and
+    reports the change itself. A task still waiting in the queue is changed
+    in the database directly, and a paused queued task is queued again on
+    resume (the scheduler ignores it while its first entry is still queued).
+
+    Raises TaskControlError when the action doesn't apply and
+    VideoProcessingTask.DoesNotExist for an unknown task.
+    """
+    from .video_processor import start_video_processing
+
+    if action not in ACTIONS:
+        raise TaskControlError(f"Unknown action. Choose one of: {', '.join(ACTIONS)}")
+    # Same spelling of the id as the processor registered
+    task_id = str(VideoProcessingTask.objects.values_list('id', flat=True).get(id=task_id))
+    for _ in range(2):
+        control = get_control(task_id)
+        if control is not None:
+            if control.cancelled:
+                raise TaskControlError("Task is being cancelled")
+            getattr(control, action)()
+            return VideoProcessingTask.objects.values_list('status', flat=True).get(id=task_id)
+
+        # Not started yet: claim the row from the scheduler with a conditional update
+        queued = VideoProcessingTask.objects.filter(id=task_id, started_at__isnull=True)
+        if action == 'cancel':
+            changed = queued.filter(status__in=['pending', 'paused']).update(
+                status='cancelled', completed_at=timezone.now(), current_message='Cancelled before processing started'
+            )
+        elif action == 'pause':
+            changed = queued.filter(status='pending').update(status='paused', current_message='Paused while queued')
+        else:
+            changed = queued.filter(status='paused').update(status='pending', current_message='Queued again')
+        if changed:
+            task = VideoProcessingTask.objects.get(id=task_id)
+            if action == 'cancel':
+                _notify(task, {'type': 'task_cancelled', 'message': task.current_message,
+                               'phone_numbers_count': 0})
+            else:
+                _notify(task, {'type': 'progress_update', 'progress': task.progress,
+                               'current_frame': task.current_frame, 'total_frames': task.total_frames,
+                               'message': task.current_message})
+            if action == 'resume':
+                start_video_processing(task_id)
+            return task.status
+        # A worker may have picked the task up in between; look again once
+
+    status = VideoProcessingTask.objects.values_list('status', flat=True).get(id=task_id)
+    if status in ('processing', 'paused'):
+        raise TaskControlError("Task is being processed by another process")
+    raise TaskControlError(f"Cannot {action} a {status} task")
@@ -1,3 +1,1195 @@
-from django.test import TestCase
+import asyncio
+import base64
+import csv
+import importlib.util
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+from collections import Counter
+from pathlib import Path
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import cv2
+import numpy as np
+import phonenumbers
+from channels.exceptions import ChannelFull
+from channels.layers import get_channel_layer
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.core.cache import caches
+from django.core.management import call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from ninja.errors import HttpError
+
+from . import matching, views
+from .budgets import TaskBudget, frame_memory
+from .channel_layers import SQLiteChannelLayer
+from .consumers import TaskDashboardConsumer
+from .evidence import EvidenceCollector, EvidenceWriter, evidence_dir
+from .frame_ring import FrameRing, attach, slot_view
+from .frame_sources import FFmpegFrameSource, ffmpeg_available, open_frame_source
+from .management.commands.benchmark_startup import measure
+from .management.commands.watch_videos import Command as WatchVideosCommand, SettlingFiles
+from .models import PhoneNumberIndex, PhoneNumberResult, VideoBatch, VideoProcessingTask
+from .ocr import OCRLadder
+from .ocr_workers import OCRWorkerError, OCRWorkerPool
+from .preprocessing import PREPROCESS_PROFILES, PreprocessContext, choose_profile, resolve_profile
+from .routing import websocket_urlpatterns
+from .scanning import FrameScanner
+from .scheduler import ProcessingScheduler
+from .snapshots import SNAPSHOT_CACHE, publish_snapshot
+from .task_control import TaskControl, TaskControlError, control_task, get_control, register_control, unregister_control
+from .tracking import PhoneTracker
+from .video_processor import VideoProcessor
+
+
+# OCR lines of a few frames: numbers on their own line, numbers split across
+# lines, repeated lines, OCR-garbled Israeli numbers and frames without numbers
+FRAMES = [
+    ["Call us today", "054-852-8105"],
+    ["Tel 03", "1234567 office"],
+    ["054-852-", "8105", "Fax 03-123-4567"],
+    ["+49 30 12345678", "Fax +49 30 12345679"],
+    ["054-852-8105", "054-852-8105"],
+    ["Whatsapp 54-B52-8105"],
+    ["Subscribe to our channel", "Open 09:00-18:00"],
+    ["Order 2023 10 19", "Total 1299"],
+    ["0548528105 03 1234567"],
+]
+
+# Typical overlay frames: each number sits inside a line, so the old scanner
+# matched it once in its line and again in the joined text
+OVERLAY_FRAMES = [
+    ["Call us today", "054-852-8105"],
+    ["+49 30 12345678", "Fax +49 30 12345679"],
+    ["Big sale", "Call 054-852-8105 now", "www.example.com"],
+    ["Order 2023 10 19", "Total 1299"],
+]
+
+
+def write_video(path, frames, fps):
+    """MJPG AVI of ``frames``; OpenCV writes it without ffmpeg"""
+    height, width = frames[0].shape[:2]
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*'MJPG'), fps, (width, height))
+    for frame in frames:
+        writer.write(frame)
+    writer.release()
+
+
+class ScanTextLinesTests(TestCase):
+    def setUp(self):
+        task = VideoProcessingTask.objects.create(video_file='videos/test.mp4', region='IL,DE')
+        self.processor = VideoProcessor(task.id)
+
+    def joined_text_scan(self, text_lines):
+        """The previous scanner: every distinct line plus the joined text"""
+        texts_to_scan = set(text_lines)
+        texts_to_scan.add("\n".join(text_lines))
+        hits = []
+        for text in texts_to_scan:
+            hits.extend(self.processor.extract_phone_numbers(text, self.processor.regions))
+        return hits
+
+    def test_same_numbers_as_joined_text_scan(self):
+        for text_lines in FRAMES + OVERLAY_FRAMES:
+            with self.subTest(text_lines=text_lines):
+                expected = {(e164, natl) for e164, natl, _ in self.joined_text_scan(text_lines)}
+                found = {(e164, natl) for e164, natl, _ in self.processor.scan_text_lines(text_lines)}
+                self.assertEqual(found, expected)
+
+    def test_number_split_across_lines(self):
+        hits = self.processor.scan_text_lines(["054-852-", "8105"])
+        self.assertEqual([e164 for e164, _, _ in hits], ['+972548528105'])
+
+    def test_half_the_matching_cost(self):
+        self.processor.match_stats = Counter()
+        for text_lines in OVERLAY_FRAMES:
+            self.joined_text_scan(text_lines)
+        before = self.processor.match_stats['parsed']
+
+        self.processor.match_stats = Counter()
+        for text_lines in OVERLAY_FRAMES:
+            self.processor.scan_text_lines(text_lines)
+        after = self.processor.match_stats['parsed']
+
+        self.assertLessEqual(after, before * 0.6)
+
+    def test_quick_extract_uses_the_same_scan(self):
+        import pandas as pd
+
+        video_dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, video_dir)
+        write_video(video_dir / 'clip.avi', [np.zeros((48, 64, 3), np.uint8)] * 6, fps=4)
+        # OCR of every frame: the number split over two lines
+        ocr_data = pd.DataFrame({'block_num': [1, 1], 'par_num': [1, 1], 'line_num': [1, 2],
+                                 'conf': [90, 90], 'text': ['054-852-', '8105']})
+        video = SimpleUploadedFile('clip.avi', (video_dir / 'clip.avi').read_bytes())
+        with mock.patch('pytesseract.image_to_data', return_value=ocr_data), \
+                mock.patch.object(FrameScanner, 'scan_text_lines', autospec=True,
+                                  side_effect=FrameScanner.scan_text_lines) as scan_text_lines:
+            response = self.client.post('/api/extract-phone-numbers', {'video': video})
+        self.assertEqual(response.status_code, 200)
+        [number] = response.json()['phone_numbers']
+        self.assertEqual((number['e164_number'], number['frame_count']), ('+972548528105', 6))
+        self.assertEqual(scan_text_lines.call_count, 6)
+
+
+# Extra lines for comparing with PhoneNumberMatcher: trunk prefix missing,
+# other regions' formats and several numbers on a line
+MATCHER_LINES = [line for frame in FRAMES + OVERLAY_FRAMES for line in frame] + [
+    "Tel 548528105", "02-1234567", "2 1234567", "call 212-555-0123", "212 555 0123", "(030) 12345678",
+    "30 12345678", "+1 212 555 0123", "050 123 4567 and 03-1234567", "020 7946 0958",
+]
+
+
+class PhoneMatcherTests(SimpleTestCase):
+    def matched(self, matcher):
+        return [{hit[0] for hit in matcher.match(line)} for line in MATCHER_LINES]
+
+    def test_same_numbers_as_phone_number_matcher(self):
+        for region in ('IL', 'DE', 'US', 'GB'):
+            expected = [
+                {phonenumbers.format_number(match.number, phonenumbers.PhoneNumberFormat.E164)
+                 for match in phonenumbers.PhoneNumberMatcher(line, region)}
+                for line in MATCHER_LINES
+            ]
+            with self.subTest(region=region):
+                self.assertEqual(self.matched(matching.PhoneMatcher((region,))), expected)
+
+    def test_works_without_private_apis(self):
+        regions = ('IL', 'DE', 'US')
+        expected = self.matched(matching.PhoneMatcher(regions))
+        matching.prefix_table.cache_clear()
+        self.addCleanup(matching.prefix_table.cache_clear)
+        with mock.patch.object(matching, 'sre_parse', None), \
+                mock.patch.object(matching, '_is_national_prefix_present_if_required', None):
+            matcher = matching.PhoneMatcher(regions)
+            self.assertEqual(set(matcher.prefix_tables.values()), {None})
+            self.assertEqual(self.matched(matcher), expected)
+
+
+class ColdStartTests(SimpleTestCase):
+    def test_api_process_skips_extraction_stack(self):
+        # The shipped default, whatever this shell sets
+        with mock.patch.dict('os.environ'):
+            os.environ.pop('VIDEO_PREWARM', None)
+            modules = measure('api')['modules']
+        for name in ('cv2', 'numpy', 'pandas', 'pytesseract'):
+            self.assertNotIn(name, modules)
+
+
+class TaskBudgetTests(TestCase):
+    def test_memory_budget_downscales_and_records(self):
+        task = VideoProcessingTask.objects.create(video_file='videos/test.mp4', max_memory_mb=20)
+        budget = TaskBudget(task)
+        width = budget.plan_frames(1920, 1080, 3, 1)
+        self.assertLess(width, 1920)
+        self.assertLessEqual(frame_memory(width, 1080 * width // 1920, 3, 1), 20 * 1024 * 1024)
+        task.refresh_from_db()
+        self.assertEqual([d['action'] for d in task.degradations], ['downscale'])
+
+    def test_within_budget_records_nothing(self):
+        task = VideoProcessingTask.objects.create(video_file='videos/test.mp4', max_memory_mb=100, max_workers=4)
+        budget = TaskBudget(task)
+        self.assertIsNone(budget.plan_frames(1920, 1080, 3, 1))
+        self.assertEqual(budget.workers(2), 2)
+        task.refresh_from_db()
+        self.assertEqual(task.degradations, [])
+
+
+class TaskControlTests(TestCase):
+    def setUp(self):
+        self.task = VideoProcessingTask.objects.create(video_file='videos/test.mp4')
+        self.task_id = str(self.task.id)
+
+    def test_queued_task_paused_and_cancelled_in_database(self):
+        self.assertEqual(control_task(self.task_id, 'pause'), 'paused')
+        self.assertEqual(control_task(self.task_id, 'cancel'), 'cancelled')
+        with self.assertRaises(TaskControlError):
+            control_task(self.task_id, 'resume')
+
+    def test_running_task_gets_requests_between_frames(self):
+        control = register_control(self.task_id)
+        try:
+            control_task(self.task_id, 'pause')
+            self.assertTrue(control.paused)
+            control_task(self.task_id, 'cancel')
+            self.assertTrue(control.cancelled)
+            self.assertFalse(control.paused)
+        finally:
+            unregister_control(self.task_id, control)
+        self.assertTrue(control.stopped.is_set())
+
+    def test_second_run_leaves_the_running_control_alone(self):
+        control = register_control(self.task_id)
+        self.addCleanup(unregister_control, self.task_id, control)
+        self.assertIsNone(register_control(self.task_id))
+        # A duplicate queue entry picked up while the task runs
+        VideoProcessor(self.task_id).process_video()
+        unregister_control(self.task_id, TaskControl())
+        self.assertIs(get_control(self.task_id), control)
+        control_task(self.task_id, 'pause')
+        self.assertTrue(control.paused)
+
+    def test_resume_while_queued_keeps_one_queue_entry(self):
+        scheduler = ProcessingScheduler(1)
+        with mock.patch.object(ProcessingScheduler, '_ensure_started'), \
+                mock.patch('api.scheduler.get_scheduler', return_value=scheduler):
+            scheduler.submit(self.task_id)
+            control_task(self.task_id, 'pause')
+            self.assertEqual(control_task(self.task_id, 'resume'), 'pending')
+            self.assertEqual(scheduler.pending(), 1)
+            # Once a worker has taken the entry, resuming queues the task again
+            scheduler.queue.get()
+            scheduler._queued.discard(self.task_id)
+            control_task(self.task_id, 'pause')
+            control_task(self.task_id, 'resume')
+            self.assertEqual(scheduler.pending(), 1)
+
+    def test_cancelled_tasks_finish_a_batch(self):
+        batch = VideoBatch.objects.create()
+        VideoProcessingTask.objects.filter(id=self.task_id).update(batch=batch, status='completed')
+        VideoProcessingTask.objects.create(video_file='videos/b.mp4', batch=batch, status='cancelled', progress=40)
+        response = self.client.get(f'/api/batch/{batch.id}').json()
+        self.assertEqual((response['status'], response['progress']), ('completed', 100))
+
+
+def text_frame(*lines):
+    """White 1080p frame with each line of text printed below the last"""
+    frame = np.full((1080, 1920, 3), 255, np.uint8)
+    for i, line in enumerate(lines):
+        cv2.putText(frame, line, (100, 300 + 80 * i), cv2.FONT_HERSHEY_SIMPLEX, 1.5, (0, 0, 0), 3)
+    return frame
+
+
+class ScriptedOCR:
+    """Stands in for tesseract: answers each call with the next scripted list of lines"""
+
+    def __init__(self, *answers):
+        self.answers = list(answers)
+        self.images = []
+
+    def __call__(self, img, config, min_conf):
+        self.images.append(img)
+        lines = self.answers.pop(0) if self.answers else []
+        return lines, 90.0, [(0, 0, img.shape[1], img.shape[0] // 2)] * len(lines)
+
+
+class OCRLadderTests(SimpleTestCase):
+    def setUp(self):
+        self.scanner = FrameScanner(('IL',))
+
+    def run_ladder(self, ladder, frame):
+        return ladder.run(frame, frame, self.scanner.scan_text_lines)
+
+    def test_frame_without_phone_length_line_skips_ocr(self):
+        ocr = ScriptedOCR()
+        lines, hits, name = self.run_ladder(OCRLadder(55, 20, ocr=ocr), text_frame("SALE"))
+        self.assertEqual((lines, hits, name), ([], [], 'cheap'))
+        self.assertEqual(ocr.images, [])
+
+    def test_cheap_pass_reads_only_candidate_regions(self):
+        ocr = ScriptedOCR(["Call 054-852-8105"])
+        _, hits, name = self.run_ladder(OCRLadder(55, 20, ocr=ocr), text_frame("", "", "Call 054-852-8105"))
+        self.assertEqual(name, 'cheap')
+        self.assertEqual([hit[0] for hit in hits], ['+972548528105'])
+        self.assertLess(ocr.images[0].shape[0] * ocr.images[0].shape[1], 1080 * 1280 // 4)
+        # The box maps back onto the printed line, not the top of the frame
+        x, y, w, h = hits[0][3]
+        self.assertTrue(y <= 460 <= y + h + 80)
+
+    def test_unvalidated_whitelist_hit_escalates(self):
+        # The whitelist made "Sale 5ALE-8105" digits; the IL fallback would accept it
+        ocr = ScriptedOCR(["5a 1234-5678"], ["Sale 5ALE-8105"])
+        ladder = OCRLadder(55, 20, ocr=ocr)
+        scan = lambda lines: [('+97251234567', '051-234-567', lines[0])] if lines[0][0].isdigit() else []
+        _, hits, name = ladder.run(text_frame("Sale SALE-8105 today"), text_frame("Sale SALE-8105 today"), scan)
+        # Without the whitelist the line has no phone-like digits: drop the hit
+        self.assertEqual(hits, [])
+        self.assertEqual(name, 'full')
+
+    def test_dates_and_prices_stay_on_the_cheap_pass(self):
+        ocr = ScriptedOCR(["Updated 19.10.2023 12:30"], ["Total $1,299.00 1,199.00"])
+        ladder = OCRLadder(55, 20, ocr=ocr)
+        for _ in range(2):
+            _, _, name = self.run_ladder(ladder, text_frame("Updated 19.10.2023"))
+            self.assertEqual(name, 'cheap')
+        self.assertEqual(len(ocr.images), 2)
+
+    def test_digits_every_pass_failed_on_stop_escalating(self):
+        ocr = ScriptedOCR(["Order 12345678"], ["Order 12345678"], ["Order 12345678"], ["Order 12345678"])
+        ladder = OCRLadder(55, 20, ocr=ocr)
+        self.assertEqual(self.run_ladder(ladder, text_frame("Order 12345678"))[2], 'heavy')
+        self.assertEqual(self.run_ladder(ladder, text_frame("Order 12345678"))[2], 'cheap')
+        self.assertEqual(len(ocr.images), 4)
+
+    def test_doubtful_digits_escalate_until_found(self):
+        ocr = ScriptedOCR(["Call 054-852-81O5"], ["Call 054-852-8105"])
+        _, hits, name = self.run_ladder(OCRLadder(55, 20, ocr=ocr), text_frame("Call 054-852-8105"))
+        self.assertEqual(name, 'full')
+        self.assertEqual([hit[0] for hit in hits], ['+972548528105'])
+
+
+class BatchAndDeleteTests(TestCase):
+    def setUp(self):
+        self.media_root = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root, VIDEO_RESULTS_DIR=self.media_root / 'results')
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        (self.media_root / 'inbox' / 'nested').mkdir(parents=True)
+        for name in ('inbox/a.mp4', 'inbox/b.MOV', 'inbox/notes.txt', 'inbox/nested/c.mkv'):
+            (self.media_root / name).write_bytes(b'video')
+
+    def submit_batch(self, **data):
+        with mock.patch('api.views.get_scheduler') as get_scheduler:
+            response = self.client.post('/api/upload-batch', data)
+        return response, get_scheduler.return_value.submit_many
+
+    def test_directory_batch_references_videos_in_place(self):
+        response, submit_many = self.submit_batch(directory='inbox')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['total_tasks'], 2)
+        tasks = VideoProcessingTask.objects.order_by('video_file')
+        self.assertEqual([task.video_file.name for task in tasks], ['inbox/a.mp4', 'inbox/b.MOV'])
+        self.assertFalse(any(task.owns_video_file for task in tasks))
+        self.assertEqual(set(submit_many.call_args.args[0]), {str(task.id) for task in tasks})
+
+    def test_recursive_batch_and_bad_directories(self):
+        response, _ = self.submit_batch(directory='inbox', recursive='true')
+        self.assertEqual(response.json()['total_tasks'], 3)
+        for directory in ('../', 'missing', 'inbox/a.mp4'):
+            with self.subTest(directory=directory):
+                self.assertEqual(self.submit_batch(directory=directory)[0].status_code, 400)
+
+    def test_delete_keeps_referenced_video(self):
+        self.submit_batch(directory='inbox')
+        task = VideoProcessingTask.objects.get(video_file='inbox/a.mp4')
+        self.assertEqual(self.client.delete(f'/api/task/{task.id}').status_code, 200)
+        self.assertFalse(VideoProcessingTask.objects.filter(id=task.id).exists())
+        self.assertTrue((self.media_root / 'inbox' / 'a.mp4').exists())
+
+    def test_delete_removes_uploaded_video(self):
+        with mock.patch('api.views.start_video_processing'):
+            response = self.client.post('/api/upload-video', {'video': SimpleUploadedFile('clip.mp4', b'video')})
+        task = VideoProcessingTask.objects.get(id=response.json()['task_id'])
+        path = Path(task.video_file.path)
+        self.assertTrue(task.owns_video_file)
+        self.assertTrue(path.is_relative_to(self.media_root / 'videos') and path.exists())
+        self.client.delete(f'/api/task/{task.id}')
+        self.assertFalse(path.exists())
+
+    def test_delete_refuses_tasks_running_elsewhere(self):
+        (self.media_root / 'videos').mkdir()
+        (self.media_root / 'videos' / 'a.mp4').write_bytes(b'video')
+        running = VideoProcessingTask.objects.create(video_file='videos/a.mp4', status='processing',
+                                                     started_at=timezone.now())
+        paused = VideoProcessingTask.objects.create(video_file='videos/a.mp4', status='paused',
+                                                    started_at=timezone.now())
+        for task in (running, paused):
+            with self.subTest(status=task.status):
+                self.assertEqual(self.client.delete(f'/api/task/{task.id}').status_code, 409)
+                self.assertTrue(VideoProcessingTask.objects.filter(id=task.id).exists())
+        self.assertTrue((self.media_root / 'videos' / 'a.mp4').exists())
+
+        # Paused while still queued: no worker holds it yet
+        queued = VideoProcessingTask.objects.create(video_file='videos/b.mp4', status='paused')
+        self.assertEqual(self.client.delete(f'/api/task/{queued.id}').status_code, 200)
+
+
+def add_result(task, e164, national, frame_count=3):
+    """A finished task's row for ``e164``, indexed like save_results does"""
+    PhoneNumberResult.objects.create(
+        task=task, e164_number=e164, national_number=national, first_seen_seconds=1.0,
+        frame_count=frame_count, raw_text_examples=national, indexed=True
+    )
+    PhoneNumberIndex.record(e164, national, frame_count)
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.tasks = [VideoProcessingTask.objects.create(video_file=f'videos/{i}.mp4', status='completed') for i in range(3)]
+        add_result(self.tasks[0], '+972548528105', '054-852-8105')
+        add_result(self.tasks[1], '+972548528105', '054-852-8105', frame_count=5)
+        add_result(self.tasks[0], '+972548529999', '054-852-9999')
+        add_result(self.tasks[2], '+493012345678', '030 12345678')
+
+    def search(self, **params):
+        return self.client.get('/api/phone-numbers/search', params)
+
+    def numbers(self, **params):
+        response = self.search(**params)
+        self.assertEqual(response.status_code, 200)
+        return {row['e164_number']: row for row in response.json()['phone_numbers']}
+
+    def test_exact_in_any_format(self):
+        for q in ('054-852-8105', '+972 54-852-8105', '0548528105'):
+            with self.subTest(q=q):
+                row = self.numbers(q=q)['+972548528105']
+                self.assertEqual((row['task_count'], row['total_frame_count']), (2, 8))
+                self.assertEqual({task['task_id'] for task in row['tasks']}, {str(task.id) for task in self.tasks[:2]})
+
+    def test_prefix_and_national_prefix(self):
+        self.assertEqual(set(self.numbers(q='+97254852', mode='prefix')), {'+972548528105', '+972548529999'})
+        self.assertEqual(set(self.numbers(q='054-852-9', mode='national')), {'+972548529999'})
+        self.assertEqual(set(self.numbers(q='030', mode='national', region='DE')), {'+493012345678'})
+        self.assertEqual(self.numbers(q='030', mode='national'), {})
+
+    def test_tasks_match_task_count(self):
+        # A running task has saved the number but not counted it yet
+        running = VideoProcessingTask.objects.create(video_file='videos/running.mp4', status='processing')
+        PhoneNumberResult.objects.create(task=running, e164_number='+972548528105', national_number='054-852-8105',
+                                         first_seen_seconds=0.5, frame_count=1)
+        row = self.numbers(q='054-852-8105')['+972548528105']
+        self.assertEqual(row['task_count'], 2)
+        self.assertNotIn(str(running.id), {task['task_id'] for task in row['tasks']})
+
+    def test_task_list_is_capped(self):
+        row = self.numbers(q='054-852-8105', task_limit=1)['+972548528105']
+        self.assertEqual(row['task_count'], 2)
+        self.assertEqual([task['task_id'] for task in row['tasks']], [str(self.tasks[1].id)])
+
+    def test_bad_queries(self):
+        for params in ({'q': 'abc'}, {'q': '0', 'mode': 'national'}, {'q': '000', 'mode': 'national'},
+                       {'q': '054', 'mode': 'fuzzy'}):
+            with self.subTest(params=params):
+                self.assertEqual(self.search(**params).status_code, 400)
+
+
+class PhoneNumberIndexTests(TestCase):
+    def setUp(self):
+        self.task = VideoProcessingTask.objects.create(video_file='videos/a.mp4', status='processing')
+        self.processor = VideoProcessor(self.task.id)
+        self.processor.evidence = mock.Mock(get=lambda e164: [])
+        self.found = PhoneTracker()
+        for frame_idx in range(4):
+            self.found.observe('+972548528105', '054-852-8105', '054-852-8105', frame_idx, frame_idx * 0.5)
+
+    def index_row(self):
+        return PhoneNumberIndex.objects.values_list('task_count', 'total_frame_count').get(e164_number='+972548528105')
+
+    def test_save_results_records_each_row_once(self):
+        self.processor.save_new_number('+972548528105', self.found.tracks['+972548528105'], '054-852-8105')
+        self.assertFalse(PhoneNumberIndex.objects.exists())
+        self.processor.save_results(self.found)
+        self.processor.save_results(self.found)
+        self.assertEqual(self.index_row(), (1, 4))
+        self.assertTrue(self.task.phone_numbers.get().indexed)
+
+    def test_delete_forgets_only_recorded_rows(self):
+        other = VideoProcessingTask.objects.create(video_file='videos/b.mp4', status='completed')
+        add_result(other, '+972548528105', '054-852-8105', frame_count=5)
+        # A task that failed after finding the number never counted it
+        self.processor.save_new_number('+972548528105', self.found.tracks['+972548528105'], '054-852-8105')
+        self.task.status = 'failed'
+        self.task.save()
+        self.assertEqual(self.client.delete(f'/api/task/{self.task.id}').status_code, 200)
+        self.assertEqual(self.index_row(), (1, 5))
+
+        self.assertEqual(self.client.delete(f'/api/task/{other.id}').status_code, 200)
+        self.assertFalse(PhoneNumberIndex.objects.exists())
+
+
+class ConsumerTests(TransactionTestCase):
+    """The consumers read the database from a worker thread, so rows must be committed"""
+
+    def setUp(self):
+        caches[SNAPSHOT_CACHE].clear()
+        self.tasks = [VideoProcessingTask.objects.create(video_file=f'videos/{i}.mp4', status='processing',
+                                                         progress=10 * i) for i in range(3)]
+        flush_interval = mock.patch.object(TaskDashboardConsumer, 'FLUSH_INTERVAL', 0.01)
+        flush_interval.start()
+        self.addCleanup(flush_interval.stop)
+
+    async def connect(self, path):
+        communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), path)
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        return communicator
+
+    async def test_task_status_prefers_the_snapshot_cache(self):
+        task = self.tasks[1]
+        communicator = await self.connect(f'/ws/task/{task.id}/')
+        self.assertEqual((await communicator.receive_json_from())['progress'], 10)
+        # Newer progress published by the processor wins over the stale row
+        task.progress = 55
+        publish_snapshot(task)
+        await communicator.send_json_to({'type': 'get_status'})
+        self.assertEqual((await communicator.receive_json_from())['progress'], 55)
+        await communicator.disconnect()
+
+    async def test_database_reads_are_not_cached(self):
+        # The task may run in another process, so a miss must not freeze the row
+        task = self.tasks[2]
+        communicator = await self.connect(f'/ws/task/{task.id}/')
+        self.assertEqual((await communicator.receive_json_from())['progress'], 20)
+        self.assertIsNone(caches[SNAPSHOT_CACHE].get(f'task_snapshot:{task.id}'))
+        await VideoProcessingTask.objects.filter(id=task.id).aupdate(progress=70)
+        await communicator.send_json_to({'type': 'get_status'})
+        self.assertEqual((await communicator.receive_json_from())['progress'], 70)
+        await communicator.disconnect()
+
+    async def test_dashboard_initial_state_mixes_cache_and_database(self):
+        cached = self.tasks[0]
+        cached.progress = 80
+        publish_snapshot(cached)
+        communicator = await self.connect('/ws/tasks/')
+        await communicator.send_json_to({'type': 'subscribe', 'task_ids': [str(task.id) for task in self.tasks[:2]] + ['bad']})
+        message = await communicator.receive_json_from()
+        self.assertEqual(message['type'], 'tasks_update')
+        self.assertEqual({update['task_id']: update['progress'] for update in message['tasks']},
+                         {str(self.tasks[0].id): 80, str(self.tasks[1].id): 10})
+        await communicator.disconnect()
+
+    async def test_unsubscribing_from_all_keeps_task_subscriptions(self):
+        watched, other = str(self.tasks[0].id), str(self.tasks[1].id)
+        communicator = await self.connect('/ws/tasks/')
+        await communicator.send_json_to({'type': 'subscribe', 'task_ids': [watched]})
+        await communicator.receive_json_from()
+        await communicator.send_json_to({'type': 'subscribe', 'all': True})
+        await communicator.receive_json_from()
+        await communicator.send_json_to({'type': 'unsubscribe', 'all': True})
+        self.assertTrue(await communicator.receive_nothing())
+
+        channel_layer = get_channel_layer()
+        for task_id in (other, watched):
+            event = {'type': 'progress_update', 'task_id': task_id, 'status': 'processing', 'progress': 99,
+                     'current_frame': 1, 'total_frames': 2, 'message': 'Processing'}
+            await channel_layer.group_send(f'video_task_{task_id}', event)
+        message = await communicator.receive_json_from()
+        self.assertEqual([update['task_id'] for update in message['tasks']], [watched])
+        await communicator.disconnect()
+
+
+def load_cli():
+    """VideoProcessing/v.py, which lives outside the Django project"""
+    path = Path(__file__).resolve().parents[2] / 'VideoProcessing' / 'v.py'
+    spec = importlib.util.spec_from_file_location('video_cli', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class BatchCLIResumeTests(SimpleTestCase):
+    LEGACY_CSV = "e164,first_seen_sec,frame_count,example_raw_hits\n+972548528105,1.0,3,054-852-8105\n"
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.cli = load_cli()
+
+    def setUp(self):
+        self.dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.dir)
+        (self.dir / 'archive').mkdir()
+        self.output = self.dir / 'phones.csv'
+        self.manifest = self.dir / 'phones.csv.manifest.jsonl'
+
+    def run_cli(self, *args):
+        self.cli.main([str(self.dir / 'archive'), '-o', str(self.output), *args])
+
+    def write_rows(self, videos):
+        with open(self.output, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, self.cli.COLUMNS)
+            writer.writeheader()
+            writer.writerows({'video': video, 'e164': '+972548528105'} for video in videos)
+
+    def test_resume_drops_rows_of_unfinished_videos(self):
+        self.write_rows(['/a.mp4', '/b.mp4'])
+        self.manifest.write_text(json.dumps({'path': '/a.mp4', 'size': 1, 'mtime': 1}) + '\n')
+        self.run_cli()
+        with open(self.output, newline='', encoding='utf-8') as f:
+            self.assertEqual([row['video'] for row in csv.DictReader(f)], ['/a.mp4'])
+
+    def test_keeps_csv_it_did_not_write(self):
+        self.output.write_text(self.LEGACY_CSV)
+        with self.assertRaises(SystemExit):
+            self.run_cli()
+        # Other columns even next to a manifest
+        self.manifest.touch()
+        with self.assertRaises(SystemExit):
+            self.run_cli()
+        self.assertEqual(self.output.read_text(), self.LEGACY_CSV)
+
+    def test_no_resume_clears_every_output(self):
+        self.output.write_text(self.LEGACY_CSV)
+        self.run_cli('--no-resume')
+        self.assertEqual(self.output.read_text().splitlines(), [','.join(self.cli.COLUMNS)])
+        self.assertEqual(self.manifest.read_text(), '')
+
+        parquet_dir = self.dir / 'parquet'
+        parquet_dir.mkdir()
+        (parquet_dir / 'old-0123abcd.parquet').write_bytes(b'stale')
+        (parquet_dir / 'notes.txt').write_text('kept')
+        self.cli.main([str(self.dir / 'archive'), '-o', str(parquet_dir), '--format', 'parquet', '--no-resume'])
+        self.assertEqual([path.name for path in parquet_dir.iterdir()], ['notes.txt'])
+
+
+class FrameRingTests(SimpleTestCase):
+    def setUp(self):
+        self.frame = np.arange(48 * 64 * 3, dtype=np.uint8).reshape(48, 64, 3)
+        self.ring = FrameRing(2, self.frame.nbytes)
+        self.addCleanup(self.ring.close)
+
+    def test_worker_reads_the_frame_in_place(self):
+        index = self.ring.acquire()
+        slot, _ = self.ring.write(index, self.frame)
+        shm = attach(self.ring.name)
+        self.addCleanup(shm.close)
+        view = slot_view(shm.buf, slot, self.ring.slot_bytes)
+        np.testing.assert_array_equal(view, self.frame)
+        del view
+
+    def test_acquire_waits_for_a_release(self):
+        self.assertFalse(self.ring.fits(np.zeros((49, 64, 3), np.uint8)))
+        taken = [self.ring.acquire(), self.ring.acquire()]
+        self.assertIsNone(self.ring.acquire(timeout=0.01))
+        self.ring.release(taken[0])
+        self.assertEqual(self.ring.acquire(timeout=0.01), taken[0])
+
+
+class OCRWorkerPoolTests(SimpleTestCase):
+    """Blank frames: the cheap pass finds no text regions, so tesseract isn't needed"""
+
+    def setUp(self):
+        self.frame = np.zeros((48, 64, 3), np.uint8)
+        self.pool = OCRWorkerPool(1, max_frames=2, regions=('IL',), slots=2, slot_bytes=self.frame.nbytes)
+        self.addCleanup(self.pool.close)
+
+    def ocr(self, frame):
+        return self.pool.submit(frame, 'standard', ('IL',), 55, 20).result(timeout=60)
+
+    def test_frames_over_pipe_and_ring(self):
+        self.assertEqual(self.ocr(self.frame)[:3], ([], [], 'cheap'))
+        slot, _ = self.pool.ring.write(self.pool.ring.acquire(), self.frame)
+        self.assertEqual(self.ocr(slot)[:3], ([], [], 'cheap'))
+
+    def test_workers_are_recycled_and_errors_reported(self):
+        for _ in range(4):
+            self.ocr(self.frame)
+        with self.assertRaisesRegex(OCRWorkerError, 'AttributeError'):
+            self.ocr('not a frame')
+        # Counted once the feeder has replaced the worker, before it takes the next job
+        self.assertEqual(self.pool.recycled, 2)
+        # The worker survives a failed frame
+        self.assertEqual(self.ocr(self.frame)[2], 'cheap')
+
+
+class FrameSourceTests(SimpleTestCase):
+    def setUp(self):
+        video_dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, video_dir)
+        self.path = str(video_dir / 'clip.avi')
+        # 12 frames at 8 fps, each a flat grey telling its index
+        write_video(self.path, [np.full((48, 64, 3), 20 * i, np.uint8) for i in range(12)], fps=8)
+
+    def sampled(self, source):
+        try:
+            return [(frame_idx, timestamp_sec, round(frame.mean() / 20)) for frame_idx, timestamp_sec, frame in source]
+        finally:
+            source.release()
+
+    def test_opencv_samples_every_nth_frame(self):
+        source = open_frame_source(self.path, 2)
+        self.assertEqual((source.name, source.frame_interval, source.total_frames), ('opencv', 4, 12))
+        self.assertEqual(self.sampled(source), [(0, 0.0, 0), (4, 0.5, 4), (8, 1.0, 8)])
+
+    def test_ffmpeg_falls_back_to_opencv(self):
+        with mock.patch('api.frame_sources.ffmpeg_available', return_value=False):
+            self.assertEqual(open_frame_source(self.path, 2, decoder='ffmpeg').name, 'opencv')
+
+    @skipUnless(ffmpeg_available(), "ffmpeg is not installed")
+    def test_ffmpeg_samples_scales_and_converts_in_the_decoder(self):
+        source = open_frame_source(self.path, 2, decoder='ffmpeg', max_width=32)
+        self.assertEqual((source.name, source.width, source.height), ('ffmpeg', 32, 24))
+        sampled = self.sampled(source)
+        self.assertEqual([frame_idx for frame_idx, _, _ in sampled], [0, 4, 8])
+        self.assertEqual([value for _, _, value in sampled], [0, 4, 8])
+
+    def test_stream_metadata(self):
+        self.assertAlmostEqual(FFmpegFrameSource._parse_rate('30000/1001'), 29.97, places=2)
+        self.assertIsNone(FFmpegFrameSource._parse_rate('0/0'))
+        self.assertEqual(FFmpegFrameSource._rotation({'tags': {'rotate': '90'}}), 90)
+        self.assertEqual(FFmpegFrameSource._rotation({'side_data_list': [{'rotation': -90}]}), 270)
+        self.assertEqual(FFmpegFrameSource._rotation({}), 0)
+
+
+def gradient_frame(noise=0, seed=0):
+    """Smooth 320x240 BGR gradient, optionally with camera-like sensor noise"""
+    gray = np.tile(np.linspace(30, 220, 320), (240, 1))
+    if noise:
+        gray = gray + np.random.default_rng(seed).normal(0, noise, gray.shape)
+    return cv2.cvtColor(np.clip(gray, 0, 255).astype(np.uint8), cv2.COLOR_GRAY2BGR)
+
+
+def screen_frame():
+    """Flat white frame with rendered text, like a screen recording"""
+    frame = np.full((240, 320, 3), 255, np.uint8)
+    cv2.putText(frame, "Call 054-852-8105", (10, 120), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 0), 2)
+    return frame
+
+
+class PreprocessProfileTests(TestCase):
+    def test_profiles_match_the_model_choices(self):
+        choices = {key for key, _ in VideoProcessingTask.PREPROCESS_PROFILE_CHOICES}
+        self.assertEqual(choices, set(PREPROCESS_PROFILES) | {'auto'})
+        with self.assertRaises(ValueError):
+            PreprocessContext('auto')
+        for profile in PREPROCESS_PROFILES:
+            with self.subTest(profile=profile):
+                processed = PreprocessContext(profile).preprocess(gradient_frame(noise=20))
+                # Upscaled to min_width and converted to grayscale
+                self.assertEqual(processed.shape, (300, 400))
+                # Every profile but screen binarises the frame
+                self.assertEqual(set(np.unique(processed)) <= {0, 255}, profile != 'screen')
+
+    def test_upload_rejects_unknown_profile(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        with override_settings(MEDIA_ROOT=media_root), \
+                mock.patch('api.views.start_video_processing'), mock.patch('api.views.get_scheduler'):
+            for url, field in (('/api/upload-video', 'video'), ('/api/upload-batch', 'videos')):
+                with self.subTest(url=url):
+                    video = SimpleUploadedFile('clip.mp4', b'video')
+                    response = self.client.post(url, {field: video, 'preprocess_profile': 'fancy'})
+                    self.assertEqual(response.status_code, 400)
+                    self.assertIn('preprocess_profile', response.json()['detail'])
+            response = self.client.post('/api/upload-video', {'video': SimpleUploadedFile('clip.mp4', b'video'),
+                                                              'preprocess_profile': 'auto'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(VideoProcessingTask.objects.get().preprocess_profile, 'auto')
+
+    def test_auto_chooses_from_frame_statistics(self):
+        self.assertEqual(choose_profile([screen_frame()])[0], 'screen')
+        self.assertEqual(choose_profile([gradient_frame()])[0], 'standard')
+        self.assertEqual(choose_profile([gradient_frame(noise=20, seed=i) for i in range(3)])[0], 'camera')
+        self.assertEqual(choose_profile([])[0], 'standard')
+
+    def test_resolve_profile_samples_the_video(self):
+        video_dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, video_dir)
+        write_video(video_dir / 'camera.avi', [gradient_frame(noise=20, seed=i) for i in range(8)], fps=4)
+        write_video(video_dir / 'screen.avi', [screen_frame()] * 8, fps=4)
+        self.assertEqual(resolve_profile('auto', str(video_dir / 'camera.avi')), 'camera')
+        self.assertEqual(resolve_profile('auto', str(video_dir / 'screen.avi')), 'screen')
+        # A fixed profile is used as given, without opening the video
+        self.assertEqual(resolve_profile('standard', str(video_dir / 'missing.avi')), 'standard')
+
+
+class PaginationTests(TestCase):
+    def setUp(self):
+        self.tasks = [VideoProcessingTask.objects.create(video_file=f'videos/{i}.mp4', status='completed') for i in range(5)]
+        # Three tasks share a created_at, so the id breaks the tie
+        VideoProcessingTask.objects.filter(id__in=[task.id for task in self.tasks[1:4]]).update(
+            created_at=self.tasks[1].created_at
+        )
+        task = self.tasks[0]
+        for i, first_seen in enumerate([1.0, 1.0, 1.0, 2.5, 0.5]):
+            PhoneNumberResult.objects.create(task=task, e164_number=f'+97254852810{i}', national_number=f'054-852-810{i}',
+                                             first_seen_seconds=first_seen, frame_count=1)
+
+    def pages(self, url, key, **params):
+        items, cursor, pages = [], None, 0
+        while True:
+            response = self.client.get(url, dict(params, **({'cursor': cursor} if cursor else {})))
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            items.extend(data[key])
+            pages += 1
+            cursor = data['next_cursor']
+            if cursor is None:
+                return items, pages
+
+    def test_tasks_newest_first_across_pages(self):
+        tasks, pages = self.pages('/api/tasks', 'tasks', limit=2)
+        self.assertEqual(pages, 3)
+        expected = VideoProcessingTask.objects.order_by('-created_at', '-id')
+        self.assertEqual([task['task_id'] for task in tasks], [str(task.id) for task in expected])
+
+    def test_results_in_first_seen_order_across_pages(self):
+        results, pages = self.pages(f'/api/task/{self.tasks[0].id}/results', 'phone_numbers', limit=2)
+        self.assertEqual(pages, 3)
+        self.assertEqual([(row['first_seen_seconds'], row['e164_number'][-1]) for row in results],
+                         [(0.5, '4'), (1.0, '0'), (1.0, '1'), (1.0, '2'), (2.5, '3')])
+
+    def test_bad_cursors(self):
+        def cursor(*values):
+            return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+        created_at = self.tasks[0].created_at.isoformat()
+        cases = [
+            ('/api/tasks', 'not base64!'),
+            ('/api/tasks', cursor(created_at)),
+            ('/api/tasks', cursor(created_at, 'zzz')),
+            ('/api/tasks', cursor('yesterday', str(self.tasks[0].id))),
+            ('/api/tasks', cursor(1, 2)),
+            (f'/api/task/{self.tasks[0].id}/results', cursor('abc', 'x')),
+            (f'/api/task/{self.tasks[0].id}/results', cursor(None, 'x')),
+            (f'/api/task/{self.tasks[0].id}/results', base64.urlsafe_b64encode(b'\xff').decode()),
+        ]
+        for url, bad in cases:
+            with self.subTest(url=url, cursor=bad):
+                response = self.client.get(url, {'cursor': bad})
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json()['detail'], "Invalid cursor")
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.batch = VideoBatch.objects.create()
+        self.tasks = [
+            VideoProcessingTask.objects.create(video_file=f'videos/{i}.mp4', status=status, batch=batch)
+            for i, (status, batch) in enumerate([('completed', self.batch), ('completed', self.batch), ('failed', None)])
+        ]
+        for i, task in enumerate(self.tasks):
+            for j in range(2):
+                PhoneNumberResult.objects.create(
+                    task=task, e164_number=f'+9725485281{i}{j}', national_number=f'054-852-81{i}{j}',
+                    first_seen_seconds=float(j), frame_count=1, appearances=[[float(j), float(j) + 1]],
+                    raw_text_examples='Call, "now"'
+                )
+
+    async def download(self, url, **params):
+        response = await self.async_client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        # An async iterator: daphne sends each chunk as it is produced
+        self.assertTrue(response.is_async)
+        return response, b''.join([chunk async for chunk in response.streaming_content])
+
+    def numbers(self, rows):
+        return sorted(row['e164_number'] for row in rows)
+
+    async def test_csv(self):
+        response, content = await self.download(f'/api/task/{self.tasks[0].id}/results/export')
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertIn(f'task_{self.tasks[0].id}_results.csv', response['Content-Disposition'])
+        rows = list(csv.DictReader(io.StringIO(content.decode())))
+        self.assertEqual(self.numbers(rows), ['+972548528100', '+972548528101'])
+        self.assertEqual((json.loads(rows[1]['appearances']), rows[1]['raw_text_examples']), ([[1.0, 2.0]], 'Call, "now"'))
+
+    async def test_ndjson(self):
+        _, content = await self.download('/api/results/export', format='ndjson')
+        rows = [json.loads(line) for line in content.decode().splitlines()]
+        self.assertEqual(len(rows), 6)
+        self.assertEqual(rows[0]['task_id'], str(min(task.id for task in self.tasks)))
+
+    async def test_parquet(self):
+        import pyarrow.parquet as pq
+
+        response, content = await self.download('/api/results/export', format='parquet', status='failed')
+        self.assertIn('results.parquet', response['Content-Disposition'])
+        rows = pq.read_table(io.BytesIO(content)).to_pylist()
+        self.assertEqual(self.numbers(rows), ['+972548528120', '+972548528121'])
+
+    async def test_filters(self):
+        cases = [
+            ({'batch_id': str(self.batch.id)}, 4),
+            ({'task_ids': f'{self.tasks[0].id}, {self.tasks[2].id}'}, 4),
+            ({'batch_id': str(self.batch.id), 'task_ids': str(self.tasks[2].id)}, 0),
+            ({'status': 'failed'}, 2),
+        ]
+        for params, count in cases:
+            with self.subTest(params=params):
+                _, content = await self.download('/api/results/export', format='ndjson', **params)
+                self.assertEqual(len(content.splitlines()), count)
+
+    def test_bad_parameters(self):
+        for url, params in [
+            ('/api/results/export', {'task_ids': 'zzz'}),
+            ('/api/results/export', {'task_ids': f'{self.tasks[0].id},zzz'}),
+            ('/api/results/export', {'batch_id': 'zzz'}),
+            ('/api/results/export', {'format': 'xml'}),
+            ('/api/task/zzz/results/export', {}),
+        ]:
+            with self.subTest(url=url, params=params):
+                self.assertEqual(self.client.get(url, params).status_code, 400)
+
+
+class SQLiteChannelLayerTests(SimpleTestCase):
+    """Two layer instances on one file stand in for two processes"""
+
+    def setUp(self):
+        self.dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.dir)
+
+    def layer(self, **config):
+        return SQLiteChannelLayer(path=self.dir / 'channels.sqlite3', **config)
+
+    async def receive(self, layer, channel):
+        return await asyncio.wait_for(layer.receive(channel), timeout=2)
+
+    async def assertNothing(self, layer, channel):
+        with self.assertRaises(asyncio.TimeoutError):
+            await asyncio.wait_for(layer.receive(channel), timeout=0.2)
+
+    async def test_send_and_receive_across_instances(self):
+        sender, receiver = self.layer(), self.layer()
+        channel = await receiver.new_channel()
+        for i in range(3):
+            await sender.send(channel, {'type': 'test.message', 'n': i})
+        self.assertEqual([(await self.receive(receiver, channel))['n'] for _ in range(3)], [0, 1, 2])
+        await self.assertNothing(receiver, channel)
+
+    async def test_group_fan_out_and_discard(self):
+        sender, receiver = self.layer(), self.layer()
+        first, second = await receiver.new_channel(), await receiver.new_channel()
+        await receiver.group_add('video_task_1', first)
+        await receiver.group_add('video_task_1', second)
+        await sender.group_send('video_task_1', {'type': 'progress_update', 'progress': 50})
+        self.assertEqual((await self.receive(receiver, first))['progress'], 50)
+        self.assertEqual((await self.receive(receiver, second))['progress'], 50)
+
+        await receiver.group_discard('video_task_1', first)
+        await sender.group_send('video_task_1', {'type': 'progress_update', 'progress': 60})
+        self.assertEqual((await self.receive(receiver, second))['progress'], 60)
+        await self.assertNothing(receiver, first)
+
+    async def test_expired_messages_are_dropped(self):
+        sender, receiver = self.layer(expiry=0.05), self.layer()
+        channel = await receiver.new_channel()
+        await sender.send(channel, {'type': 'test.message'})
+        await asyncio.sleep(0.1)
+        await self.assertNothing(receiver, channel)
+
+    async def test_capacity(self):
+        layer = self.layer(capacity=2, channel_capacity={'limited.*': 1})
+        channel = await layer.new_channel()
+        await layer.send(channel, {'type': 'test.message'})
+        await layer.send(channel, {'type': 'test.message'})
+        with self.assertRaises(ChannelFull):
+            await layer.send(channel, {'type': 'test.message'})
+        await layer.send('limited.one', {'type': 'test.message'})
+        with self.assertRaises(ChannelFull):
+            await layer.send('limited.one', {'type': 'test.message'})
+
+        # A full group member misses the message, the others still get it
+        other = await layer.new_channel()
+        await layer.group_add('dashboard', channel)
+        await layer.group_add('dashboard', other)
+        await layer.group_send('dashboard', {'type': 'test.message', 'n': 1})
+        self.assertEqual((await self.receive(layer, other))['n'], 1)
+
+    async def test_flush(self):
+        sender, receiver = self.layer(), self.layer()
+        channel = await receiver.new_channel()
+        await sender.group_add('dashboard', channel)
+        await sender.send(channel, {'type': 'test.message'})
+        await sender.flush()
+        await sender.group_send('dashboard', {'type': 'test.message'})
+        await self.assertNothing(receiver, channel)
+
+
+class EvidenceTests(TestCase):
+    def setUp(self):
+        self.dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.frame = np.full((120, 200, 3), 200, dtype=np.uint8)
+
+    def writer(self, **kwargs):
+        return EvidenceWriter(self.dir / 'crops', **kwargs)
+
+    def test_first_sightings_per_number(self):
+        collector = EvidenceCollector(self.writer(), per_number=2)
+        for frame_idx in range(5):
+            collector.observe('+972548528105', self.frame, frame_idx, frame_idx / 3, (10, 10, 60, 20))
+        collector.observe('+972548528106', self.frame, 0, 0.0, None)
+        collector.close()
+        entries = collector.get('+972548528105')
+        self.assertEqual([entry['frame_idx'] for entry in entries], [0, 1])
+        self.assertEqual([entry['image'] for entry in entries], ['972548528105_0.webp', '972548528105_1.webp'])
+        self.assertEqual(entries[1]['timestamp_seconds'], 0.333)
+        self.assertEqual(collector.get('+972548528106'), [])
+        self.assertEqual(sorted(path.name for path in (self.dir / 'crops').iterdir()),
+                         ['972548528105_0.webp', '972548528105_1.webp'])
+
+    def test_one_crop_per_frame(self):
+        collector = EvidenceCollector(self.writer(), per_number=3)
+        # Several passes read the same number in one frame
+        for box in [(10, 10, 60, 20), (12, 10, 60, 20), (10, 40, 60, 20)]:
+            collector.observe('+972548528105', self.frame, 7, 2.0, box)
+        collector.close()
+        self.assertEqual(len(collector.get('+972548528105')), 1)
+        self.assertEqual(collector.writer.written, 1)
+
+    def test_full_queue_drops_crops(self):
+        writer = self.writer(max_pending=1)
+        writing, release = threading.Event(), threading.Event()
+
+        def slow_write(filename, crop):
+            writing.set()
+            release.wait(5)
+        writer._write = slow_write
+
+        crop = self.frame[:20, :60].copy()
+        self.assertEqual(writer.submit('a', crop), 'a.webp')
+        self.assertTrue(writing.wait(5))
+        self.assertEqual(writer.submit('b', crop), 'b.webp')
+        self.assertIsNone(writer.submit('c', crop))
+        self.assertEqual(writer.dropped, 1)
+        release.set()
+        writer.close()
+
+    def test_close_flushes_pending_crops(self):
+        writer = self.writer(image_format='jpg', max_width=100)
+        for i in range(10):
+            writer.submit(f'crop_{i}', self.frame)
+        writer.close()
+        self.assertEqual(writer.written, 10)
+        self.assertEqual(len(list((self.dir / 'crops').glob('*.jpg'))), 10)
+        self.assertEqual(cv2.imread(str(self.dir / 'crops' / 'crop_0.jpg')).shape, (60, 100, 3))
+
+    def test_endpoint_serves_only_the_tasks_own_files(self):
+        task = VideoProcessingTask.objects.create(video_file='videos/a.mp4', status='completed')
+        with override_settings(VIDEO_RESULTS_DIR=self.dir):
+            directory = evidence_dir(task.id)
+            directory.mkdir(parents=True)
+            (directory / '972548528105_0.webp').write_bytes(b'webp')
+            (directory.parent / 'secret.webp').write_bytes(b'secret')
+            (self.dir / 'secret.webp').write_bytes(b'secret')
+
+            response = self.client.get(f'/api/task/{task.id}/evidence/972548528105_0.webp')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response['Content-Type'], 'image/webp')
+            self.assertEqual(b''.join(response.streaming_content), b'webp')
+            response.close()
+            for filename in ['..', '..%2Fsecret.webp', '..%2F..%2Fsecret.webp', '%2E%2E', 'missing.webp']:
+                with self.subTest(filename=filename):
+                    response = self.client.get(f'/api/task/{task.id}/evidence/{filename}')
+                    self.assertEqual(response.status_code, 404)
+
+            # Routing never passes a slash through, so check the guard itself too
+            for filename in ['../secret.webp', f'../{task.id}/972548528105_0.webp', '../../secret.webp']:
+                with self.subTest(filename=filename), self.assertRaises(HttpError) as error:
+                    views.get_task_evidence(None, str(task.id), filename)
+                self.assertEqual(error.exception.status_code, 404)
+
+
+class FakeScheduler:
+    """Records submissions; tasks count as pending until drain()"""
+
+    workers = 1
+
+    def __init__(self):
+        self.submitted = []
+        self.drained = 0
+
+    def start(self):
+        pass
+
+    def submit(self, task_id):
+        self.submitted.append(task_id)
+
+    def pending(self):
+        return len(self.submitted) - self.drained
+
+    def drain(self):
+        self.drained = len(self.submitted)
+
+
+class WatchVideosTests(TestCase):
+    def setUp(self):
+        self.media_root = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.inbox = self.media_root / 'inbox'
+        self.inbox.mkdir()
+        clock = mock.patch('api.management.commands.watch_videos.time.monotonic', side_effect=lambda: self.now)
+        clock.start()
+        self.addCleanup(clock.stop)
+        self.now = 0.0
+
+    def command(self):
+        command = WatchVideosCommand(stdout=io.StringIO(), stderr=io.StringIO())
+        command.media_root = self.media_root.resolve()
+        command.region = 'IL'
+        command.profile = 'standard'
+        return command
+
+    def test_settles_once_size_and_mtime_hold_still(self):
+        path = self.inbox / 'a.mp4'
+        path.write_bytes(b'video')
+        files = SettlingFiles(settle_seconds=5)
+        for name in ('notes.txt', '.a.mp4.part', 'a.mp4'):
+            files.touch(self.inbox / name)
+        self.assertEqual(files.settled(), [])
+        self.now = 4.0
+        with open(path, 'ab') as f:
+            f.write(b'more')
+        self.assertEqual(files.settled(), [])
+        self.now = 8.0
+        # Same size, newer mtime: still being written
+        stat = path.stat()
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        self.assertEqual(files.settled(), [])
+        self.now = 12.0
+        self.assertEqual(files.settled(), [])
+        self.now = 13.0
+        self.assertEqual(files.settled(), [path])
+        self.assertEqual(files.settled(), [])
+
+    def test_deleted_and_empty_files_never_settle(self):
+        deleted, empty = self.inbox / 'deleted.mp4', self.inbox / 'empty.mp4'
+        deleted.write_bytes(b'video')
+        empty.touch()
+        files = SettlingFiles(settle_seconds=1)
+        files.touch(deleted)
+        files.touch(empty)
+        files.settled()
+        deleted.unlink()
+        self.now = 5.0
+        self.assertEqual(files.settled(), [])
+        self.assertEqual(list(files._files), [empty])
+
+    def test_files_under_media_root_are_referenced_once(self):
+        path = self.inbox / 'a.mp4'
+        path.write_bytes(b'video')
+        scheduler = FakeScheduler()
+        command = self.command()
+        command.ingest(path, scheduler)
+        command.ingest(path, scheduler)
+        task = VideoProcessingTask.objects.get()
+        self.assertEqual(task.video_file.name, 'inbox/a.mp4')
+        self.assertFalse(task.owns_video_file)
+        self.assertEqual(scheduler.submitted, [str(task.id)])
+
+    def test_files_outside_media_root_are_copied_in(self):
+        outside = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, outside)
+        path = outside / 'b.mp4'
+        path.write_bytes(b'video')
+        scheduler = FakeScheduler()
+        self.command().ingest(path, scheduler)
+        task = VideoProcessingTask.objects.get()
+        self.assertTrue(task.owns_video_file)
+        self.assertTrue(task.video_file.name.startswith('videos/b'))
+        self.assertEqual((self.media_root / task.video_file.name).read_bytes(), b'video')
+        self.assertTrue(path.exists())
+        self.assertEqual(scheduler.submitted, [str(task.id)])
+
+    def test_max_pending_holds_files_back(self):
+        for name in ('a.mp4', 'b.mp4', 'c.mp4'):
+            (self.inbox / name).write_bytes(b'video')
+        scheduler = FakeScheduler()
+        submitted = []
+
+        def tick(seconds):
+            # Second 1 records the signatures, second 2 finds all three settled
+            submitted.append(len(scheduler.submitted))
+            if len(submitted) == 3:
+                scheduler.drain()
+            elif len(submitted) == 4:
+                raise KeyboardInterrupt
+
+        with mock.patch('api.management.commands.watch_videos.get_scheduler', return_value=scheduler), \
+                mock.patch('api.management.commands.watch_videos.time.sleep', side_effect=tick):
+            call_command('watch_videos', directory=str(self.inbox), scan_existing=True, settle_seconds=0,
+                         max_pending=2, stdout=io.StringIO())
+        self.assertEqual(submitted, [0, 0, 2, 3])
+        self.assertEqual(VideoProcessingTask.objects.count(), 3)
@@ -0,0 +1,93 @@
+import random
+
+
+class PhoneTrack:
+    """Constant-size summary of where one phone number appears in a video.
+
+    Instead of a set of every frame index and every raw OCR string, a track
+    keeps first/last seen time, the number of frames it was seen in, the
+    appearance intervals as run-length segments and a bounded reservoir of
+    raw text examples.
+    """
+
+    __slots__ = ('national', 'first_time', 'last_time', 'frame_count', 'last_frame',
+                 'intervals', 'examples', '_examples_seen')
+
+    def __init__(self, national):
+        self.national = national
+        self.first_time = None
+        self.last_time = None
+        self.frame_count = 0
+        self.last_frame = None
+        # [[start_seconds, end_seconds], ...] in chronological order
+        self.intervals = []
+        self.examples = []
+        self._examples_seen = 0
+
+    def observe(self, raw, frame_idx, timestamp_sec, max_gap, max_examples, max_intervals, rng):
+        # Several hits per frame (line + joined text) count as one sighting
+        if frame_idx != self.last_frame:
+            self.last_frame = frame_idx
+            self.frame_count += 1
+            if self.first_time is None:
+                self.first_time = timestamp_sec
+            if self.intervals and timestamp_sec - self.intervals[-1][1] <= max_gap:
+                self.intervals[-1][1] = timestamp_sec
+            else:
+                self.intervals.append([timestamp_sec, timestamp_sec])
+                if len(self.intervals) > max_intervals:
+                    self._merge_closest_intervals()
+            self.last_time = timestamp_sec
+        self._sample_example(raw, max_examples, rng)
+
+    def _merge_closest_intervals(self):
+        gaps = [self.intervals[i + 1][0] - self.intervals[i][1] for i in range(len(self.intervals) - 1)]
+        i = gaps.index(min(gaps))
+        self.intervals[i][1] = self.intervals[i + 1][1]
+        del self.intervals[i + 1]
+
+    def _sample_example(self, raw, max_examples, rng):
+        """Reservoir sampling (algorithm R) over raw strings not already kept"""
+        if raw in self.examples:
+            return
+        self._examples_seen += 1
+        if len(self.examples) < max_examples:
+            self.examples.append(raw)
+            return
+        j = rng.randrange(self._examples_seen)
+        if j < max_examples:
+            self.examples[j] = raw
+
+    def raw_text_examples(self, limit=500):
+        return "; ".join(sorted(self.examples))[:limit]
+
+
+class PhoneTracker:
+    """Aggregate phone number sightings across a video, keyed by E.164"""
+
+    def __init__(self, sample_interval_sec=0.25, max_examples=5, max_intervals=100):
+        # Sightings closer than two sampling steps belong to the same appearance
+        self.max_gap = sample_interval_sec * 2
+        self.max_examples = max_examples
+        self.max_intervals = max_intervals
+        # One seeded generator shared by all tracks keeps results reproducible
+        self.rng = random.Random(0)
+        self.tracks = {}
+
+    def observe(self, e164, natl, raw, frame_idx, timestamp_sec):
+        """Record a hit; returns True the first time a number is seen"""
+        track = self.tracks.get(e164)
+        is_new = track is None
+        if is_new:
+            track = self.tracks[e164] = PhoneTrack(natl)
+        track.observe(raw, frame_idx, timestamp_sec, self.max_gap, self.max_examples, self.max_intervals, self.rng)
+        return is_new
+
+    def __len__(self):
+        return len(self.tracks)
+
+    def __contains__(self, e164):
+        return e164 in self.tracks
+
+    def items(self):
+        return self.tracks.items()
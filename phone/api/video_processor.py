@@ -1,197 +1,120 @@
-import cv2
-import pytesseract
 import phonenumbers
-import pandas as pd
-from phonenumbers import PhoneNumberMatcher, PhoneNumberFormat
-from collections import defaultdict
-from pathlib import Path
-import os
-import threading
-import time
-import asyncio
+from phonenumbers import PhoneNumberFormat
+from collections import deque
+from django.conf import settings
 from django.utils import timezone
 from channels.layers import get_channel_layer
 from asgiref.sync import async_to_sync
-from .models import VideoProcessingTask, PhoneNumberResult
+from .models import VideoProcessingTask, PhoneNumberResult, PhoneNumberIndex
+from .budgets import TaskBudget
+from .frame_sources import open_frame_source
+from .preprocessing import PreprocessContext, resolve_profile
+from .ocr import OCRLadder, ocr_lines
+from .ocr_workers import get_ocr_pool
+from .tracking import PhoneTracker
+from .evidence import EvidenceCollector, EvidenceWriter, evidence_dir
+from .matching import describe_stats, parse_regions
+from .scanning import FrameScanner
+from .snapshots import publish_snapshot
+from .task_control import register_control, unregister_control
+from .consumers import ALL_TASKS_GROUP
 # 
 
-class VideoProcessor:
+class VideoProcessor(FrameScanner):
     """Service class for processing videos and extracting phone numbers"""
     
     def __init__(self, task_id):
         self.task_id = task_id
         self.task = VideoProcessingTask.objects.get(id=task_id)
         self.channel_layer = get_channel_layer()
+        self.preprocess_context = None
+        self.evidence = None
+        self.budget = None
+        self.control = None
+        self.ocr_window = 1
+        # Filter by confidence - use much lower threshold for better results
+        # In Docker environments, OCR confidence tends to be much lower
+        self.word_min_conf = min(self.task.min_confidence, 20)  # Use lower of 55 or 20
+        self.ocr_ladder = OCRLadder(self.task.min_confidence, self.word_min_conf)
+        # One precomputed matcher covers every region of the task
+        super().__init__(parse_regions(self.task.region))
     
 
     # Process image for better OCR results
     def preprocess_image(self, img):
         """Preprocess image for better OCR results"""
-        # Resize image if too small for good OCR (minimum 400px width for better results)
-        height, width = img.shape[:2]
-        if width < 400:
-            scale_factor = 400 / width
-            new_width = int(width * scale_factor)
-            new_height = int(height * scale_factor)
-            img = cv2.resize(img, (new_width, new_height), interpolation=cv2.INTER_CUBIC)
-            print(f"📏 Resized image from {width}x{height} to {new_width}x{new_height} for better OCR")
-        
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        # Contrast enhancement
-        clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8,8))
-        gray = clahe.apply(gray)
-        # Adaptive thresholding
-        th = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
-                                   cv2.THRESH_BINARY, 31, 9)
-        # Morphological opening to remove noise
-        kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (1,1))
-        th = cv2.morphologyEx(th, cv2.MORPH_OPEN, kernel, iterations=1)
-        # Pass the processed image to the OCR
-        return th
+        return self.preprocess_context.preprocess(img)
     
     def extract_text_from_image(self, img):
         """Extract text from image using OCR - matches the working v.py script exactly"""
-        config = "--oem 3 --psm 6"
-        data = pytesseract.image_to_data(
-            img, 
-            lang="eng", 
-            config=config, 
-            output_type=pytesseract.Output.DATAFRAME
-        )
-        if data is None or data.empty:
-            return []
-        
-        # Filter by confidence - use much lower threshold for better results
-        # In Docker environments, OCR confidence tends to be much lower
-        min_conf = min(self.task.min_confidence, 20)  # Use lower of 55 or 20
-        data = data[pd.to_numeric(data["conf"], errors="coerce").fillna(-1) >= min_conf]
-        lines = []
-        
-        if not data.empty:
-            for (block, par, line), grp in data.groupby(["block_num", "par_num", "line_num"]):
-                txt = " ".join(str(t) for t in grp["text"] if isinstance(t, str))
-                txt = txt.strip()
-                if txt:
-                    lines.append(txt)
-        
+        lines, _, _ = ocr_lines(img, "--oem 3 --psm 6", self.word_min_conf)
         return lines
     
-    def extract_phone_numbers(self, text, region):
-        """Extract phone numbers from text using libphonenumber with improved parsing"""
-        hits = []
-        
-        # First, try direct parsing
-        for match in PhoneNumberMatcher(text, region):
-            num = match.number
-            if phonenumbers.is_possible_number(num) and phonenumbers.is_valid_number(num):
-                e164 = phonenumbers.format_number(num, PhoneNumberFormat.E164)
-                natl = phonenumbers.format_number(num, PhoneNumberFormat.NATIONAL)
-                # Add the raw string to the hits
-                hits.append((e164, natl, match.raw_string))
-        
-        # If no hits, try to fix common OCR issues
-        if not hits:
-            print(f"🔍 No direct hits for text: '{text}' - trying OCR fixes...")
-            
-            # Strategy 1: Add country code if missing
-            if region == "IL" and not text.startswith("+972"):
-                import re
-                
-                # Try multiple patterns to catch different OCR formats
-                patterns = [
-                    r'(\d{2})-?B?(\d{2})-?(\d{4})',  # 54-B52-8105
-                    r'(\d{2})-(\d{3})-(\d{4})',      # 52-268-8331
-                    r'(\d{2})B(\d{2})(\d{4})',       # 54B528105
-                    r'(\d{2})(\d{2})(\d{4})',        # 54528105
-                ]
-                
-                for pattern in patterns:
-                    matches = re.findall(pattern, text)
-                    print(f"🔍 Pattern {pattern} found {len(matches)} matches: {matches}")
-                    
-                    for match in matches:
-                        if len(match) == 3:
-                            part1, part2, part3 = match
-                            print(f"🔍 Processing match: {part1}, {part2}, {part3}")
-                            
-                            # Fix OCR errors (B → 8)
-                            part2 = part2.replace('B', '8')
-                            
-                            # Try different combinations
-                            candidates = [
-                                f"+972{part1}{part2}{part3}",
-                                f"+972 {part1}-{part2}-{part3}",
-                                f"+972{part1}-{part2}-{part3}",
-                                f"+972{part1}{part2}-{part3}",
-                                f"+972{part1}-{part2}{part3}",
-                                f"0{part1}-{part2}-{part3}",  # Israeli national format
-                                f"0{part1}{part2}{part3}"     # Israeli national format no dashes
-                            ]
-                            
-                            validation_failed = True
-                            for candidate in candidates:
-                                try:
-                                    print(f"🔍 Trying candidate: {candidate}")
-                                    parsed = phonenumbers.parse(candidate, region)
-                                    if phonenumbers.is_possible_number(parsed) and phonenumbers.is_valid_number(parsed):
-                                        e164 = phonenumbers.format_number(parsed, PhoneNumberFormat.E164)
-                                        natl = phonenumbers.format_number(parsed, PhoneNumberFormat.NATIONAL)
-                                        print(f"✅ Valid phone number found: {e164} ({natl})")
-                                        hits.append((e164, natl, text))
-                                        validation_failed = False
-                                        break
-                                except Exception as e:
-                                    print(f"❌ Failed to parse {candidate}: {e}")
-                                    continue
-                            
-                            # If validation failed but we have a pattern match, use fallback
-                            if validation_failed and part1.startswith('5'):
-                                e164 = f"+972{part1}{part2}{part3}"
-                                natl = f"0{part1}-{part2}-{part3}"
-                                print(f"✅ Fallback: Accepting {e164} ({natl}) as Israeli mobile (validation failed but pattern looks valid)")
-                                hits.append((e164, natl, text))
-                                break
-                            
-                            if hits:  # If we found a valid number, break out of pattern loop
-                                break
-                    
-                    if hits:  # If we found hits, break out of patterns loop
-                        break
-            
-            # Strategy 2: Fallback - accept numbers that look like Israeli mobile numbers
-            if not hits and region == "IL":
-                print(f"🔍 No hits with strict validation, trying fallback for: '{text}'")
-                import re
-                
-                # Look for patterns that look like Israeli mobile numbers
-                patterns = [
-                    r'(\d{2})-?B?(\d{2})-?(\d{4})',  # 54-B52-8105
-                    r'(\d{2})-(\d{3})-(\d{4})',      # 52-268-8331
-                ]
-                
-                for pattern in patterns:
-                    matches = re.findall(pattern, text)
-                    if matches:
-                        for match in matches:
-                            if len(match) == 3:
-                                part1, part2, part3 = match
-                                # Fix OCR errors
-                                part2 = part2.replace('B', '8')
-                                
-                                # Create Israeli mobile number
-                                if part1.startswith('5'):  # Israeli mobile prefix
-                                    e164 = f"+972{part1}{part2}{part3}"
-                                    natl = f"0{part1}-{part2}-{part3}"
-                                    
-                                    # Basic validation - check if it looks like a valid Israeli mobile
-                                    if len(part1 + part2 + part3) == 9 and part1.startswith('5'):
-                                        print(f"✅ Fallback: Accepting {e164} ({natl}) as Israeli mobile")
-                                        hits.append((e164, natl, text))
-                                        break
-                        if hits:
-                            break
+    def ocr_frames(self, source):
+        """Yield (frame_idx, timestamp_sec, frame, text_lines, hits, ocr_pass) in frame order"""
+        pool = get_ocr_pool()
+        if pool is None:
+            for frame_idx, timestamp_sec, frame in source:
+                # Process frame
+                processed_img = self.preprocess_image(frame)
+                # Cheap whitelisted pass first, heavier passes only for ambiguous frames
+                text_lines, hits, ocr_pass = self.ocr_ladder.run(frame, processed_img, self.scan_text_lines)
+                yield frame_idx, timestamp_sec, frame, text_lines, hits, ocr_pass
+            return
         
-        return hits
+        # OCR worker processes: keep one frame per worker in flight while decoding the
+        # next. Frames go through the pool's shared memory ring when they fit a slot.
+        ring = pool.ring
+        in_flight = deque()
+        try:
+            for frame_idx, timestamp_sec, frame in source:
+                slot = None
+                if ring is not None and ring.fits(frame):
+                    # With no free slot, finish our own oldest frame to free one;
+                    # wait on other tasks only with nothing of ours in flight
+                    slot = ring.acquire(block=False)
+                    while slot is None and in_flight:
+                        yield from self.emit_ocr_result(ring, *in_flight.popleft())
+                        slot = ring.acquire(block=False)
+                    if slot is None:
+                        slot = ring.acquire()
+                    job, frame = ring.write(slot, frame)
+                else:
+                    # Decoders may reuse the frame buffer
+                    frame = frame.copy()
+                    job = frame
+                future = pool.submit(job, self.preprocess_context.profile, self.regions,
+                                     self.task.min_confidence, self.word_min_conf)
+                in_flight.append((frame_idx, timestamp_sec, frame, slot, future))
+                if len(in_flight) >= self.ocr_window:
+                    yield from self.emit_ocr_result(ring, *in_flight.popleft())
+            while in_flight:
+                yield from self.emit_ocr_result(ring, *in_flight.popleft())
+        finally:
+            for *_, slot, future in in_flight:
+                if slot is None:
+                    future.cancel()
+                elif future.cancel():
+                    ring.release(slot)
+                else:
+                    # A worker is still reading the slot
+                    future.add_done_callback(lambda _, slot=slot: ring.release(slot))
+    
+    def emit_ocr_result(self, ring, frame_idx, timestamp_sec, frame, slot, future):
+        """Yield one frame's result, then hand its slot back to the ring"""
+        try:
+            yield self.collect_ocr_result(frame_idx, timestamp_sec, frame, future)
+        finally:
+            # The loop body is done with the frame (evidence crops are copies)
+            if slot is not None:
+                ring.release(slot)
+    
+    def collect_ocr_result(self, frame_idx, timestamp_sec, frame, future):
+        """Wait for a worker's result and fold its stats into this task's"""
+        text_lines, hits, ocr_pass, match_stats = future.result()
+        self.ocr_ladder.stats[ocr_pass] += 1
+        self.match_stats.update(match_stats)
+        return frame_idx, timestamp_sec, frame, text_lines, hits, ocr_pass
     
     def clean_phone_text(self, text):
         """Clean text for better phone number extraction"""
@@ -200,48 +123,63 @@ class VideoProcessor:
         text = text.replace(' ', '').replace('-', '')
         return text
     
+    def send_group_event(self, event):
+        """Send an event to this task's WebSocket group and to all-task dashboards"""
+        if self.channel_layer:
+            for group in (f'video_task_{self.task_id}', ALL_TASKS_GROUP):
+                async_to_sync(self.channel_layer.group_send)(group, event)
+    
     def send_progress_update(self, progress, current_frame, total_frames, message):
         """Send progress update via WebSocket"""
-        if self.channel_layer:
-            async_to_sync(self.channel_layer.group_send)(
-                f'video_task_{self.task_id}',
-                {
-                    'type': 'progress_update',
-                    'task_id': str(self.task_id),
-                    'progress': progress,
-                    'current_frame': current_frame,
-                    'total_frames': total_frames,
-                    'message': message,
-                    'status': 'processing'
-                }
-            )
+        self.send_group_event({
+            'type': 'progress_update',
+            'task_id': str(self.task_id),
+            'progress': progress,
+            'current_frame': current_frame,
+            'total_frames': total_frames,
+            'message': message,
+            'status': self.task.status
+        })
+    
+    def send_phone_found(self, e164, national, first_seen_seconds, raw_text):
+        """Send a newly discovered phone number via WebSocket"""
+        self.send_group_event({
+            'type': 'phone_found',
+            'task_id': str(self.task_id),
+            'e164_number': e164,
+            'national_number': national,
+            'first_seen_seconds': first_seen_seconds,
+            'raw_text': raw_text
+        })
     
     def send_task_completed(self, phone_numbers_count):
         """Send task completed notification via WebSocket"""
-        if self.channel_layer:
-            async_to_sync(self.channel_layer.group_send)(
-                f'video_task_{self.task_id}',
-                {
-                    'type': 'task_completed',
-                    'task_id': str(self.task_id),
-                    'status': 'completed',
-                    'message': f'Processing completed! Found {phone_numbers_count} phone numbers.',
-                    'phone_numbers_count': phone_numbers_count
-                }
-            )
+        self.send_group_event({
+            'type': 'task_completed',
+            'task_id': str(self.task_id),
+            'status': 'completed',
+            'message': f'Processing completed! Found {phone_numbers_count} phone numbers.',
+            'phone_numbers_count': phone_numbers_count
+        })
+    
+    def send_task_cancelled(self, phone_numbers_count):
+        """Send task cancelled notification via WebSocket"""
+        self.send_group_event({
+            'type': 'task_cancelled',
+            'task_id': str(self.task_id),
+            'status': 'cancelled',
+            'message': self.task.current_message,
+            'phone_numbers_count': phone_numbers_count
+        })
     
     def send_task_failed(self, error_message):
         """Send task failed notification via WebSocket"""
-        if self.channel_layer:
-            async_to_sync(self.channel_layer.group_send)(
-                f'video_task_{self.task_id}',
-                {
-                    'type': 'task_failed',
-                    'task_id': str(self.task_id),
-                    'status': 'failed',
-                    'error_message': error_message
-                }
-            )
+        self.send_group_event({
+            'type': 'task_failed',
+            'task_id': str(self.task_id),
+            'status': 'failed',
+            'error_message': error_message
+        })
     
     def update_task_progress(self, progress, current_frame, total_frames, message):
         """Update task progress in database and send WebSocket update"""
@@ -250,109 +188,158 @@ class VideoProcessor:
         self.task.total_frames = total_frames
         self.task.current_message = message
         self.task.save()
+        publish_snapshot(self.task)
         
         # Send WebSocket update
         self.send_progress_update(progress, current_frame, total_frames, message)
     
+    def wait_while_paused(self, current_frame, total_frames):
+        """Report the task paused and block until it is resumed or cancelled"""
+        self.task.status = 'paused'
+        self.update_task_progress(self.task.progress, current_frame, total_frames, f"Paused at frame {current_frame}/{total_frames}")
+        print(f"⏸️ Task {self.task_id} paused at frame {current_frame}")
+        # Time spent paused doesn't count against the wall time budget
+        self.budget.exclude(self.control.wait())
+        if not self.control.cancelled:
+            self.task.status = 'processing'
+            self.update_task_progress(self.task.progress, current_frame, total_frames, f"Resumed at frame {current_frame}/{total_frames}")
+            print(f"▶️ Task {self.task_id} resumed")
+    
     def process_video(self):
         """Main video processing function"""
+        self.control = register_control(self.task_id)
+        if self.control is None:
+            print(f"⏭️ Task {self.task_id} is already being processed, skipping")
+            return
+        try:
+            self.run_processing()
+        finally:
+            # The video file is free to be deleted from here on
+            unregister_control(self.task_id, self.control)
+    
+    def run_processing(self):
         # 
         try:
-            print("Abdu")
             print(f"\n🚀 Starting video processing for task {self.task.id}")
             print(f"📁 Video file: {self.task.video_file.name}")
             print(f"🌍 Region: {self.task.region}")
             print(f"🎬 Sample FPS: {self.task.sample_fps}")
             print(f"🎯 Min Confidence: {self.task.min_confidence}")
+            print(f"🧪 Preprocessing profile: {self.task.preprocess_profile}")
             
-            # Update task status
-            self.task.status = 'processing'
-            self.task.started_at = timezone.now()
-            self.task.save()
+            # Claim the task; it may have been cancelled or paused while queued
+            claimed = VideoProcessingTask.objects.filter(id=self.task_id, status='pending').update(
+                status='processing', started_at=timezone.now()
+            )
+            if not claimed:
+                print(f"⏭️ Task {self.task_id} is no longer pending, skipping")
+                return
+            self.task.refresh_from_db()
+            publish_snapshot(self.task)
             
             video_path = self.task.video_file.path
             
-            # Open video
-            cap = cv2.VideoCapture(video_path)
-            if not cap.isOpened():
-                raise RuntimeError(f"Cannot open video: {video_path}")
+            # Pick the preprocessing chain for this video
+            profile = resolve_profile(self.task.preprocess_profile, video_path)
+            self.preprocess_context = PreprocessContext(profile)
+            self.task.applied_preprocess_profile = profile
+            self.task.save()
             
-            video_fps = cap.get(cv2.CAP_PROP_FPS) or 25
-            frame_interval = max(int(round(video_fps / self.task.sample_fps)), 1)
-            total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            # Open video
+            source = open_frame_source(
+                video_path,
+                self.task.sample_fps,
+                decoder=settings.VIDEO_DECODER,
+                max_width=settings.VIDEO_DECODE_MAX_WIDTH
+            )
+            video_fps = source.video_fps
+            total_frames = source.total_frames
             
-            print(f"🎥 Video info: {video_fps} FPS, {total_frames} total frames")
-            print(f"📊 Processing every {frame_interval} frames ({self.task.sample_fps} FPS sampling)")
+            print(f"🎥 Video info: {video_fps} FPS, {total_frames} total frames ({source.name} decoder)")
+            print(f"📊 Processing every {source.frame_interval} frames ({self.task.sample_fps} FPS sampling)")
             
             # Update task with total frames
             self.update_task_progress(0, 0, total_frames, "Starting video processing...")
             
-            # Results storage
-            found = defaultdict(lambda: {"first_time": None, "frames": set(), "raw_hits": set()})
+            # Results storage: constant-size track per phone number
+            found = PhoneTracker(sample_interval_sec=source.frame_interval / video_fps)
+            # Cropped thumbnails of the first sightings, written off the OCR loop
+            self.evidence = EvidenceCollector(
+                EvidenceWriter(evidence_dir(self.task.id), settings.VIDEO_EVIDENCE_FORMAT),
+                settings.VIDEO_EVIDENCE_PER_NUMBER
+            )
+            
+            # Resource budgets: fewer OCR workers, smaller frames, thinner sampling
+            self.budget = TaskBudget(self.task)
+            pool = get_ocr_pool()
+            self.ocr_window = self.budget.workers(pool.processes) if pool else 1
+            self.budget.plan_frames(source.width, source.height, source.channels,
+                                    self.ocr_window + 1 if pool else 1)
             
-            frame_idx = -1
             processed_frames = 0
             print(f"🔄 Starting frame processing...")
             
-            while True:
-                ret, frame = cap.read()
-                if not ret:
-                    break
-                frame_idx += 1
-                
-                # Sample frames
-                if frame_idx % frame_interval != 0:
-                    continue
-                
-                processed_frames += 1
-                timestamp_sec = frame_idx / video_fps
-                
-                # Process frame
-                processed_img = self.preprocess_image(frame)
-                text_lines = self.extract_text_from_image(processed_img)
+            try:
+                frames = self.ocr_frames(self.budget.frames(source, total_frames, found))
+                for frame_idx, timestamp_sec, frame, text_lines, hits, ocr_pass in frames:
+                    processed_frames += 1
                 
-                # Update progress every 5 processed frames or on first frame
-                if processed_frames % 5 == 0 or processed_frames == 1:
-                    progress = int((frame_idx / total_frames) * 100)
-                    message = f"Processing frame {frame_idx}/{total_frames} (Time: {timestamp_sec:.1f}s)"
-                    self.update_task_progress(progress, frame_idx, total_frames, message)
-                    print(f"📈 Progress: {progress}% - {message}")
+                    # Update progress every 5 processed frames or on first frame
+                    if processed_frames % 5 == 0 or processed_frames == 1:
+                        progress = min(int((frame_idx / total_frames) * 100), 99) if total_frames else 0
+                        message = f"Processing frame {frame_idx}/{total_frames} (Time: {timestamp_sec:.1f}s)"
+                        self.update_task_progress(progress, frame_idx, total_frames, message)
+                        print(f"📈 Progress: {progress}% - {message}")
                 
-                if text_lines:
-                    print(f"📝 Frame {frame_idx}: Found {len(text_lines)} text lines")
-                    for line in text_lines[:2]:  # Show first 2 lines
-                        print(f"   Text: {line[:50]}{'...' if len(line) > 50 else ''}")
+                    if text_lines:
+                        print(f"📝 Frame {frame_idx}: Found {len(text_lines)} text lines ({ocr_pass} OCR pass)")
+                        for line in text_lines[:2]:  # Show first 2 lines
+                            print(f"   Text: {line[:50]}{'...' if len(line) > 50 else ''}")
                 
-                # Try both individual lines and joined text
-                joined_text = "\n".join(text_lines)
-                texts_to_scan = set(text_lines)
-                texts_to_scan.add(joined_text)
-                
-                # Extract phone numbers
-                frame_phone_count = 0
-                for text in texts_to_scan:
-                    hits = self.extract_phone_numbers(text, self.task.region)
-                    for e164, natl, raw in hits:
-                        if e164 not in found:
-                            found[e164] = {
-                                "first_time": timestamp_sec,
-                                "frames": set(),
-                                "raw_hits": set()
-                            }
+                    # Record phone numbers
+                    frame_phone_count = 0
+                    for e164, natl, raw, box in hits:
+                        is_new = found.observe(e164, natl, raw, frame_idx, timestamp_sec)
+                        self.evidence.observe(e164, frame, frame_idx, timestamp_sec, box)
+                        if is_new:
                             print(f"🆕 New phone number found: {e164} ({natl}) at {timestamp_sec:.1f}s")
-                        
-                        found[e164]["frames"].add(frame_idx)
-                        found[e164]["raw_hits"].add(raw)
+                            self.save_new_number(e164, found.tracks[e164], raw)
                         frame_phone_count += 1
                 
-                if frame_phone_count > 0:
-                    print(f"   Found {frame_phone_count} phone numbers in this frame")
+                    if frame_phone_count > 0:
+                        print(f"   Found {frame_phone_count} phone numbers in this frame")
+                
+                    # Pause and cancel requests are honoured between frames
+                    if self.control.paused:
+                        self.wait_while_paused(frame_idx, total_frames)
+                    if self.control.cancelled:
+                        break
+            finally:
+                # Withdraws frames still queued for the OCR workers when the loop stopped early
+                frames.close()
+                source.release()
+                self.evidence.close()
             
-            cap.release()
+            if self.control.cancelled:
+                # Keep what was found so far
+                self.save_results(found)
+                self.task.status = 'cancelled'
+                self.task.current_message = f"Cancelled after {processed_frames} frames"
+                self.task.completed_at = timezone.now()
+                self.task.save()
+                publish_snapshot(self.task)
+                self.send_task_cancelled(len(found))
+                print(f"🛑 Task {self.task.id} cancelled after {processed_frames} frames, {len(found)} phone numbers kept")
+                return
             
+            if self.budget.stopped:
+                print(f"⏱️ Wall time budget used up, keeping the numbers found so far")
             print(f"✅ Video processing completed!")
             print(f"📊 Processed {processed_frames} frames out of {total_frames} total frames")
             print(f"📞 Found {len(found)} unique phone numbers")
+            print(f"🔬 OCR passes used: {dict(self.ocr_ladder.stats)}")
+            print(f"🔎 Phone matcher: {describe_stats(self.match_stats)}")
+            print(f"🖼️ Evidence crops written: {self.evidence.writer.written} (dropped {self.evidence.writer.dropped})")
             
             # Save results to database
             self.save_results(found)
@@ -363,6 +350,7 @@ class VideoProcessor:
             self.task.progress = 100
             self.task.completed_at = timezone.now()
             self.task.save()
+            publish_snapshot(self.task)
             
             # Send completion notification
             self.send_task_completed(len(found))
@@ -380,24 +368,57 @@ class VideoProcessor:
             self.task.error_message = str(e)
             self.task.completed_at = timezone.now()
             self.task.save()
+            publish_snapshot(self.task)
             
             # Send error notification
             self.send_task_failed(str(e))
     
+    @staticmethod
+    def national_format(e164):
+        return phonenumbers.format_number(phonenumbers.parse(e164, None), PhoneNumberFormat.NATIONAL)
+    
+    def save_new_number(self, e164, track, raw):
+        """Persist a number the moment it is first seen and push it to WebSocket clients"""
+        national = self.national_format(e164)
+        first_seen = round(track.first_time, 3)
+        PhoneNumberResult.objects.update_or_create(
+            task=self.task,
+            e164_number=e164,
+            defaults=dict(
+                national_number=national,
+                first_seen_seconds=first_seen,
+                last_seen_seconds=first_seen,
+                frame_count=track.frame_count,
+                appearances=[[first_seen, first_seen]],
+                raw_text_examples=raw[:500],
+                evidence=self.evidence.get(e164)
+            )
+        )
+        self.send_phone_found(e164, national, first_seen, raw)
+    
     def save_results(self, found_numbers):
         """Save extracted phone numbers to database"""
-        for e164, info in found_numbers.items():
-            PhoneNumberResult.objects.create(
+        for e164, track in found_numbers.items():
+            # Rows were created as numbers were discovered; fill in the final stats
+            result, _ = PhoneNumberResult.objects.update_or_create(
                 task=self.task,
                 e164_number=e164,
-                national_number=phonenumbers.format_number(
-                    phonenumbers.parse(e164, None), 
-                    PhoneNumberFormat.NATIONAL
-                ),
-                first_seen_seconds=round(info["first_time"], 3) if info["first_time"] is not None else 0,
-                frame_count=len(info["frames"]),
-                raw_text_examples="; ".join(sorted(info["raw_hits"]))[:500]
+                defaults=dict(
+                    national_number=self.national_format(e164),
+                    first_seen_seconds=round(track.first_time, 3) if track.first_time is not None else 0,
+                    last_seen_seconds=round(track.last_time, 3) if track.last_time is not None else None,
+                    frame_count=track.frame_count,
+                    appearances=[[round(start, 3), round(end, 3)] for start, end in track.intervals],
+                    raw_text_examples=track.raw_text_examples(),
+                    evidence=self.evidence.get(e164)
+                )
             )
+            # Keep the cross-task index in step with the new row, once per row;
+            # rows saved as numbers were found are only counted from here
+            if not result.indexed:
+                PhoneNumberIndex.record(e164, result.national_number, result.frame_count)
+                result.indexed = True
+                result.save(update_fields=['indexed'])
 
 
 def process_video_async(task_id):
@@ -407,8 +428,6 @@ def process_video_async(task_id):
 
 
 def start_video_processing(task_id):
-    """Start video processing in a separate thread"""
-    thread = threading.Thread(target=process_video_async, args=(task_id,))
-    thread.daemon = True
-    thread.start()
-    return thread
+    """Queue video processing on the shared worker pool"""
+    from .scheduler import get_scheduler
+    get_scheduler().submit(task_id)
@@ -1,60 +1,116 @@
 from ninja import NinjaAPI, File, Form
 from ninja.files import UploadedFile
 from ninja.errors import HttpError
-from django.http import JsonResponse
+from django.http import FileResponse
 from django.conf import settings
-from django.utils import timezone
-import threading
-from .models import VideoProcessingTask, PhoneNumberResult
-from .video_processor import VideoProcessor
+from django.db.models import Count, F, Min, Q, Sum, Window
+from django.db.models.functions import RowNumber
+from .models import VideoBatch, VideoProcessingTask, PhoneNumberResult, PhoneNumberIndex
+from .scheduler import estimate_sampled_frames, get_scheduler
+from .snapshots import delete_snapshot
+from .task_control import TaskControlError, control_task, get_control
+from .evidence import delete_evidence, evidence_dir
+from .matching import describe_stats, parse_regions
+from .scanning import FrameScanner
+from .exports import EXPORT_FORMATS, export_response, parquet_available
+from datetime import datetime
+from pathlib import Path
 from typing import List, Optional
-import uuid
+from phonenumbers import PhoneNumberFormat
+import base64
+import json
+import phonenumbers
 import os
+import uuid
 
 
 api = NinjaAPI(title="Video Phone Number Extraction API", version="1.0.0")
 
 
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv')
+MAX_PAGE_SIZE = 1000
+# Statuses a task doesn't leave by itself
+FINISHED_STATUSES = ('completed', 'failed', 'cancelled')
+# How long deleting a running task waits for its processor to stop
+DELETE_STOP_TIMEOUT = 30
+
+
+def _encode_cursor(*values):
+    """Opaque keyset cursor from the sort key of the last row on a page"""
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def _decode_cursor(cursor, *types):
+    """Values of a cursor made by _encode_cursor, each converted by the matching type"""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if not isinstance(values, list) or len(values) != len(types):
+            raise ValueError("wrong number of values")
+        return [convert(value) for convert, value in zip(types, values)]
+    except (ValueError, TypeError, AttributeError):
+        raise HttpError(400, "Invalid cursor")
+
+
+def _parse_uuid(value, name):
+    """UUID from a query parameter, 400 if it isn't one"""
+    try:
+        return uuid.UUID(value.strip())
+    except ValueError:
+        raise HttpError(400, f"Invalid {name}: {value}")
+
+
 def start_video_processing(task_id: str):
-    """Start video processing in a background thread"""
-    def process_video():
-        try:
-            print(f"🚀 Starting background processing for task {task_id}")
-            processor = VideoProcessor(task_id)
-            processor.process_video()
-        except Exception as e:
-            print(f"❌ Error in background processing: {str(e)}")
-            # Update task status to failed
-            try:
-                task = VideoProcessingTask.objects.get(id=task_id)
-                task.status = 'failed'
-                task.error_message = str(e)
-                task.completed_at = timezone.now()
-                task.save()
-            except VideoProcessingTask.DoesNotExist:
-                pass
-    
-    # Start processing in background thread
-    thread = threading.Thread(target=process_video)
-    thread.daemon = True
-    thread.start()
+    """Queue video processing on the shared worker pool"""
+    get_scheduler().submit(task_id)
+
+
+def _validate_regions(region):
+    """Normalise a comma-separated region list ('il, de' -> 'IL,DE'), defaulting to PHONE_REGIONS"""
+    try:
+        regions = ",".join(parse_regions(region or settings.PHONE_REGIONS))
+    except ValueError as e:
+        raise HttpError(400, str(e))
+    if len(regions) > VideoProcessingTask._meta.get_field('region').max_length:
+        raise HttpError(400, "Too many regions")
+    return regions
+
+
+def _validate_budgets(**budgets):
+    """Per-task resource budgets; None leaves the VIDEO_TASK_MAX_* setting, 0 is unlimited"""
+    for name, value in budgets.items():
+        if value is not None and value < 0:
+            raise HttpError(400, f"{name} must be 0 (unlimited) or more")
+    return budgets
 
 
 @api.post("/upload-video")
 def upload_video(
     request,
-    video: UploadedFile = File(...)
+    video: UploadedFile = File(...),
+    preprocess_profile: str = Form('standard'),
+    region: Optional[str] = Form(None),
+    max_workers: Optional[int] = Form(None),
+    max_memory_mb: Optional[int] = Form(None),
+    max_wall_seconds: Optional[int] = Form(None)
 ):
     """
     Upload a video file for phone number extraction (returns task ID immediately)
     """
     # 
     # Validate file type
-    if not video.name.lower().endswith(('.mp4', '.avi', '.mov', '.mkv')):
+    if not video.name.lower().endswith(VIDEO_EXTENSIONS):
         raise HttpError(400, "Only video files (mp4, avi, mov, mkv) are allowed")
     
+    profiles = [key for key, _ in VideoProcessingTask.PREPROCESS_PROFILE_CHOICES]
+    if preprocess_profile not in profiles:
+        raise HttpError(400, f"Unknown preprocess_profile. Choose one of: {', '.join(profiles)}")
+    
+    region = _validate_regions(region)
+    budgets = _validate_budgets(
+        max_workers=max_workers, max_memory_mb=max_memory_mb, max_wall_seconds=max_wall_seconds
+    )
+    
     # Use default parameters
-    region = "IL"
     sample_fps = 4
     min_confidence = 55
     
@@ -63,7 +119,9 @@ def upload_video(
         video_file=video,
         region=region,
         sample_fps=sample_fps,
-        min_confidence=min_confidence
+        min_confidence=min_confidence,
+        preprocess_profile=preprocess_profile,
+        **budgets
     )
     
     print(f"\n🚀 Video uploaded successfully - Task {task.id}")
@@ -72,22 +130,159 @@ def upload_video(
     print(f"🎬 Sample FPS: {task.sample_fps}")
     print(f"🎯 Min Confidence: {task.min_confidence}")
     
-    # Update task status to processing
-    task.status = 'processing'
-    task.started_at = timezone.now()
-    task.save()
-    
-    # Start processing in background thread
+    # Queue processing on the shared worker pool (status stays pending until a worker picks it up)
     start_video_processing(str(task.id))
     
     return {
         "task_id": str(task.id),
-        "status": "processing",
-        "message": "Video uploaded successfully. Processing started in background.",
+        "status": task.status,
+        "message": "Video uploaded successfully. Processing queued in background.",
         "websocket_url": f"ws://localhost:8000/ws/task/{task.id}/"
     }
 
 
+@api.post("/upload-batch")
+def upload_batch(
+    request,
+    videos: List[UploadedFile] = File(None),
+    directory: Optional[str] = Form(None),
+    recursive: bool = Form(False),
+    preprocess_profile: str = Form('standard'),
+    region: Optional[str] = Form(None),
+    max_workers: Optional[int] = Form(None),
+    max_memory_mb: Optional[int] = Form(None),
+    max_wall_seconds: Optional[int] = Form(None)
+):
+    """
+    Submit many videos at once, either as uploaded files or as a directory under MEDIA_ROOT
+    """
+    if not videos and not directory:
+        raise HttpError(400, "Provide video files or a directory")
+    
+    profiles = [key for key, _ in VideoProcessingTask.PREPROCESS_PROFILE_CHOICES]
+    if preprocess_profile not in profiles:
+        raise HttpError(400, f"Unknown preprocess_profile. Choose one of: {', '.join(profiles)}")
+    
+    region = _validate_regions(region)
+    budgets = _validate_budgets(
+        max_workers=max_workers, max_memory_mb=max_memory_mb, max_wall_seconds=max_wall_seconds
+    )
+    
+    for video in videos or []:
+        if not video.name.lower().endswith(VIDEO_EXTENSIONS):
+            raise HttpError(400, f"Only video files (mp4, avi, mov, mkv) are allowed: {video.name}")
+    
+    media_root = Path(settings.MEDIA_ROOT).resolve()
+    directory_files = []
+    if directory:
+        # Only directories inside MEDIA_ROOT can be referenced
+        source_dir = (media_root / directory).resolve()
+        if not source_dir.is_relative_to(media_root) or not source_dir.is_dir():
+            raise HttpError(400, "directory must be an existing directory under MEDIA_ROOT")
+        pattern = '**/*' if recursive else '*'
+        directory_files = sorted(
+            path for path in source_dir.glob(pattern)
+            if path.is_file() and path.suffix.lower() in VIDEO_EXTENSIONS
+        )
+        if not directory_files and not videos:
+            raise HttpError(400, "No video files found in directory")
+    
+    batch = VideoBatch.objects.create(source_directory=directory or '')
+    task_params = dict(batch=batch, region=region, sample_fps=4, min_confidence=55, preprocess_profile=preprocess_profile,
+                       **budgets)
+    
+    tasks = [VideoProcessingTask.objects.create(video_file=video, **task_params) for video in videos or []]
+    for path in directory_files:
+        # Reference the file in place instead of copying it into videos/
+        task = VideoProcessingTask(owns_video_file=False, **task_params)
+        task.video_file.name = path.relative_to(media_root).as_posix()
+        task.save()
+        tasks.append(task)
+    
+    estimates = {
+        str(task.id): estimate_sampled_frames(task.video_file.path, task.sample_fps)
+        for task in tasks
+    }
+    get_scheduler().submit_many(estimates)
+    
+    print(f"\n🚀 Batch {batch.id} queued with {len(tasks)} videos")
+    
+    return {
+        "batch_id": str(batch.id),
+        "total_tasks": len(tasks),
+        "task_ids": [str(task.id) for task in tasks],
+        "message": "Batch queued for processing."
+    }
+
+
+@api.get("/batch/{batch_id}")
+def get_batch_status(request, batch_id: str):
+    """
+    Get aggregate progress of a batch
+    """
+    try:
+        batch = VideoBatch.objects.get(id=batch_id)
+    except VideoBatch.DoesNotExist:
+        raise HttpError(404, "Batch not found")
+    
+    tasks = list(batch.tasks.values('id', 'status', 'progress', 'total_frames'))
+    status_counts = {status: 0 for status, _ in VideoProcessingTask.STATUS_CHOICES}
+    for task in tasks:
+        status_counts[task['status']] += 1
+    
+    # Weight progress by frame count so long clips count for more
+    total_weight = sum(task['total_frames'] or 1 for task in tasks)
+    finished = sum(status_counts[status] for status in FINISHED_STATUSES)
+    progress = sum(
+        (100 if task['status'] in FINISHED_STATUSES else task['progress']) * (task['total_frames'] or 1)
+        for task in tasks
+    ) / total_weight if tasks else 0
+    
+    return {
+        "batch_id": str(batch.id),
+        "status": "completed" if finished == len(tasks) else "processing",
+        "progress": int(progress),
+        "total_tasks": len(tasks),
+        "status_counts": status_counts,
+        "created_at": batch.created_at.isoformat(),
+        "source_directory": batch.source_directory,
+        "tasks": [
+            {"task_id": str(task['id']), "status": task['status'], "progress": task['progress']}
+            for task in tasks
+        ]
+    }
+
+
+@api.get("/batch/{batch_id}/results")
+def get_batch_results(request, batch_id: str):
+    """
+    Get phone numbers found across all tasks of a batch, deduplicated
+    """
+    try:
+        batch = VideoBatch.objects.get(id=batch_id)
+    except VideoBatch.DoesNotExist:
+        raise HttpError(404, "Batch not found")
+    
+    phone_numbers = (
+        PhoneNumberResult.objects
+        .filter(task__batch=batch)
+        .values('e164_number')
+        .annotate(
+            national_number=Min('national_number'),
+            frame_count=Sum('frame_count'),
+            task_count=Count('task', distinct=True)
+        )
+        .order_by('e164_number')
+    )
+    
+    results = list(phone_numbers)
+    return {
+        "batch_id": str(batch.id),
+        "total_phone_numbers": len(results),
+        "phone_numbers": results
+    }
+
+
 @api.get("/task/{task_id}")
 def get_task_status(request, task_id: str):
     """
@@ -109,71 +304,202 @@ def get_task_status(request, task_id: str):
         "started_at": task.started_at.isoformat() if task.started_at else None,
         "completed_at": task.completed_at.isoformat() if task.completed_at else None,
         "error_message": task.error_message,
-        "video_file": task.video_file.name if task.video_file else None
+        "video_file": task.video_file.name if task.video_file else None,
+        "preprocess_profile": task.preprocess_profile,
+        "applied_preprocess_profile": task.applied_preprocess_profile,
+        "budgets": {
+            "max_workers": task.max_workers,
+            "max_memory_mb": task.max_memory_mb,
+            "max_wall_seconds": task.max_wall_seconds
+        },
+        "degradations": task.degradations
     }
 
 
 @api.get("/task/{task_id}/results")
-def get_task_results(request, task_id: str):
+def get_task_results(request, task_id: str, limit: int = 1000, cursor: Optional[str] = None):
     """
-    Get the extracted phone numbers for a completed task
+    Get the extracted phone numbers for a completed task (keyset-paginated via next_cursor)
     """
     try:
-        task = VideoProcessingTask.objects.get(id=task_id)
+        task = VideoProcessingTask.objects.only('id', 'status').get(id=task_id)
     except VideoProcessingTask.DoesNotExist:
         raise HttpError(404, "Task not found")
     
     if task.status != 'completed':
         raise HttpError(400, f"Task is not completed yet. Current status: {task.status}")
     
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
     phone_numbers = PhoneNumberResult.objects.filter(task=task)
+    total = phone_numbers.count()
     
-    results = []
-    for phone in phone_numbers:
-        results.append({
-            "e164_number": phone.e164_number,
-            "national_number": phone.national_number,
-            "first_seen_seconds": phone.first_seen_seconds,
-            "frame_count": phone.frame_count,
-            "raw_text_examples": phone.raw_text_examples
-        })
+    # Walks the (task, first_seen_seconds, e164_number) index
+    phone_numbers = phone_numbers.order_by('first_seen_seconds', 'e164_number')
+    if cursor:
+        first_seen, e164 = _decode_cursor(cursor, float, str)
+        phone_numbers = phone_numbers.filter(
+            Q(first_seen_seconds__gt=first_seen) |
+            Q(first_seen_seconds=first_seen, e164_number__gt=e164)
+        )
+    
+    results = list(phone_numbers.values(
+        'e164_number', 'national_number', 'first_seen_seconds', 'last_seen_seconds',
+        'frame_count', 'appearances', 'raw_text_examples', 'evidence'
+    )[:limit + 1])
+    for result in results:
+        for entry in result['evidence']:
+            entry['url'] = f"/api/task/{task.id}/evidence/{entry['image']}"
+    
+    next_cursor = None
+    if len(results) > limit:
+        results = results[:limit]
+        next_cursor = _encode_cursor(results[-1]['first_seen_seconds'], results[-1]['e164_number'])
     
     return {
         "task_id": str(task.id),
         "status": task.status,
-        "total_phone_numbers": len(results),
-        "phone_numbers": results
+        "total_phone_numbers": total,
+        "phone_numbers": results,
+        "next_cursor": next_cursor
     }
 
 
+@api.get("/task/{task_id}/evidence/{filename}")
+def get_task_evidence(request, task_id: str, filename: str):
+    """
+    Serve one cropped evidence image listed in a result's ``evidence``
+    """
+    try:
+        task = VideoProcessingTask.objects.only('id').get(id=task_id)
+    except VideoProcessingTask.DoesNotExist:
+        raise HttpError(404, "Task not found")
+    
+    path = evidence_dir(task.id) / filename
+    # Only plain file names inside the task's evidence directory
+    if Path(filename).name != filename or not path.is_file():
+        raise HttpError(404, "Evidence not found")
+    
+    content_type = 'image/webp' if path.suffix == '.webp' else 'image/jpeg'
+    return FileResponse(open(path, 'rb'), content_type=content_type)
+
+
+def _export(queryset, format, filename):
+    if format not in EXPORT_FORMATS:
+        raise HttpError(400, f"format must be one of: {', '.join(EXPORT_FORMATS)}")
+    if format == 'parquet' and not parquet_available():
+        raise HttpError(501, "Parquet export requires pyarrow to be installed")
+    return export_response(queryset, format, filename)
+
+
+@api.get("/task/{task_id}/results/export")
+def export_task_results(request, task_id: str, format: str = "csv"):
+    """
+    Stream a task's phone numbers as CSV, NDJSON or Parquet
+    """
+    task_id = _parse_uuid(task_id, 'task_id')
+    if not VideoProcessingTask.objects.filter(id=task_id).exists():
+        raise HttpError(404, "Task not found")
+    
+    return _export(PhoneNumberResult.objects.filter(task_id=task_id), format, f"task_{task_id}_results")
+
+
+@api.get("/results/export")
+def export_results(
+    request,
+    format: str = "csv",
+    task_ids: Optional[str] = None,
+    batch_id: Optional[str] = None,
+    status: Optional[str] = None
+):
+    """
+    Stream phone numbers of many tasks (comma-separated task_ids, a batch and/or a task status)
+    """
+    results = PhoneNumberResult.objects.all()
+    if task_ids:
+        results = results.filter(task_id__in=[_parse_uuid(task_id, 'task_ids') for task_id in task_ids.split(',') if task_id.strip()])
+    if batch_id:
+        results = results.filter(task__batch_id=_parse_uuid(batch_id, 'batch_id'))
+    if status:
+        results = results.filter(task__status=status)
+    
+    return _export(results, format, "results")
+
+
 @api.get("/tasks")
-def list_tasks(request, status: Optional[str] = None, limit: int = 10):
+def list_tasks(request, status: Optional[str] = None, limit: int = 10, cursor: Optional[str] = None):
     """
-    List all video processing tasks with optional status filter
+    List all video processing tasks with optional status filter (keyset-paginated via next_cursor)
     """
-    tasks = VideoProcessingTask.objects.all()
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    tasks = VideoProcessingTask.objects.order_by('-created_at', '-id')
     
     if status:
+        # Served by the (status, created_at) index
         tasks = tasks.filter(status=status)
     
-    tasks = tasks[:limit]
+    if cursor:
+        created_at, last_id = _decode_cursor(cursor, datetime.fromisoformat, uuid.UUID)
+        tasks = tasks.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=last_id))
+    
+    rows = list(tasks.values('id', 'status', 'created_at', 'completed_at', 'video_file')[:limit + 1])
+    
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = _encode_cursor(rows[-1]['created_at'].isoformat(), str(rows[-1]['id']))
     
     results = []
-    for task in tasks:
+    for task in rows:
         results.append({
-            "task_id": str(task.id),
-            "status": task.status,
-            "created_at": task.created_at.isoformat(),
-            "completed_at": task.completed_at.isoformat() if task.completed_at else None,
-            "video_file": task.video_file.name if task.video_file else None
+            "task_id": str(task['id']),
+            "status": task['status'],
+            "created_at": task['created_at'].isoformat(),
+            "completed_at": task['completed_at'].isoformat() if task['completed_at'] else None,
+            "video_file": task['video_file'] or None
         })
     
     return {
         "tasks": results,
-        "total": len(results)
+        "total": len(results),
+        "next_cursor": next_cursor
     }
 
 
+def _control(task_id, action):
+    """Apply a control action, mapping refusals to 409"""
+    try:
+        status = control_task(task_id, action)
+    except VideoProcessingTask.DoesNotExist:
+        raise HttpError(404, "Task not found")
+    except TaskControlError as e:
+        raise HttpError(409, str(e))
+    return {"task_id": task_id, "action": action, "status": status}
+
+
+@api.post("/task/{task_id}/cancel")
+def cancel_task(request, task_id: str):
+    """
+    Stop a task after its current frame, keeping the numbers found so far
+    """
+    return _control(task_id, 'cancel')
+
+
+@api.post("/task/{task_id}/pause")
+def pause_task(request, task_id: str):
+    """
+    Pause a task after its current frame (or hold it back if still queued)
+    """
+    return _control(task_id, 'pause')
+
+
+@api.post("/task/{task_id}/resume")
+def resume_task(request, task_id: str):
+    """
+    Resume a paused task
+    """
+    return _control(task_id, 'resume')
+
+
 @api.delete("/task/{task_id}")
 def delete_task(request, task_id: str):
     """
@@ -184,12 +510,31 @@ def delete_task(request, task_id: str):
     except VideoProcessingTask.DoesNotExist:
         raise HttpError(404, "Task not found")
     
-    # Delete video file if it exists
-    if task.video_file and os.path.exists(task.video_file.path):
+    # A running task has to let go of its video file first
+    control = get_control(task.id)
+    if control is not None:
+        control.cancel()
+        if not control.stopped.wait(DELETE_STOP_TIMEOUT):
+            raise HttpError(409, "Task is still stopping, try again")
+    elif task.status in ('processing', 'paused') and task.started_at is not None:
+        # Started by another process (a batch worker or another server), which
+        # still has the video open and keeps writing rows for the task
+        raise HttpError(409, "Task is being processed by another process")
+    
+    # Delete the video file if the task owns it (uploaded or copied); files
+    # referenced in place under MEDIA_ROOT are the user's
+    if task.owns_video_file and task.video_file and os.path.exists(task.video_file.path):
         os.remove(task.video_file.path)
     
+    # Remove the task's numbers from the cross-task index (only the rows
+    # save_results counted; a failed task's early rows never were)
+    for e164, frame_count in task.phone_numbers.filter(indexed=True).values_list('e164_number', 'frame_count'):
+        PhoneNumberIndex.forget(e164, frame_count)
+    
     # Delete task (this will also delete associated phone numbers due to CASCADE)
     task.delete()
+    delete_snapshot(task_id)
+    delete_evidence(task_id)
     
     return {"message": "Task deleted successfully"}
 
@@ -197,17 +542,19 @@ def delete_task(request, task_id: str):
 @api.post("/extract-phone-numbers")
 def extract_phone_numbers(
     request,
-    video: UploadedFile = File(...)
+    video: UploadedFile = File(...),
+    region: Optional[str] = Form(None)
 ):
     """
     Extract phone numbers from video without saving to database (quick processing)
     """
     # Validate file type
-    if not video.name.lower().endswith(('.mp4', '.avi', '.mov', '.mkv')):
+    if not video.name.lower().endswith(VIDEO_EXTENSIONS):
         raise HttpError(400, "Only video files (mp4, avi, mov, mkv) are allowed")
     
+    region = _validate_regions(region)
+    
     # Use default parameters
-    region = "IL"
     sample_fps = 4
     min_confidence = 55
     
@@ -227,13 +574,12 @@ def extract_phone_numbers(
         
         print(f"💾 Video saved temporarily to: {temp_video_path}")
         
-        # Process video directly
+        # Process video directly (the extraction stack is only imported when needed)
         import cv2
         import pytesseract
-        import phonenumbers
         import pandas as pd
-        from phonenumbers import PhoneNumberMatcher, PhoneNumberFormat
-        from collections import defaultdict
+        from .preprocessing import PreprocessContext
+        from .tracking import PhoneTracker
         
         # Open video
         cap = cv2.VideoCapture(temp_video_path)
@@ -247,27 +593,11 @@ def extract_phone_numbers(
         print(f"🎥 Video info: {video_fps} FPS, {total_frames} total frames")
         print(f"📊 Processing every {frame_interval} frames ({sample_fps} FPS sampling)")
         
-        # Results storage
-        found = defaultdict(lambda: {"first_time": None, "frames": set(), "raw_hits": set()})
+        # Results storage: constant-size track per phone number
+        found = PhoneTracker(sample_interval_sec=frame_interval / video_fps)
         
-        def preprocess_image(img):
-            # Resize image if too small for good OCR (minimum 400px width for better results)
-            height, width = img.shape[:2]
-            if width < 400:
-                scale_factor = 400 / width
-                new_width = int(width * scale_factor)
-                new_height = int(height * scale_factor)
-                img = cv2.resize(img, (new_width, new_height), interpolation=cv2.INTER_CUBIC)
-                print(f"📏 Resized image from {width}x{height} to {new_width}x{new_height} for better OCR")
-            
-            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-            clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8,8))
-            gray = clahe.apply(gray)
-            th = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
-                                       cv2.THRESH_BINARY, 31, 9)
-            kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (1,1))
-            th = cv2.morphologyEx(th, cv2.MORPH_OPEN, kernel, iterations=1)
-            return th
+        # Reused across frames: cached CLAHE object and preallocated buffers
+        preprocess_context = PreprocessContext()
         
         def extract_text_from_image(img):
             config = "--oem 3 --psm 6"
@@ -297,18 +627,8 @@ def extract_phone_numbers(
                 print(f"OCR Error: {e}")
                 return []
         
-        def extract_phone_numbers(text, region):
-            hits = []
-            try:
-                for match in PhoneNumberMatcher(text, region):
-                    num = match.number
-                    if phonenumbers.is_possible_number(num) and phonenumbers.is_valid_number(num):
-                        e164 = phonenumbers.format_number(num, PhoneNumberFormat.E164)
-                        natl = phonenumbers.format_number(num, PhoneNumberFormat.NATIONAL)
-                        hits.append((e164, natl, match.raw_string))
-            except Exception as e:
-                print(f"Phone number extraction error: {e}")
-            return hits
+        # Same single-pass scan (lines plus line-break candidates) as processing tasks
+        scanner = FrameScanner(parse_regions(region))
         
         # Process video
         frame_idx = -1
@@ -332,7 +652,7 @@ def extract_phone_numbers(
                 progress = (frame_idx / total_frames) * 100
                 print(f"📈 Progress: {progress:.1f}% - Processing frame {frame_idx}/{total_frames} (Time: {timestamp_sec:.1f}s)")
             
-            processed_img = preprocess_image(frame)
+            processed_img = preprocess_context.preprocess(frame)
             text_lines = extract_text_from_image(processed_img)
             
             if text_lines:
@@ -340,19 +660,17 @@ def extract_phone_numbers(
                 for line in text_lines[:3]:  # Show first 3 lines
                     print(f"   Text: {line[:50]}{'...' if len(line) > 50 else ''}")
             
-            joined_text = "\n".join(text_lines)
-            texts_to_scan = set(text_lines)
-            texts_to_scan.add(joined_text)
+            try:
+                hits = scanner.scan_text_lines(text_lines)
+            except Exception as e:
+                print(f"Phone number extraction error: {e}")
+                hits = []
             
             frame_phone_count = 0
-            for text in texts_to_scan:
-                for e164, natl, raw in extract_phone_numbers(text, region):
-                    if found[e164]["first_time"] is None:
-                        found[e164]["first_time"] = timestamp_sec
-                        print(f"📞 NEW PHONE FOUND: {e164} ({natl}) at {timestamp_sec:.1f}s")
-                    found[e164]["frames"].add(frame_idx)
-                    found[e164]["raw_hits"].add(raw)
-                    frame_phone_count += 1
+            for e164, natl, raw in hits:
+                if found.observe(e164, natl, raw, frame_idx, timestamp_sec):
+                    print(f"📞 NEW PHONE FOUND: {e164} ({natl}) at {timestamp_sec:.1f}s")
+                frame_phone_count += 1
             
             if frame_phone_count > 0:
                 print(f"   Found {frame_phone_count} phone numbers in this frame")
@@ -362,6 +680,7 @@ def extract_phone_numbers(
         print(f"✅ Video processing completed!")
         print(f"📊 Processed {processed_frames} frames out of {total_frames} total frames")
         print(f"📞 Found {len(found)} unique phone numbers")
+        print(f"🔎 Phone matcher: {describe_stats(scanner.match_stats)}")
         
         # Clean up temp file
         import os
@@ -370,16 +689,18 @@ def extract_phone_numbers(
         
         # Format results
         results = []
-        for e164, info in found.items():
+        for e164, track in found.items():
             results.append({
                 "e164_number": e164,
                 "national_number": phonenumbers.format_number(
                     phonenumbers.parse(e164, None), 
                     PhoneNumberFormat.NATIONAL
                 ),
-                "first_seen_seconds": round(info["first_time"], 3) if info["first_time"] is not None else 0,
-                "frame_count": len(info["frames"]),
-                "raw_text_examples": "; ".join(sorted(info["raw_hits"]))[:500]
+                "first_seen_seconds": round(track.first_time, 3) if track.first_time is not None else 0,
+                "last_seen_seconds": round(track.last_time, 3) if track.last_time is not None else None,
+                "frame_count": track.frame_count,
+                "appearances": [[round(start, 3), round(end, 3)] for start, end in track.intervals],
+                "raw_text_examples": track.raw_text_examples()
             })
         
         # Print summary
@@ -406,6 +727,95 @@ def extract_phone_numbers(
         raise HttpError(500, f"Video processing failed: {str(e)}")
 
 
+@api.get("/phone-numbers/search")
+def search_phone_numbers(request, q: str, mode: str = "exact", region: str = "IL", limit: int = 50, task_limit: int = 20):
+    """
+    Find which tasks contained a phone number.
+    
+    mode=exact: q is a number in any format (E164 or national for `region`)
+    mode=prefix: q is the start of an E164 number, e.g. +97254
+    mode=national: q is the start of a national number, e.g. 054-852
+    
+    Each number lists its newest `task_limit` tasks; `task_count` has the total.
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    task_limit = max(1, min(task_limit, MAX_PAGE_SIZE))
+    digits = ''.join(ch for ch in q if ch.isdigit())
+    if not digits:
+        raise HttpError(400, "q must contain digits")
+    
+    numbers = PhoneNumberIndex.objects.all()
+    if mode == "exact":
+        try:
+            parsed = phonenumbers.parse(q, region)
+        except phonenumbers.NumberParseException as e:
+            raise HttpError(400, f"Cannot parse phone number: {e}")
+        numbers = numbers.filter(e164_number=phonenumbers.format_number(parsed, PhoneNumberFormat.E164))
+    elif mode == "prefix":
+        numbers = numbers.filter(**_prefix_range('e164_number', '+' + digits))
+    elif mode == "national":
+        # Drop the trunk prefix ("054..." -> "54...")
+        national_digits = digits.lstrip('0')
+        if not national_digits:
+            raise HttpError(400, "q must contain digits after the trunk prefix 0")
+        numbers = numbers.filter(**_prefix_range('national_digits', national_digits))
+        if region:
+            country_code = phonenumbers.country_code_for_region(region)
+            if country_code:
+                numbers = numbers.filter(country_code=country_code)
+    else:
+        raise HttpError(400, "mode must be one of: exact, prefix, national")
+    
+    rows = list(numbers.values(
+        'e164_number', 'national_number', 'task_count', 'total_frame_count', 'first_seen_at', 'last_seen_at'
+    )[:limit])
+    
+    # Task references for the matched numbers, via the (e164_number, task) index
+    tasks_by_number = {}
+    if rows:
+        # Newest task_limit rows per number; a number seen in thousands of
+        # tasks must not pull them all in. Only indexed rows, the ones task_count counts
+        task_rows = (
+            PhoneNumberResult.objects
+            .filter(e164_number__in=[row['e164_number'] for row in rows], indexed=True)
+            .annotate(rank=Window(RowNumber(), partition_by=[F('e164_number')], order_by=F('id').desc()))
+            .filter(rank__lte=task_limit)
+            .values('e164_number', 'task_id', 'first_seen_seconds', 'frame_count')
+        )
+        for task_row in task_rows:
+            tasks_by_number.setdefault(task_row['e164_number'], []).append({
+                "task_id": str(task_row['task_id']),
+                "first_seen_seconds": task_row['first_seen_seconds'],
+                "frame_count": task_row['frame_count']
+            })
+    
+    results = []
+    for row in rows:
+        results.append({
+            "e164_number": row['e164_number'],
+            "national_number": row['national_number'],
+            "task_count": row['task_count'],
+            "total_frame_count": row['total_frame_count'],
+            "first_seen_at": row['first_seen_at'].isoformat(),
+            "last_seen_at": row['last_seen_at'].isoformat(),
+            "tasks": tasks_by_number.get(row['e164_number'], [])
+        })
+    
+    return {
+        "query": q,
+        "mode": mode,
+        "total": len(results),
+        "phone_numbers": results
+    }
+
+
+def _prefix_range(field, prefix):
+    """Prefix match as a range query so it can use a plain B-tree index"""
+    # Digits only, so bumping the last character gives the exclusive upper bound
+    upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+    return {f'{field}__gte': prefix, f'{field}__lt': upper}
+
+
 @api.get("/health")
 def health_check(request):
     """
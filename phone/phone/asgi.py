@@ -9,6 +9,7 @@ https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 
 import os
 import django
+from django.conf import settings
 from django.core.asgi import get_asgi_application
 from channels.routing import ProtocolTypeRouter, URLRouter
 from channels.auth import AuthMiddlewareStack
@@ -30,3 +31,8 @@ application = ProtocolTypeRouter({
         )
     ),
 })
+
+if settings.VIDEO_PREWARM:
+    # The server answers right away; workers load the extraction stack meanwhile
+    from api.scheduler import get_scheduler
+    get_scheduler().start()
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -81,17 +82,75 @@ CHANNEL_LAYERS = {
     },
 }
 
+# CHANNEL_LAYER=sqlite shares channels between every process on this host
+# (processing workers, several daphne instances) through a SQLite file
+if os.environ.get('CHANNEL_LAYER', 'memory') == 'sqlite':
+    CHANNEL_LAYERS['default'] = {
+        'BACKEND': 'api.channel_layers.SQLiteChannelLayer',
+        'CONFIG': {
+            'path': os.environ.get('CHANNEL_LAYER_PATH', str(BASE_DIR / 'channels.sqlite3')),
+        },
+    }
+
+# Caches. task_snapshots holds the latest progress of each task so WebSocket
+# consumers don't hit the database on connect/get_status. The default in-process
+# cache works for a single daphne process; point it at a shared local backend
+# (e.g. django.core.cache.backends.filebased.FileBasedCache) for several processes.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'task_snapshots': {
+        'BACKEND': os.environ.get('TASK_SNAPSHOT_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('TASK_SNAPSHOT_CACHE_LOCATION', 'task-snapshots'),
+        'TIMEOUT': 3600,
+    },
+}
+
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# SQLite tuned for several processing threads writing progress while the API
+# reads: WAL lets readers run alongside the single writer, synchronous=NORMAL
+# is durable under WAL without an fsync per commit, busy_timeout/timeout make
+# writers wait for the lock instead of failing with "database is locked", and
+# IMMEDIATE transactions take the write lock up front so two transactions
+# can't deadlock upgrading from a read lock.
+SQLITE_OPTIONS = {
+    'timeout': 20,
+    'transaction_mode': 'IMMEDIATE',
+    'init_command': (
+        'PRAGMA journal_mode=WAL;'
+        'PRAGMA synchronous=NORMAL;'
+        'PRAGMA busy_timeout=20000;'
+        'PRAGMA cache_size=-20000;'
+    ),
+}
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': SQLITE_OPTIONS,
+        # Keep connections open across requests and worker tasks
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', '600')),
     }
 }
 
+# DB_ENGINE=postgres moves storage to a local PostgreSQL server (needs psycopg)
+if os.environ.get('DB_ENGINE', 'sqlite') == 'postgres':
+    DATABASES['default'] = {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': os.environ.get('POSTGRES_DB', 'phone'),
+        'USER': os.environ.get('POSTGRES_USER', 'phone'),
+        'PASSWORD': os.environ.get('POSTGRES_PASSWORD', ''),
+        'HOST': os.environ.get('POSTGRES_HOST', 'localhost'),
+        'PORT': os.environ.get('POSTGRES_PORT', '5432'),
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', '600')),
+        'CONN_HEALTH_CHECKS': True,
+    }
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -139,11 +198,39 @@ MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
 # Video processing settings
+# Regions whose national numbers are recognised, in priority order (e.g. IL,DE,US)
+PHONE_REGIONS = os.environ.get('PHONE_REGIONS', 'IL')
 VIDEO_UPLOAD_DIR = MEDIA_ROOT / 'videos'
 VIDEO_RESULTS_DIR = MEDIA_ROOT / 'results'
 
+# Decode backend: 'opencv' (cv2.VideoCapture) or 'ffmpeg' (piped ffmpeg subprocess
+# doing fps sampling, downscaling and grayscale conversion in the decoder)
+VIDEO_DECODER = os.environ.get('VIDEO_DECODER', 'opencv')
+VIDEO_DECODE_MAX_WIDTH = int(os.environ.get('VIDEO_DECODE_MAX_WIDTH', '1920'))
+# Evidence crops kept for the first N sightings of each number (0 disables)
+VIDEO_EVIDENCE_PER_NUMBER = int(os.environ.get('VIDEO_EVIDENCE_PER_NUMBER', '3'))
+VIDEO_EVIDENCE_FORMAT = os.environ.get('VIDEO_EVIDENCE_FORMAT', 'webp')
+
+# Size of the shared worker pool that processes queued tasks
+VIDEO_PROCESSING_WORKERS = int(os.environ.get('VIDEO_PROCESSING_WORKERS', max((os.cpu_count() or 2) // 2, 1)))
+# Start the workers with the ASGI app and load OpenCV, Tesseract bindings and the
+# phone matchers in the background, instead of on the first upload. Off by default:
+# the stack is loaded into the API process itself, which then starts as heavy as a worker
+VIDEO_PREWARM = os.environ.get('VIDEO_PREWARM', '0') == '1'
+# OCR in long-lived worker processes instead of the task threads (0 disables);
+# each worker is replaced after VIDEO_OCR_MAX_FRAMES frames (0 = never)
+VIDEO_OCR_PROCESSES = int(os.environ.get('VIDEO_OCR_PROCESSES', '0'))
+VIDEO_OCR_MAX_FRAMES = int(os.environ.get('VIDEO_OCR_MAX_FRAMES', '1000'))
+# Frames reach the OCR workers through shared memory slots of this size (0 = pickled
+# over the pipe); larger frames fall back to the pipe. VIDEO_FRAME_SLOTS=0 means 3 per worker
+VIDEO_FRAME_SLOT_MB = float(os.environ.get('VIDEO_FRAME_SLOT_MB', '6'))
+VIDEO_FRAME_SLOTS = int(os.environ.get('VIDEO_FRAME_SLOTS', '0'))
+# Default per-task budgets, used when a task doesn't set its own (0 = unlimited)
+VIDEO_TASK_MAX_WORKERS = int(os.environ.get('VIDEO_TASK_MAX_WORKERS', '0'))
+VIDEO_TASK_MAX_MEMORY_MB = int(os.environ.get('VIDEO_TASK_MAX_MEMORY_MB', '0'))
+VIDEO_TASK_MAX_WALL_SECONDS = int(os.environ.get('VIDEO_TASK_MAX_WALL_SECONDS', '0'))
+
 # Ensure directories exist
-import os
 os.makedirs(VIDEO_UPLOAD_DIR, exist_ok=True)
 os.makedirs(VIDEO_RESULTS_DIR, exist_ok=True)
 
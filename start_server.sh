@@ -16,6 +16,10 @@ pkill -f daphne 2>/dev/null || true
 # Wait a moment for processes to stop
 sleep 2
 
+# Create or update the database (db.sqlite3 is not tracked by git)
+echo "🗄️ Applying migrations..."
+python manage.py migrate --noinput
+
 # Start the server
 echo "🚀 Starting Daphne ASGI server..."
 python -m daphne -b 0.0.0.0 -p 8000 phone.asgi:application